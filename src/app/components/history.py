@@ -0,0 +1,75 @@
+import time
+import streamlit as st
+from typing import Dict, List, Any
+
+from app.components.result_card import render_result_card, metadata_markdown
+
+# Cards per page of the conversation history (newest first)
+HISTORY_PAGE_SIZE = 5
+# Render timings kept in session state
+RENDER_TIMINGS_KEPT = 100
+
+def _card_view(message: Dict[str, Any]) -> Dict[str, Any]:
+    # Text of the card, prepared once per message and kept with it for later reruns
+    if '_view' not in message:
+        message['_view'] = {
+            'title': f"{message['question'][:60]}...",
+            'metadata_markdown': metadata_markdown(message.get('metadata')),
+        }
+    return message['_view']
+
+def _render_card(message: Dict[str, Any], number: int, plot_store, expanded: bool) -> bool:
+    # Collapsed cards are only a header; the card's content is built when it is opened
+    view = _card_view(message)
+    with st.container(border=True):
+        is_open = st.toggle(
+            f"Query #{number}: {view['title']}",
+            value=expanded,
+            key=f"history_open_{message['id']}"
+        )
+        if is_open:
+            render_result_card(
+                question=message['question'],
+                answer=message['answer'],
+                source_data=message.get('source_data'),
+                metadata=message.get('metadata'),
+                plots=[plot_store.get(plot_id) for plot_id in message.get('plot_ids', [])],
+                card_index=number,
+                metadata_text=view['metadata_markdown']
+            )
+    return is_open
+
+@st.fragment
+def render_history(messages: List[Dict[str, Any]], plot_store):
+    """
+    Render one page of the conversation history (newest first).
+
+    A fragment: paging and opening cards rerun only the history, not the whole app.
+    Only the cards of the current page are built, and only the opened ones in full.
+    The render time of every run is recorded in st.session_state.history_render_timings.
+    """
+    start = time.perf_counter()
+    n_pages = max(1, -(-len(messages) // HISTORY_PAGE_SIZE))
+    page = 1
+    if st.session_state.get("history_page", 1) > n_pages:
+        # The history got shorter (cleared), the stored page may not exist anymore
+        st.session_state.history_page = n_pages
+    if n_pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key="history_page")
+    page = min(int(page), n_pages)
+
+    newest_first = list(reversed(messages))
+    first = (page - 1) * HISTORY_PAGE_SIZE
+    opened = 0
+    for offset, message in enumerate(newest_first[first:first + HISTORY_PAGE_SIZE]):
+        idx = first + offset
+        opened += _render_card(message, len(messages) - idx, plot_store, expanded=(idx == 0))
+
+    seconds = time.perf_counter() - start
+    timings = st.session_state.setdefault('history_render_timings', [])
+    timings.append({'queries': len(messages), 'opened_cards': opened, 'seconds': round(seconds, 4)})
+    del timings[:-RENDER_TIMINGS_KEPT]
+    st.caption(
+        f"Page {page} of {n_pages} · {opened} card(s) rendered in {seconds * 1000:.1f} ms "
+        f"({len(messages)} queries in history)"
+    )
@@ -1,15 +1,45 @@
 import streamlit as st
 import pandas as pd
 from typing import Optional, Dict, Any, List
-import matplotlib.pyplot as plt
+
+# Card styling, injected once per page run (not once per card)
+RESULT_CARD_CSS = """
+<style>
+.result-card {
+    padding: 1.5rem;
+    border-radius: 0.5rem;
+    background-color: #f8f9fa;
+    margin-bottom: 1rem;
+}
+.question-text {
+    color: #1f77b4;
+    font-weight: 600;
+    font-size: 1.1rem;
+}
+.answer-text {
+    margin-top: 1rem;
+    line-height: 1.6;
+}
+</style>
+"""
+
+def inject_result_card_css():
+    st.markdown(RESULT_CARD_CSS, unsafe_allow_html=True)
+
+def metadata_markdown(metadata: Optional[Dict[str, Any]]) -> str:
+    """The metadata section as one markdown text (one line per key)."""
+    if not metadata:
+        return ""
+    return "  \n".join(f"**{key}:** {value}" for key, value in metadata.items())
 
 def render_result_card(
     question: str,
     answer: str,
     source_data: Optional[pd.DataFrame] = None,
     metadata: Optional[Dict[str, Any]] = None,
-    plots: Optional[List[plt.Figure]] = None,
-    card_index: int = 0
+    plots: Optional[List[Optional[bytes]]] = None,
+    card_index: int = 0,
+    metadata_text: Optional[str] = None
 ):
     """
     Render a result card showing question, answer, and source data.
@@ -19,34 +49,11 @@ def render_result_card(
         answer: The RAG-generated answer
         source_data: Optional DataFrame showing data sources used
         metadata: Optional dict with additional metadata
-        plots: Optional list of matplotlib figures for visual analysis
+        plots: Optional list of PNG images for visual analysis (None for plots no longer kept)
         card_index: Index for unique identification
+        metadata_text: Optional metadata section prepared with metadata_markdown (e.g. cached per message)
     """
     with st.container():
-        # Card styling
-        st.markdown(
-            """
-            <style>
-            .result-card {
-                padding: 1.5rem;
-                border-radius: 0.5rem;
-                background-color: #f8f9fa;
-                margin-bottom: 1rem;
-            }
-            .question-text {
-                color: #1f77b4;
-                font-weight: 600;
-                font-size: 1.1rem;
-            }
-            .answer-text {
-                margin-top: 1rem;
-                line-height: 1.6;
-            }
-            </style>
-            """,
-            unsafe_allow_html=True
-        )
-        
         # Question section
         st.markdown(f'<div class="question-text">❓ Question:</div>', unsafe_allow_html=True)
         st.markdown(f'<div style="padding-left: 1.5rem; margin-top: 0.5rem;">{question}</div>', unsafe_allow_html=True)
@@ -75,15 +82,52 @@ def render_result_card(
         if plots:
             st.markdown("---")
             st.markdown(f'<div class="question-text">📈 Visual Analysis:</div>', unsafe_allow_html=True)
-            for i, fig in enumerate(plots):
-                # Temporarily resize figure for display without mutating stored figure state
-                orig_size = fig.get_size_inches().copy()
-                fig.set_size_inches(orig_size[0] * 0.5, orig_size[1] * 0.5)
-                st.pyplot(fig, clear_figure=False)
-                fig.set_size_inches(orig_size[0], orig_size[1])
+            for i, png in enumerate(plots):
+                if png is None:
+                    st.caption("This plot was removed from the session history to save memory.")
+                    continue
+                # PNG at half the figure size
+                st.image(png, width=500)
                  
         # Metadata section (if provided)
         if metadata:
             with st.expander("ℹ️ Additional Information"):
-                for key, value in metadata.items():
-                    st.write(f"**{key}:** {value}")
\ No newline at end of file
+                st.markdown(metadata_text if metadata_text is not None else metadata_markdown(metadata))
+
+def render_streaming_result_card(question: str, events) -> Dict[str, Any]:
+    """
+    Render a result card while the answer is being generated.
+
+    Args:
+        question: The user's question
+        events: Event stream of RAGOrchestrator.ask_stream
+
+    Returns:
+        The final response dict (answer, source_data, metadata)
+    """
+    with st.container():
+        st.markdown(f'<div class="question-text">❓ Question:</div>', unsafe_allow_html=True)
+        st.markdown(f'<div style="padding-left: 1.5rem; margin-top: 0.5rem;">{question}</div>', unsafe_allow_html=True)
+        st.markdown("---")
+        st.markdown(f'<div class="question-text">💡 Answer:</div>', unsafe_allow_html=True)
+
+        status = st.status("Analyzing data...", expanded=False)
+        answer_placeholder = st.empty()
+        answer = ""
+        response = None
+        for event in events:
+            if event["type"] == "status":
+                status.update(label=event["message"])
+            elif event["type"] == "tool_start":
+                status.write(f"Running `{event['name']}` with {event['arguments']}")
+            elif event["type"] == "tool_end":
+                status.write(f"`{event['name']}` done")
+            elif event["type"] == "token":
+                answer += event["text"]
+                answer_placeholder.markdown(answer + "▌")
+            elif event["type"] == "final":
+                response = event["response"]
+
+        status.update(label="Done", state="complete")
+        answer_placeholder.markdown(response["answer"] if response else answer)
+        return response
@@ -0,0 +1,69 @@
+'''
+Per-session storage of the plots shown in the conversation history.
+
+Plots are kept as PNG bytes, never as live matplotlib figures: a figure handed to the
+store is rasterized once and closed right away. The store is bounded by the total
+size and the number of plots, and evicts the oldest plots first. Messages only keep
+the plot ids; plots that were evicted are shown as a short note instead.
+'''
+import itertools
+from collections import OrderedDict
+from typing import List, Optional
+
+import matplotlib.pyplot as plt
+
+from rag.tools import figure_to_png_bytes
+
+# Caps of one session's plots
+MAX_PLOT_BYTES = 20 * 1024 * 1024
+MAX_PLOTS = 50
+
+
+def to_png_bytes(plot) -> bytes:
+    """PNG bytes of a plot; figures are rasterized and closed."""
+    if isinstance(plot, bytes):
+        return plot
+    try:
+        return figure_to_png_bytes(plot)
+    finally:
+        plt.close(plot)
+
+
+class PlotStore:
+    def __init__(self, max_bytes: int = MAX_PLOT_BYTES, max_plots: int = MAX_PLOTS):
+        self.max_bytes = max_bytes
+        self.max_plots = max_plots
+        self._plots = OrderedDict()
+        self._ids = itertools.count()
+        self.total_bytes = 0
+        self.evicted = 0
+
+    def add(self, plot) -> int:
+        png = to_png_bytes(plot)
+        plot_id = next(self._ids)
+        self._plots[plot_id] = png
+        self.total_bytes += len(png)
+        # Oldest plots first; the plot just added is always kept
+        while len(self._plots) > 1 and (len(self._plots) > self.max_plots or self.total_bytes > self.max_bytes):
+            _, old = self._plots.popitem(last=False)
+            self.total_bytes -= len(old)
+            self.evicted += 1
+        return plot_id
+
+    def add_all(self, plots) -> List[int]:
+        return [self.add(plot) for plot in plots or []]
+
+    def get(self, plot_id: int) -> Optional[bytes]:
+        return self._plots.get(plot_id)
+
+    def clear(self) -> None:
+        self._plots.clear()
+        self.total_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "plots": len(self._plots),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+        }
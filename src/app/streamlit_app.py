@@ -3,6 +3,7 @@ from typing import List, Dict
 import sys
 from pathlib import Path
 import pandas as pd
+import uuid
 
 current_file_path = Path(__file__).resolve() # .../src/app/main_app.py
 project_root = current_file_path.parent.parent # .../src/
@@ -10,7 +11,10 @@ if str(project_root) not in sys.path:
     sys.path.append(str(project_root))
 
 from rag.rag_logic import RAGOrchestrator
-from app.components.result_card import render_result_card
+from rag.batch import ask_many
+from app.components.result_card import inject_result_card_css, render_streaming_result_card
+from app.components.history import render_history
+from app.plot_store import PlotStore
 
 # Page config
 st.set_page_config(
@@ -23,8 +27,16 @@ st.set_page_config(
 if 'messages' not in st.session_state:
     st.session_state.messages = []
 
-if 'mock_test_idx' not in st.session_state:
-    st.session_state.mock_test_idx = -1
+if 'mock_test_summary' not in st.session_state:
+    st.session_state.mock_test_summary = None
+
+# Error of the last action, shown after the rerun that follows it
+if 'last_error' not in st.session_state:
+    st.session_state.last_error = None
+
+# Plots of the history as PNG bytes, bounded per session
+if 'plot_store' not in st.session_state:
+    st.session_state.plot_store = PlotStore()
 
 @st.cache_resource
 def get_rag_engine():
@@ -32,9 +44,20 @@ def get_rag_engine():
 
 rag_engine = get_rag_engine()
 
-def real_rag_query(question: str) -> Dict:
-    # This now returns the full dict: {answer, source_data, metadata}
-    return rag_engine.ask(question)
+def add_message(question: str, response: Dict) -> None:
+    # The plots go to the plot store (rasterized, figures closed), the message keeps their ids
+    metadata = dict(response.get('metadata') or {})
+    plot_ids = st.session_state.plot_store.add_all(metadata.pop('plots', []))
+    st.session_state.messages.append({
+        'id': uuid.uuid4().hex,
+        'question': question,
+        'answer': response['answer'],
+        'source_data': response.get('source_data'),
+        'metadata': metadata,
+        'plot_ids': plot_ids
+    })
+    # Back to the first page, where the new answer is
+    st.session_state.history_page = 1
    
  # Sidebar with mock test button
 MOCK_TEST_QUESTIONS = [
@@ -43,6 +66,10 @@ MOCK_TEST_QUESTIONS = [
     "Customer 2368 is interesting, I would like to visualize how it compares with the rest?",
     "Show me the most expensive transactions."
 ]
+MOCK_TEST_CONCURRENCY = 4
+
+# Card styling, once for all cards of the page
+inject_result_card_css()
 
 # Title and description
 st.title("RAG UI for Nordic Financial Data Analysis")
@@ -69,55 +96,50 @@ with st.container():
     # Logic: Handle Clear
     if clear_button:
         st.session_state.messages = []
-        st.session_state.mock_test_idx = -1
+        st.session_state.plot_store.clear()
+        st.session_state.mock_test_summary = None
+        st.session_state.last_error = None
         st.rerun()
 
-    # Logic: Handle Start Mock Test
+    # Logic: Handle Mock Test
+    # All mock questions run as one batch with bounded concurrency
     if mock_test_button:
         st.session_state.messages = []
-        st.session_state.mock_test_idx = 0
+        st.session_state.plot_store.clear()
+        st.session_state.mock_test_summary = None
+        st.session_state.last_error = None
+        with st.spinner(f"Running {len(MOCK_TEST_QUESTIONS)} mock queries..."):
+            try:
+                results, summary = ask_many(rag_engine, MOCK_TEST_QUESTIONS, concurrency=MOCK_TEST_CONCURRENCY)
+                for result in results:
+                    add_message(result['question'], result['response'])
+                st.session_state.mock_test_summary = summary
+            except Exception as e:
+                st.session_state.last_error = f"Mock test failed: {e}"
         st.rerun()
 
     # Logic: Handle Manual Query
+    # The answer is streamed into a live result card, the full card is rendered after the rerun
     if send_button and user_input.strip():
-        with st.spinner("Analyzing data..."):
+        st.session_state.mock_test_summary = None
+        st.session_state.last_error = None
+        with st.container():
             try:
-                rag_response = real_rag_query(user_input)
-                st.session_state.messages.append({
-                    'question': user_input,
-                    'answer': rag_response['answer'],
-                    'source_data': rag_response.get('source_data'),
-                    'metadata': rag_response.get('metadata'),
-                    'plots': rag_response.get('metadata', {}).get('plots', [])
-                })
+                rag_response = render_streaming_result_card(user_input, rag_engine.ask_stream(user_input))
+                add_message(user_input, rag_response)
             except Exception as e:
-                st.error(f"Error: {e}")
+                st.session_state.last_error = f"Error: {e}"
         st.rerun()
 
-    # Logic: Automated Mock Test Execution
-    # This block ensures the spinner stays right here under the buttons
-    if 0 <= st.session_state.mock_test_idx < len(MOCK_TEST_QUESTIONS):
-        current_q = MOCK_TEST_QUESTIONS[st.session_state.mock_test_idx]
-        
-        with st.spinner(f"Running Mock Query {st.session_state.mock_test_idx + 1}/{len(MOCK_TEST_QUESTIONS)}..."):
-            try:
-                response = real_rag_query(current_q)
-                st.session_state.messages.append({
-                    'question': current_q,
-                    'answer': response['answer'],
-                    'source_data': response.get('source_data'),
-                    'metadata': response.get('metadata'),
-                    'plots': response.get('metadata', {}).get('plots', [])
-                })
-                st.session_state.mock_test_idx += 1
-                st.rerun()
-            except Exception as e:
-                st.error(f"Mock test failed at query {st.session_state.mock_test_idx}: {e}")
-                st.session_state.mock_test_idx = -1 # Stop on error
-    
-    elif st.session_state.mock_test_idx >= len(MOCK_TEST_QUESTIONS):
-        st.success("✅ Mock test sequence completed successfully!")
-        st.session_state.mock_test_idx = -1
+    if st.session_state.last_error:
+        st.error(st.session_state.last_error)
+
+    if st.session_state.mock_test_summary:
+        summary = st.session_state.mock_test_summary
+        st.success(
+            f"✅ Mock test completed: {summary['questions']} queries in {summary['wall_s']}s "
+            f"(p50 {summary['p50_s']}s, p95 {summary['p95_s']}s, {summary['errors']} errors)"
+        )
 
 # --- Conversation Display ---
 st.markdown("---")
@@ -127,16 +149,5 @@ if not st.session_state.messages:
 else:
     st.subheader(f"💬 Conversation ({len(st.session_state.messages)} queries)")
     
-    # Display messages in reverse order (newest first)
-    for idx, message in enumerate(reversed(st.session_state.messages)):
-        message_number = len(st.session_state.messages) - idx
-        
-        with st.expander(f"Query #{message_number}: {message['question'][:60]}...", expanded=(idx == 0)):
-            render_result_card(
-                question=message['question'],
-                answer=message['answer'],
-                source_data=message.get('source_data'),
-                metadata=message.get('metadata'),
-                plots=message.get('plots'),
-                card_index=message_number
-            )
\ No newline at end of file
+    # Only the current page is rendered, see components/history.py
+    render_history(st.session_state.messages, st.session_state.plot_store)
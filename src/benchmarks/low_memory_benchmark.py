@@ -0,0 +1,84 @@
+'''
+Benchmark of the low-memory mode of the transform and feature engineering steps.
+
+Synthesizes raw customers and transactions (benchmarks.synthetic_data) and runs
+transform + gold feature computation in the default and in the low-memory mode.
+Every mode runs in its own subprocess so the peak resident memory (ru_maxrss) of one
+doesn't hide the other. From the project root:
+
+    PYTHONPATH=src python -m benchmarks.low_memory_benchmark --rows 10000000
+'''
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_data import TRANSACTIONS_PER_CUSTOMER, generate_customers, generate_transactions
+from etl.transform import transform_customers, transform_transactions
+from feature_engineering.add_features import compute_gold_features
+
+MODES = ["default", "low_memory"]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_mode(mode: str, rows: int) -> dict:
+    low_memory = mode == "low_memory"
+    raw_customers = generate_customers(max(100, rows // TRANSACTIONS_PER_CUSTOMER))
+    raw_transactions = generate_transactions(rows, raw_customers)
+    input_rss_mb = _peak_rss_mb()
+
+    start = time.perf_counter()
+    customers = transform_customers(raw_customers, low_memory=low_memory)
+    transactions = transform_transactions(raw_transactions, low_memory=low_memory)
+    transform_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    gold, gold_transactions = compute_gold_features(customers, transactions, low_memory=low_memory)
+    features_s = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "rows": len(raw_transactions),
+        "transform_s": round(transform_s, 2),
+        "features_s": round(features_s, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        # Peak on top of the synthesized raw input
+        "pipeline_peak_mb": round(_peak_rss_mb() - input_rss_mb, 1),
+        "silver_transactions_mb": round(transactions.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+        "gold_transactions_mb": round(gold_transactions.memory_usage(deep=True).sum() / 1024 ** 2, 1),
+        "gold_customers": len(gold),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory and runtime of the default and low-memory modes.")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Number of synthetic raw transactions.")
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_mode(args.worker, args.rows)))
+        return
+
+    results = []
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.low_memory_benchmark", "--worker", mode, "--rows", str(args.rows)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    print(pd.DataFrame(results).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+'''
+End-to-end benchmark of the pipeline on synthetic data at configurable scales.
+
+For every scale a throwaway workspace with the project layout (data/raw/csv,
+data/raw/documents) is filled with synthetic data (benchmarks.synthetic_data) and
+the following stages are timed in it:
+
+- etl:       run_etl_pipeline
+- features:  run_feature_engineering
+- ingest:    ChromaIngestor.ingest_directory (skipped if chromadb is not installed)
+- gold_load: loading the gold tables used by the RAG tools
+- analysis:  a fixed set of execute_data_analysis queries
+- viz:       generate_customer_visualization for every plot type
+
+Results are written as JSON (machine and package versions, git commit, seconds per
+stage) so runs of different versions can be compared. From the project root:
+
+    PYTHONPATH=src python -m benchmarks.run_benchmarks --scales 10k 1m
+    PYTHONPATH=src python -m benchmarks.run_benchmarks --scales 10k --compare benchmark_results/previous.json
+'''
+import argparse
+import datetime
+import importlib
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import resolve_scale, write_dataset
+from etl.run_etl import run_etl_pipeline
+from feature_engineering.add_features import run_feature_engineering
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DOCUMENTS_PATH = PROJECT_ROOT / "data" / "raw" / "documents"
+RESULTS_DIR = PROJECT_ROOT / "benchmark_results"
+RESULTS_VERSION = 1
+
+# (query_type, table_name, column, value, operator, n)
+ANALYSIS_QUERIES = [
+    ("top_n", "customers", "total_spend_eur", None, "==", 5),
+    ("filter", "customers", "customer_id", "42", "==", 5),
+    ("filter", "customers", "high_ticket_user", "True", "==", 5),
+    ("filter", "customers", "email", "user1", "contains", 5),
+    ("top_n", "transactions", "amount_eur", None, "==", 10),
+    ("filter", "transactions", "amount_eur", "1000", ">", 5),
+]
+VIZ_PLOT_TYPES = ["avg_transaction", "frequency", "recency", "cross_border"]
+# Slowdown (new / old) reported as a regression by --compare
+DEFAULT_REGRESSION_THRESHOLD = 1.2
+
+
+@contextmanager
+def _working_directory(path: Path):
+    # The pipeline uses paths relative to the project root
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def _timed(fn, *args, **kwargs):
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    result = fn(*args, **kwargs)
+    timing = {
+        "seconds": round(time.perf_counter() - start_wall, 4),
+        "cpu_seconds": round(time.process_time() - start_cpu, 4),
+    }
+    return result, timing
+
+
+def _ingest_documents() -> dict:
+    try:
+        from rag.ingest import ChromaIngestor
+    except ImportError as e:
+        return {"skipped": f"chromadb not available ({e})"}
+    ingestor, init_timing = _timed(ChromaIngestor, db_path="./data/chroma_db")
+    _, timing = _timed(ingestor.ingest_directory, "data/raw/documents")
+    timing["init_seconds"] = init_timing["seconds"]
+    return timing
+
+
+def _run_analysis(csv_analysis) -> dict:
+    queries = []
+    start = time.perf_counter()
+    for query_type, table_name, column, value, operator, n in ANALYSIS_QUERIES:
+        _, timing = _timed(csv_analysis.execute_data_analysis, query_type, table_name, column, value, operator, n)
+        queries.append({"query": f"{query_type} {table_name}.{column} {operator} {value}", **timing})
+    return {"seconds": round(time.perf_counter() - start, 4), "queries": queries}
+
+
+def _run_viz(viz_tool, customer_id: int) -> dict:
+    plots = {}
+    start = time.perf_counter()
+    for plot_type in VIZ_PLOT_TYPES:
+        fig, timing = _timed(viz_tool.generate_customer_visualization, customer_id, plot_type)
+        plt.close(fig)
+        plots[plot_type] = timing["seconds"]
+    return {"seconds": round(time.perf_counter() - start, 4), "plots": plots}
+
+
+def run_scale(scale, workspace: Path, shards: int = 1, seed: int = 0) -> dict:
+    n_rows = resolve_scale(scale)
+    raw_dir = workspace / "data" / "raw"
+    dataset, generate_timing = _timed(write_dataset, raw_dir / "csv", n_rows, shards=shards, seed=seed)
+    if DOCUMENTS_PATH.exists():
+        shutil.copytree(DOCUMENTS_PATH, raw_dir / "documents", dirs_exist_ok=True)
+
+    stages = {"generate": generate_timing}
+    with _working_directory(workspace):
+        (customers, transactions), stages["etl"] = _timed(run_etl_pipeline)
+        gold, stages["features"] = _timed(run_feature_engineering, customers, transactions)
+        stages["ingest"] = _ingest_documents()
+
+        csv_analysis = importlib.import_module("rag.tools.csv_analysis")
+        viz_tool = importlib.import_module("rag.tools.viz_tool")
+        # The tools share one lazily loaded store; reloading it picks up this workspace's tables
+        _, stages["gold_load"] = _timed(csv_analysis.GOLD_DATA.reload)
+
+        stages["analysis"] = _run_analysis(csv_analysis)
+        stages["viz"] = _run_viz(viz_tool, int(gold['customer_id'].iloc[0]))
+
+    return {
+        "scale": str(scale),
+        "raw_transactions": dataset["transactions"],
+        "customers": dataset["customers"],
+        "shards": shards,
+        "silver_transactions": len(transactions),
+        "stages": stages,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment() -> dict:
+    packages = {"pandas": pd.__version__, "numpy": np.__version__}
+    try:
+        import pyarrow
+        packages["pyarrow"] = pyarrow.__version__
+    except ImportError:
+        pass
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def compare_results(new: dict, old: dict, threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> pd.DataFrame:
+    """Per scale and stage, the seconds of both result files and their ratio."""
+    old_runs = {run["scale"]: run for run in old["runs"]}
+    rows = []
+    for run in new["runs"]:
+        old_run = old_runs.get(run["scale"])
+        if old_run is None:
+            continue
+        for stage, timing in run["stages"].items():
+            old_timing = old_run["stages"].get(stage, {})
+            if "seconds" not in timing or "seconds" not in old_timing:
+                continue
+            ratio = timing["seconds"] / old_timing["seconds"] if old_timing["seconds"] else float("nan")
+            rows.append({
+                "scale": run["scale"],
+                "stage": stage,
+                "old_s": old_timing["seconds"],
+                "new_s": timing["seconds"],
+                "ratio": round(ratio, 2),
+                "regression": ratio > threshold,
+            })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data.")
+    parser.add_argument("--scales", nargs="+", default=["10k"], help="Number of transactions, e.g. 10k 1m 50m.")
+    parser.add_argument("--shards", type=int, default=1, help="Number of raw transaction files.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Result JSON file (default: benchmark_results/<timestamp>.json).")
+    parser.add_argument("--compare", default=None, help="Earlier result JSON to compare against.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    parser.add_argument("--keep-workspace", action="store_true", help="Don't delete the generated data.")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+
+    created_at = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    results = {
+        "version": RESULTS_VERSION,
+        "created_at": created_at,
+        "git_commit": _git_commit(),
+        "environment": _environment(),
+        "runs": [],
+    }
+    for scale in args.scales:
+        workspace = Path(tempfile.mkdtemp(prefix=f"pipeline_bench_{scale}_"))
+        try:
+            print(f"Running scale {scale} in {workspace}...")
+            results["runs"].append(run_scale(scale, workspace, args.shards, args.seed))
+        finally:
+            if not args.keep_workspace:
+                shutil.rmtree(workspace, ignore_errors=True)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{created_at.replace(':', '')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    summary = pd.DataFrame([
+        {"scale": run["scale"], **{stage: timing.get("seconds") for stage, timing in run["stages"].items()}}
+        for run in results["runs"]
+    ])
+    print(summary.to_string(index=False))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        comparison = compare_results(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        print(comparison.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+'''
+Benchmark of the storage backends in etl.load (CSV vs Parquet).
+
+Writes the silver transactions and gold customers tables in every format and compares
+file size, write time and read time (full read, column projection and a filtered read).
+Run the ETL pipeline first, then from the project root:
+
+    PYTHONPATH=src python -m benchmarks.storage_benchmark
+'''
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from etl.load import get_table_path, load_processed_data, save_dataframe
+
+# (table name, base path, partitioning, projected columns, filter)
+BENCHMARK_TABLES = [
+    (
+        "processed_transactions", "data/processed_silver", None,
+        ["customer_id", "amount", "currency"],
+        [("amount", ">", 500)],
+    ),
+    (
+        "gold_customers", "data/processed_gold", "country",
+        ["customer_id", "total_spend_eur"],
+        [("country", "==", "DK")],
+    ),
+]
+
+
+def _size_bytes(path: Path) -> int:
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size
+
+
+def _best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_table(df: pd.DataFrame, name: str, partition_by, columns, filters, formats, repeat: int) -> list:
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="storage_bench_")
+    try:
+        for storage_format in formats:
+            partitioning = partition_by if storage_format == "parquet" else None
+            write_s = _best_of(
+                lambda: save_dataframe(df, name, work_dir, storage_format=storage_format, partition_by=partitioning),
+                repeat,
+            )
+            path = get_table_path(name, work_dir, storage_format)
+            results.append({
+                "table": name,
+                "format": storage_format,
+                "rows": len(df),
+                "size_mb": round(_size_bytes(path) / 1024 ** 2, 2),
+                "write_s": round(write_s, 3),
+                "read_s": round(_best_of(lambda: load_processed_data(name, work_dir, storage_format=storage_format), repeat), 3),
+                "read_projected_s": round(_best_of(
+                    lambda: load_processed_data(name, work_dir, columns=columns, storage_format=storage_format), repeat
+                ), 3),
+                "read_filtered_s": round(_best_of(
+                    lambda: load_processed_data(name, work_dir, filters=filters, storage_format=storage_format), repeat
+                ), 3),
+            })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CSV and Parquet storage for the silver/gold tables.")
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best one is reported.")
+    args = parser.parse_args()
+
+    results = []
+    for name, base_path, partition_by, columns, filters in BENCHMARK_TABLES:
+        try:
+            df = load_processed_data(name, base_path)
+        except FileNotFoundError:
+            print(f"Skipping {name}: run the pipeline first (python src/main.py).")
+            continue
+        results += benchmark_table(df, name, partition_by, columns, filters, args.formats, args.repeat)
+
+    if results:
+        print(pd.DataFrame(results).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+'''
+Synthetic Nordic finance data for benchmarks.
+
+Generates customers and transactions with the same schema as the raw CSV files and
+the same kinds of dirty values transform.py has to clean:
+
+- transactions without customer_id
+- missing currencies (DKK is never filled in, like in the raw data) and lower-case codes ("eur")
+- missing, "unknown" and inconsistently cased/padded categories
+- unparseable timestamps, zero and negative amounts
+- exact duplicate rows
+- customers with lower-case countries and invalid signup dates
+
+Large scales are written in chunks, so generating 50M rows doesn't need the whole
+table in memory. From the project root:
+
+    PYTHONPATH=src python -m benchmarks.synthetic_data --scale 1m --output /tmp/nordic
+'''
+import argparse
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+# Scales are given as a number of raw transactions with an optional suffix: 10k, 1m, 50m
+SCALE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+# Same ratio as the sample data (5k customers)
+TRANSACTIONS_PER_CUSTOMER = 40
+GENERATION_CHUNK_SIZE = 1_000_000
+
+COUNTRIES = np.array(['FI', 'SE', 'NO', 'DK'])
+HOME_CURRENCY = {'FI': 'EUR', 'SE': 'SEK', 'NO': 'NOK', 'DK': 'DKK'}
+# Typical ticket size in the local currency
+AMOUNT_SCALE = {'EUR': 40.0, 'SEK': 420.0, 'NOK': 430.0, 'DKK': 300.0}
+CATEGORIES = np.array(['food', 'electronics', 'Food', ' electronics', 'ELECTRONICS', 'unknown'], dtype=object)
+CATEGORY_WEIGHTS = np.array([0.55, 0.32, 0.03, 0.03, 0.02, 0.05])
+
+# Share of dirty values
+MISSING_CUSTOMER_ID_RATE = 0.01
+MISSING_CURRENCY_RATE = 0.01
+LOWERCASE_CURRENCY_RATE = 0.02
+CROSS_BORDER_RATE = 0.08
+MISSING_CATEGORY_RATE = 0.05
+INVALID_TIMESTAMP_RATE = 0.002
+NON_POSITIVE_AMOUNT_RATE = 0.005
+DUPLICATE_RATE = 0.01
+
+
+def resolve_scale(scale) -> int:
+    # "1m", "250k" or a plain number of rows
+    if isinstance(scale, int):
+        return scale
+    scale = scale.strip().lower()
+    if scale[-1:] in SCALE_SUFFIXES:
+        return int(float(scale[:-1]) * SCALE_SUFFIXES[scale[-1]])
+    return int(scale)
+
+
+def generate_customers(n_customers: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    signup = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365, n_customers), unit='D')
+    signup = signup.strftime('%Y-%m-%d').to_numpy(dtype=object)
+    signup[rng.random(n_customers) < 0.001] = 'not a date'
+
+    countries = rng.choice(COUNTRIES, n_customers).astype(object)
+    lowercase = rng.random(n_customers) < 0.01
+    countries[lowercase] = np.char.lower(countries[lowercase].astype(str))
+
+    return pd.DataFrame({
+        'customer_id': np.arange(1, n_customers + 1),
+        'country': countries,
+        'signup_date': signup,
+        'email': [f"user{i}@example.com" for i in range(n_customers)],
+    })
+
+
+def _transaction_chunk(rng, start_id: int, n_rows: int, customers: pd.DataFrame) -> pd.DataFrame:
+    customer_idx = rng.integers(0, len(customers), n_rows)
+    customer_id = customers['customer_id'].to_numpy()[customer_idx].astype(float)
+    home_country = pd.Series(customers['country'].to_numpy()[customer_idx]).str.upper()
+
+    # Mostly the customer's home currency, sometimes a foreign one (cross-border)
+    currency = home_country.map(HOME_CURRENCY).to_numpy(dtype=object)
+    foreign = rng.random(n_rows) < CROSS_BORDER_RATE
+    currency[foreign] = rng.choice(list(HOME_CURRENCY.values()), int(foreign.sum()))
+    amount = np.round(rng.gamma(2.0, 1.0, n_rows) * pd.Series(currency).map(AMOUNT_SCALE).to_numpy(dtype=float), 2)
+
+    # Dirty values
+    currency[currency == 'DKK'] = None
+    customer_id[rng.random(n_rows) < MISSING_CUSTOMER_ID_RATE] = np.nan
+    currency[rng.random(n_rows) < LOWERCASE_CURRENCY_RATE] = 'eur'
+    currency[rng.random(n_rows) < MISSING_CURRENCY_RATE] = None
+    non_positive = rng.random(n_rows) < NON_POSITIVE_AMOUNT_RATE
+    amount[non_positive] = -rng.integers(0, 50, int(non_positive.sum()))
+
+    timestamp = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, n_rows), unit='s')
+    timestamp = timestamp.strftime('%Y-%m-%d %H:%M:%S').to_numpy(dtype=object)
+    timestamp[rng.random(n_rows) < INVALID_TIMESTAMP_RATE] = 'invalid_date'
+
+    category = rng.choice(CATEGORIES, n_rows, p=CATEGORY_WEIGHTS)
+    category[rng.random(n_rows) < MISSING_CATEGORY_RATE] = None
+
+    chunk = pd.DataFrame({
+        'transaction_id': np.arange(start_id, start_id + n_rows),
+        'customer_id': pd.array(customer_id, dtype='Int64'),
+        'amount': amount,
+        'currency': currency,
+        'timestamp': timestamp,
+        'category': category,
+    })
+    # Exact duplicates, shuffled into the chunk
+    duplicates = chunk.sample(frac=DUPLICATE_RATE, random_state=int(rng.integers(1 << 31)))
+    return pd.concat([chunk, duplicates], ignore_index=True).sample(frac=1.0, random_state=int(rng.integers(1 << 31)))
+
+
+def iter_transaction_chunks(
+    n_rows: int, customers: pd.DataFrame, seed: int = 0, chunk_size: int = GENERATION_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    # n_rows unique transactions, plus DUPLICATE_RATE exact duplicates
+    rng = np.random.default_rng(seed + 1)
+    for start in range(0, n_rows, chunk_size):
+        yield _transaction_chunk(rng, start + 1, min(chunk_size, n_rows - start), customers)
+
+
+def generate_transactions(n_rows: int, customers: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    return pd.concat(iter_transaction_chunks(n_rows, customers, seed), ignore_index=True)
+
+
+def write_dataset(output_dir, n_rows: int, n_customers: int = None, shards: int = 1, seed: int = 0) -> dict:
+    """
+    Writes customers.csv and the transactions (transactions.csv, or transactions_000.csv...
+    for several shards) into output_dir, the layout of data/raw/csv.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    n_customers = n_customers or max(100, n_rows // TRANSACTIONS_PER_CUSTOMER)
+
+    customers = generate_customers(n_customers, seed)
+    customers.to_csv(output_dir / "customers.csv", index=False)
+
+    if shards == 1:
+        paths = [output_dir / "transactions.csv"]
+    else:
+        paths = [output_dir / f"transactions_{i:03d}.csv" for i in range(shards)]
+    rows_written = 0
+    chunk_size = min(GENERATION_CHUNK_SIZE, max(1, -(-n_rows // shards)))
+    for chunk_idx, chunk in enumerate(iter_transaction_chunks(n_rows, customers, seed, chunk_size)):
+        # Chunks are spread round-robin over the shards
+        first_write = chunk_idx < shards
+        chunk.to_csv(paths[chunk_idx % shards], mode="w" if first_write else "a", header=first_write, index=False)
+        rows_written += len(chunk)
+
+    return {"customers": n_customers, "transactions": rows_written, "files": [str(p) for p in paths]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic raw customers/transactions CSV files.")
+    parser.add_argument("--scale", default="10k", help="Number of transactions, e.g. 10k, 1m or 50m.")
+    parser.add_argument("--output", required=True, help="Output directory (layout of data/raw/csv).")
+    parser.add_argument("--customers", type=int, default=None, help="Number of customers (default: scale / 40).")
+    parser.add_argument("--shards", type=int, default=1, help="Split the transactions over several files.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = write_dataset(args.output, resolve_scale(args.scale), args.customers, args.shards, args.seed)
+    print(f"Wrote {result['customers']} customers and {result['transactions']} transactions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,14 @@
 Extract module that handles reading raw data files and validating their schemas.
 Added schema validation in case more data are added in the future.
 '''
+import io
 from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
 import pandas as pd
 
 RAW_DATA_PATH = Path("data/raw/csv")
+# Transactions may arrive as many shards (e.g. one file per day: transactions_2020-01-01.csv)
+TRANSACTION_FILE_PATTERN = "transactions*.csv"
 
 # Should this be stored in yaml or json instead?
 # For now, hardcoding the expected columns in the code for simplicity.
@@ -42,7 +46,62 @@ def extract_customers() -> pd.DataFrame:
     return customers_df
 
 
-def extract_transactions() -> pd.DataFrame:
-    transactions_df = pd.read_csv(RAW_DATA_PATH / "transactions.csv")
+def list_transaction_files(file_pattern: str = TRANSACTION_FILE_PATTERN) -> List[Path]:
+    # Raw transaction shards matching the glob, in a stable (sorted) order
+    files = sorted(RAW_DATA_PATH.glob(file_pattern))
+    if not files:
+        raise FileNotFoundError(f"No transaction files matching '{file_pattern}' in {RAW_DATA_PATH}")
+    return files
+
+
+def extract_transaction_file(file_path: Path, dtype=None) -> pd.DataFrame:
+    transactions_df = pd.read_csv(file_path, dtype=dtype)
+    _validate_schema(transactions_df, EXPECTED_TRANSACTION_COLUMNS, f"transactions ({Path(file_path).name})")
+    return transactions_df
+
+
+def extract_transactions(file_pattern: str = TRANSACTION_FILE_PATTERN) -> pd.DataFrame:
+    files = list_transaction_files(file_pattern)
+    if len(files) == 1:
+        return extract_transaction_file(files[0])
+    return pd.concat([extract_transaction_file(path) for path in files], ignore_index=True)
+
+
+def iter_transaction_chunks(
+    chunk_size: int, file_path: Optional[Path] = None
+) -> Iterator[pd.DataFrame]:
+    # Streams the transaction shards (or a single file) in fixed-size chunks for the
+    # bounded-memory pipeline. Values are read as raw text so every chunk hashes and
+    # parses the same way, no matter which dtypes pandas would have guessed for that
+    # slice of the file.
+    files = [file_path] if file_path else list_transaction_files()
+    for path in files:
+        reader = pd.read_csv(path, chunksize=chunk_size, dtype=str)
+        for chunk_idx, chunk in enumerate(reader):
+            if chunk_idx == 0:
+                _validate_schema(chunk, EXPECTED_TRANSACTION_COLUMNS, f"transactions ({Path(path).name})")
+            yield chunk
+
+
+
+def extract_transactions_since(
+    file_path: Path, start_offset: int = 0, read_to_eof: bool = False
+) -> Tuple[pd.DataFrame, int]:
+    # Reads only the rows appended to a raw file after start_offset (a byte position at
+    # a line boundary, as returned by a previous call). A trailing line without newline
+    # may still be in the middle of being written, so it is left for the next run,
+    # unless read_to_eof: then the end of the file ends the last line (full rebuilds, and
+    # files that did not change since the previous run).
+    # Returns the raw rows as text and the byte offset up to which the file was read.
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        f.seek(max(start_offset, len(header)))
+        data = f.read()
+
+    complete = len(data) if read_to_eof else data.rfind(b"\n") + 1
+    end_offset = max(start_offset, len(header)) + complete
+    if not header.endswith(b"\n"):
+        header += b"\n"
+    transactions_df = pd.read_csv(io.BytesIO(header + data[:complete]), dtype=str)
     _validate_schema(transactions_df, EXPECTED_TRANSACTION_COLUMNS, "transactions")
-    return transactions_df
\ No newline at end of file
+    return transactions_df, end_offset
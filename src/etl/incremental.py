@@ -0,0 +1,295 @@
+'''
+Incremental (watermark based) variant of the ETL.
+
+Instead of re-extracting and re-transforming every raw file on each refresh, a small
+state is persisted next to the silver tables:
+
+- a manifest with, per raw file, how far it has been read (byte offset at a line
+  boundary) plus fingerprints to detect files that were rewritten instead of appended to
+- the high-water mark of the silver transactions (max timestamp and transaction_id)
+- the fingerprints of every raw transaction row seen so far, so exact duplicates are
+  still removed when the copies arrive in different refreshes
+
+On a refresh only the bytes appended since the last run are extracted and cleaned, then
+merged into the existing silver table; new shard files are read from the start. If a raw
+file was rewritten, removed, or the state is missing, the silver layer is rebuilt from scratch (and the state re-initialised).
+'''
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from etl.extract import RAW_DATA_PATH, extract_customers, extract_transactions_since, list_transaction_files
+from etl.load import find_table_path, load_processed_data, save_dataframe
+from etl.transform import (
+    RAW_HASH_COLUMN,
+    TRANSACTION_SORT_KEY,
+    add_raw_row_hash,
+    clean_transactions,
+    parse_raw_ids,
+    transform_customers,
+    transform_transactions,
+)
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = Path("data/processed_silver/_state")
+MANIFEST_FILE = "etl_manifest.json"
+ROW_HASHES_FILE = "transaction_row_hashes.npy"
+# Cleaned transactions added by the last incremental run (used by the gold layer)
+DELTA_TABLE = "transactions_delta"
+MANIFEST_VERSION = 1
+
+# Bytes right before the read offset that are fingerprinted to detect rewritten files
+FINGERPRINT_WINDOW = 64 * 1024
+
+
+def _transaction_files() -> list:
+    return list_transaction_files()
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _prefix_fingerprint(path: Path, offset: int) -> str:
+    # Fingerprint of the header line and the bytes right before offset. If either changed,
+    # the file was rewritten rather than appended to.
+    with open(path, "rb") as f:
+        header = f.readline()
+        f.seek(max(0, offset - FINGERPRINT_WINDOW))
+        tail = f.read(min(offset, FINGERPRINT_WINDOW))
+    return hashlib.sha256(header + tail).hexdigest()
+
+
+def _file_entry(path: Path, end_offset: int) -> dict:
+    # Read position and fingerprint of a raw file, plus its stat to tell whether it
+    # changed at all before the next run
+    stat = path.stat()
+    return {
+        "offset": end_offset,
+        "fingerprint": _prefix_fingerprint(path, end_offset),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def _unchanged_since(path: Path, entry: Optional[dict]) -> bool:
+    # A file untouched since the previous run is not being written: its last line is
+    # complete even without a trailing newline
+    if entry is None:
+        return False
+    stat = path.stat()
+    return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+
+
+def load_state(state_dir: Path = STATE_DIR) -> Optional[dict]:
+    manifest_path = Path(state_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    manifest = json.loads(manifest_path.read_text())
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def _save_state(manifest: dict, row_hashes: np.ndarray, state_dir: Path = STATE_DIR) -> None:
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    # Hashes first: a manifest without matching hashes would skip deduplication
+    np.save(state_dir / ROW_HASHES_FILE, row_hashes)
+    tmp_path = state_dir / (MANIFEST_FILE + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, default=str))
+    tmp_path.replace(state_dir / MANIFEST_FILE)
+
+
+def _load_row_hashes(state_dir: Path = STATE_DIR) -> np.ndarray:
+    return np.load(Path(state_dir) / ROW_HASHES_FILE)
+
+
+def load_last_delta(state_dir: Path = STATE_DIR) -> Optional[pd.DataFrame]:
+    """
+    Returns the cleaned transactions merged by the last incremental run,
+    or None if the last run was a full rebuild (or there is no state yet).
+    """
+    manifest = load_state(state_dir)
+    if manifest is None or manifest["last_run"]["full_rebuild"]:
+        return None
+    return load_processed_data(DELTA_TABLE, base_path=str(state_dir))
+
+
+def _isin_sorted(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # Membership test against a sorted array without building a set
+    if len(sorted_values) == 0:
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(sorted_values, values).clip(max=len(sorted_values) - 1)
+    return sorted_values[positions] == values
+
+
+def _watermark(transactions_df: pd.DataFrame) -> dict:
+    if transactions_df.empty:
+        return {"max_timestamp": None, "max_transaction_id": None}
+    return {
+        "max_timestamp": str(transactions_df['timestamp'].max()),
+        "max_transaction_id": int(transactions_df['transaction_id'].max()),
+    }
+
+
+def _plan_transaction_files(manifest: Optional[dict]) -> Optional[dict]:
+    """
+    Works out from which byte offset each raw transaction file has to be read.
+    Returns None when a full rebuild is needed.
+    """
+    if manifest is None:
+        return None
+    files = {str(path): path for path in _transaction_files()}
+    if not set(manifest["files"]) <= set(files):
+        logger.info("Raw transaction files were removed, full rebuild needed")
+        return None
+
+    offsets = {}
+    for name, path in files.items():
+        # New shards (e.g. the file of a new day) are read from the start
+        entry = manifest["files"].get(name)
+        if entry is None:
+            logger.info(f"New raw transaction file {name}")
+            offsets[name] = 0
+            continue
+        if path.stat().st_size < entry["offset"] or _prefix_fingerprint(path, entry["offset"]) != entry["fingerprint"]:
+            logger.info(f"{name} was rewritten, full rebuild needed")
+            return None
+        offsets[name] = entry["offset"]
+    return offsets
+
+
+def _previous_run_id(state_dir: Path) -> int:
+    # run_id keeps increasing across full rebuilds (also when the old manifest is
+    # outdated), so consumers never mistake a rebuilt silver layer for one they processed
+    manifest_path = Path(state_dir) / MANIFEST_FILE
+    try:
+        return int(json.loads(manifest_path.read_text()).get("run_id", 0))
+    except (FileNotFoundError, ValueError, TypeError, AttributeError):
+        return 0
+
+
+def _full_rebuild(state_dir: Path) -> tuple:
+    logger.info("Running full ETL rebuild...")
+    customers_file = RAW_DATA_PATH / "customers.csv"
+    cleaned_customers = transform_customers(extract_customers())
+
+    raw_parts, files = [], {}
+    for path in _transaction_files():
+        raw_df, end_offset = extract_transactions_since(path, 0, read_to_eof=True)
+        raw_parts.append(raw_df)
+        files[str(path)] = _file_entry(path, end_offset)
+
+    raw_transactions = parse_raw_ids(add_raw_row_hash(pd.concat(raw_parts, ignore_index=True)))
+    row_hashes = np.unique(raw_transactions[RAW_HASH_COLUMN].to_numpy(dtype='uint64'))
+    cleaned_transactions = transform_transactions(raw_transactions).drop(columns=[RAW_HASH_COLUMN])
+
+    save_dataframe(cleaned_customers, "processed_customers")
+    save_dataframe(cleaned_transactions, "processed_transactions")
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "run_id": _previous_run_id(state_dir) + 1,
+        "customers": {"path": str(customers_file), "sha256": _sha256_file(customers_file)},
+        "files": files,
+        "watermark": _watermark(cleaned_transactions),
+        "last_run": {"full_rebuild": True, "delta_rows": len(cleaned_transactions)},
+    }
+    _save_state(manifest, row_hashes, state_dir)
+    return cleaned_customers, cleaned_transactions
+
+
+def run_incremental_etl(state_dir: Path = STATE_DIR, full_rebuild: bool = False) -> tuple:
+    """
+    Brings the silver tables up to date with the raw files, processing only the data
+    that arrived since the previous run. Returns the full (customers, transactions)
+    silver tables like the regular pipeline. full_rebuild=True ignores the stored state
+    and rebuilds the silver layer (and the state) from scratch.
+    """
+    state_dir = Path(state_dir)
+    if full_rebuild:
+        return _full_rebuild(state_dir)
+    manifest = load_state(state_dir)
+    offsets = _plan_transaction_files(manifest)
+    try:
+        find_table_path("processed_transactions")
+    except FileNotFoundError:
+        offsets = None
+    if offsets is None:
+        return _full_rebuild(state_dir)
+
+    # --- Customers: small, re-transformed only when the raw file changed ---
+    customers_file = RAW_DATA_PATH / "customers.csv"
+    customers_sha = _sha256_file(customers_file)
+    if customers_sha != manifest["customers"]["sha256"]:
+        logger.info("Customer file changed, re-transforming customers...")
+        cleaned_customers = transform_customers(extract_customers())
+        save_dataframe(cleaned_customers, "processed_customers")
+    else:
+        cleaned_customers = load_processed_data("processed_customers")
+
+    # --- Transactions: only the appended bytes of each file ---
+    raw_parts, files = [], {}
+    for name, offset in offsets.items():
+        path = Path(name)
+        read_to_eof = _unchanged_since(path, manifest["files"].get(name))
+        raw_df, end_offset = extract_transactions_since(path, offset, read_to_eof=read_to_eof)
+        raw_parts.append(raw_df)
+        files[name] = _file_entry(path, end_offset)
+    raw_delta = pd.concat(raw_parts, ignore_index=True)
+    logger.info(f"Found {len(raw_delta)} new raw transactions since the last run")
+
+    existing_transactions = load_processed_data("processed_transactions")
+    row_hashes = _load_row_hashes(state_dir)
+
+    if raw_delta.empty:
+        delta = existing_transactions.iloc[0:0]
+        cleaned_transactions = existing_transactions
+    else:
+        # Exact duplicates: within the delta and against every row seen in earlier runs
+        raw_delta = parse_raw_ids(add_raw_row_hash(raw_delta))
+        delta_hashes = raw_delta[RAW_HASH_COLUMN].to_numpy(dtype='uint64')
+        duplicates = _isin_sorted(row_hashes, delta_hashes) | raw_delta[RAW_HASH_COLUMN].duplicated().to_numpy()
+        if duplicates.any():
+            logger.info(f"Removed {int(duplicates.sum())} duplicate transactions")
+        row_hashes = np.union1d(row_hashes, delta_hashes)
+
+        delta = clean_transactions(raw_delta[~duplicates]).drop(columns=[RAW_HASH_COLUMN])
+
+        watermark_ts = manifest["watermark"]["max_timestamp"]
+        if watermark_ts is not None and len(delta):
+            late_rows = int((delta['timestamp'] <= pd.Timestamp(watermark_ts)).sum())
+            if late_rows:
+                logger.info(f"{late_rows} new transactions are older than the watermark {watermark_ts}")
+
+        # Merge into the existing silver table; the stable sort keeps the existing order for ties
+        cleaned_transactions = pd.concat([existing_transactions, delta], ignore_index=True)
+        cleaned_transactions = cleaned_transactions.sort_values(by=TRANSACTION_SORT_KEY, kind='stable')
+        cleaned_transactions = cleaned_transactions.reset_index(drop=True)
+        save_dataframe(cleaned_transactions, "processed_transactions")
+
+    save_dataframe(delta, DELTA_TABLE, base_path=str(state_dir))
+    manifest.update({
+        "run_id": manifest["run_id"] + 1,
+        "customers": {"path": str(customers_file), "sha256": customers_sha},
+        "files": files,
+        "watermark": _watermark(cleaned_transactions),
+        "last_run": {"full_rebuild": False, "delta_rows": len(delta)},
+    })
+    _save_state(manifest, row_hashes, state_dir)
+    logger.info(
+        f"Merged {len(delta)} new transactions, watermark is now {manifest['watermark']['max_timestamp']}"
+    )
+    return cleaned_customers, cleaned_transactions
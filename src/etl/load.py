@@ -1,29 +1,295 @@
+'''
+Load module that persists the silver and gold tables.
+
+Storage is pluggable: every format is a small backend class registered in
+STORAGE_BACKENDS. Parquet is the default because it keeps the dtypes (timestamps,
+nullable Int64 ids, booleans), compresses well and supports column projection and
+predicate pushdown on read. CSV is still available for accessibility.
+
+Table names are passed without an extension (e.g. "processed_customers");
+the backend adds its own. A ".csv" suffix on the name is ignored for compatibility.
+'''
+import hashlib
 import logging
+import shutil
 import pandas as pd
 from pathlib import Path
+from typing import Iterable, List, Optional
+from instrumentation import track_stage
 
 logger = logging.getLogger(__name__)
 
-def save_dataframe(df: pd.DataFrame, filename: str, base_path: str = "data/processed_silver") -> str:
+DEFAULT_STORAGE_FORMAT = "parquet"
+PARQUET_COMPRESSION = "zstd"
+
+# Partitioning by "month" uses the month of the timestamp column
+MONTH_PARTITION = "month"
+# Hidden columns of partitioned tables. The partition key is a copy of the partitioned
+# value, so the real column keeps its dtype and position; the row order column keeps
+# the original order (partitions are read back one after another). Directory names
+# must not start with "_", pyarrow skips those as hidden files.
+PARTITION_COLUMN = "partition_key"
+ROW_ORDER_COLUMN = "_row_order"
+
+
+def _apply_filters(df: pd.DataFrame, filters: Optional[List[tuple]]) -> pd.DataFrame:
+    # Row filtering for backends without predicate pushdown.
+    # Filters use the pyarrow notation: [("country", "==", "DK"), ("amount", ">", 100)]
+    if not filters:
+        return df
+    ops = {
+        "==": lambda s, v: s == v,
+        "=": lambda s, v: s == v,
+        "!=": lambda s, v: s != v,
+        ">": lambda s, v: s > v,
+        ">=": lambda s, v: s >= v,
+        "<": lambda s, v: s < v,
+        "<=": lambda s, v: s <= v,
+        "in": lambda s, v: s.isin(v),
+        "not in": lambda s, v: ~s.isin(v),
+    }
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        mask &= ops[op](df[column], value)
+    return df[mask]
+
+
+class CsvStorage:
+    extension = ".csv"
+
+    def save(self, df: pd.DataFrame, path: Path, partition_by: Optional[str] = None) -> None:
+        if partition_by:
+            logger.warning(f"CSV storage does not support partitioning, ignoring partition_by={partition_by}")
+        df.to_csv(path, index=False)
+
+    def save_chunks(self, chunks: Iterable[pd.DataFrame], path: Path) -> int:
+        rows = 0
+        for chunk_idx, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode="w" if chunk_idx == 0 else "a", header=chunk_idx == 0, index=False)
+            rows += len(chunk)
+        if not path.exists():
+            raise ValueError("No data chunks were produced")
+        return rows
+
+    def load(self, path: Path, columns: Optional[List[str]] = None, filters: Optional[List[tuple]] = None) -> pd.DataFrame:
+        usecols = None
+        if columns is not None:
+            filter_columns = [f[0] for f in filters or []]
+            usecols = list(dict.fromkeys(list(columns) + filter_columns))
+        df = _apply_filters(pd.read_csv(path, usecols=usecols), filters)
+        return df[list(columns)] if columns is not None else df
+
+
+class ParquetStorage:
+    extension = ".parquet"
+
+    def save(self, df: pd.DataFrame, path: Path, partition_by: Optional[str] = None) -> None:
+        if not partition_by:
+            df.to_parquet(path, engine="pyarrow", compression=PARQUET_COMPRESSION, index=False)
+            return
+
+        # Partitioned tables are written as a directory of parquet files, one per value
+        df = df.reset_index(drop=True)
+        if partition_by == MONTH_PARTITION:
+            partition_values = pd.to_datetime(df["timestamp"]).dt.strftime("%Y-%m")
+        else:
+            partition_values = df[partition_by].astype(str)
+        df = df.assign(**{PARTITION_COLUMN: partition_values, ROW_ORDER_COLUMN: df.index})
+        df.to_parquet(
+            path,
+            engine="pyarrow",
+            compression=PARQUET_COMPRESSION,
+            index=False,
+            partition_cols=[PARTITION_COLUMN],
+        )
+
+    def save_chunks(self, chunks: Iterable[pd.DataFrame], path: Path) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        empty_chunk = None
+        rows = 0
+        try:
+            for chunk in chunks:
+                # Empty chunks carry no usable dtypes, so they don't define the schema
+                if chunk.empty:
+                    empty_chunk = chunk if empty_chunk is None else empty_chunk
+                    continue
+                if writer is None:
+                    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    writer = pq.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            if empty_chunk is None:
+                raise ValueError("No data chunks were produced")
+            empty_chunk.to_parquet(path, engine="pyarrow", index=False)
+        return rows
+
+    def load(self, path: Path, columns: Optional[List[str]] = None, filters: Optional[List[tuple]] = None) -> pd.DataFrame:
+        if not path.is_dir():
+            return pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters or None)
+
+        # Partitioned dataset: whole files are skipped using the filters and the
+        # min/max statistics of their row groups
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(list(columns) + [ROW_ORDER_COLUMN]))
+        df = pd.read_parquet(path, engine="pyarrow", columns=read_columns, filters=filters or None)
+
+        df = df.sort_values(ROW_ORDER_COLUMN, kind="stable")
+        df = df.drop(columns=[c for c in (PARTITION_COLUMN, ROW_ORDER_COLUMN) if c in df.columns])
+        return df.reset_index(drop=True)
+
+
+STORAGE_BACKENDS = {
+    "csv": CsvStorage(),
+    "parquet": ParquetStorage(),
+}
+
+
+def register_storage_backend(name: str, backend) -> None:
+    # Plug in an additional storage format (must provide extension, save, save_chunks and load)
+    STORAGE_BACKENDS[name] = backend
+
+
+def _get_backend(storage_format: Optional[str]):
+    storage_format = storage_format or DEFAULT_STORAGE_FORMAT
+    if storage_format not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage format '{storage_format}'. Available: {list(STORAGE_BACKENDS)}")
+    return STORAGE_BACKENDS[storage_format]
+
+
+def get_table_path(filename: str, base_path: str = "data/processed_silver", storage_format: Optional[str] = None) -> Path:
+    # Resolves a table name to its file path for the given storage format
+    backend = _get_backend(storage_format)
+    return Path(base_path) / (Path(filename).stem + backend.extension)
+
+
+def find_table_path(filename: str, base_path: str = "data/processed_silver", storage_format: Optional[str] = None):
+    """
+    Finds the stored file of a table. The requested (or default) format is tried first,
+    then the other registered formats, so tables written by older runs still load.
+    Returns (path, storage_format) or raises FileNotFoundError.
+    """
+    candidates = [storage_format or DEFAULT_STORAGE_FORMAT]
+    if storage_format is None:
+        candidates += [name for name in STORAGE_BACKENDS if name not in candidates]
+    for name in candidates:
+        path = get_table_path(filename, base_path, name)
+        if path.exists():
+            return path, name
+    raise FileNotFoundError(f"No stored table '{Path(filename).stem}' found in {base_path}")
+
+
+def table_version(filenames: Iterable[str], base_path: str = "data/processed_silver") -> Optional[str]:
     """
-    Saves a dataframe to the specified path. 
-    Using CSV for accessibility, but would use Parquet in a production environment 
-    for better schema preservation and compression.
+    Cheap version of stored tables: a hash of their paths, sizes and modification
+    times. Tables are replaced atomically on save, so every save changes it.
+    None if one of the tables doesn't exist.
+    """
+    parts = []
+    for filename in filenames:
+        try:
+            path, _ = find_table_path(filename, base_path)
+        except FileNotFoundError:
+            return None
+        stat = path.stat()
+        parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+
+def _remove_path(path: Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def _replace_path(tmp_path: Path, file_path: Path) -> None:
+    # Moves a finished file (or partitioned directory) into place
+    if file_path.is_dir() or (tmp_path.is_dir() and file_path.exists()):
+        _remove_path(file_path)
+    tmp_path.replace(file_path)
+
+
+def save_dataframe(
+    df: pd.DataFrame,
+    filename: str,
+    base_path: str = "data/processed_silver",
+    storage_format: Optional[str] = None,
+    partition_by: Optional[str] = None,
+) -> str:
+    """
+    Saves a dataframe to the specified path in the given storage format (Parquet by default).
+    partition_by can be a column name (e.g. "country") or "month" to partition
+    by the month of the timestamp column.
     """
     out_dir = Path(base_path)
     out_dir.mkdir(parents=True, exist_ok=True)
-    
-    file_path = out_dir / filename
-    
+
+    backend = _get_backend(storage_format)
+    file_path = get_table_path(filename, base_path, storage_format)
+    # Write to a temporary location first so readers never see a half-written table
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+
     try:
-        df.to_csv(file_path, index=False)
+        with track_stage(f"save_{Path(filename).stem}", rows_in=len(df)) as stage:
+            backend.save(df, tmp_path, partition_by=partition_by)
+            _replace_path(tmp_path, file_path)
+            stage.rows_out = len(df)
         logger.info(f"Successfully saved: {file_path}")
         return str(file_path)
     except Exception as e:
+        _remove_path(tmp_path)
         logger.error(f"Failed to save {filename}: {e}")
         raise
 
-def load_processed_data(filename: str, base_path: str = "data/processed_silver") -> pd.DataFrame:
-    #Helper to read data for the Feature Engineering phase.
-    file_path = Path(base_path) / filename
-    return pd.read_csv(file_path)
\ No newline at end of file
+def save_dataframe_chunks(
+    chunks: Iterable[pd.DataFrame],
+    filename: str,
+    base_path: str = "data/processed_silver",
+    storage_format: Optional[str] = None,
+) -> str:
+    """
+    Streams an iterable of dataframes into a single file, one chunk at a time,
+    so the full table never has to be held in memory.
+    """
+    out_dir = Path(base_path)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    backend = _get_backend(storage_format)
+    file_path = get_table_path(filename, base_path, storage_format)
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+
+    try:
+        with track_stage(f"save_{Path(filename).stem}") as stage:
+            rows = backend.save_chunks(chunks, tmp_path)
+            _replace_path(tmp_path, file_path)
+            stage.rows_out = rows
+        logger.info(f"Successfully saved: {file_path} ({rows} rows)")
+        return str(file_path)
+    except Exception as e:
+        _remove_path(tmp_path)
+        logger.error(f"Failed to save {filename}: {e}")
+        raise
+
+def load_processed_data(
+    filename: str,
+    base_path: str = "data/processed_silver",
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[tuple]] = None,
+    storage_format: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Reads a stored table. columns restricts the columns that are read and filters
+    (pyarrow notation, e.g. [("country", "==", "DK")]) restricts the rows. For Parquet
+    both are pushed down into the reader.
+    """
+    file_path, found_format = find_table_path(filename, base_path, storage_format)
+    return STORAGE_BACKENDS[found_format].load(file_path, columns=columns, filters=filters)
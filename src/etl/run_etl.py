@@ -2,44 +2,119 @@ import logging
 from etl.extract import extract_customers, extract_transactions
 from etl.transform import transform_customers, transform_transactions
 from etl.load import save_dataframe
+from etl.streaming import stream_transactions
+from etl.incremental import run_incremental_etl
+from etl.sharded import transform_transaction_shards
+from instrumentation import instrumented_run, track_stage
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def run_etl_pipeline():
+def run_etl_pipeline(
+    streaming: bool = False,
+    chunk_size: int = None,
+    memory_limit_mb: float = None,
+    incremental: bool = False,
+    low_memory: bool = False,
+    parallel: bool = False,
+    max_workers: int = None,
+    full_rebuild: bool = False,
+):
     """
     Main entry point for the ETL process.
     Coordinates extraction, transformation, and loading.
+
+    With streaming=True the transactions are processed in fixed-size chunks
+    (chunk_size rows, or derived from memory_limit_mb) and written straight to the
+    silver layer. In that mode the second return value is the path of the silver
+    transactions file instead of a DataFrame.
+
+    With incremental=True only the raw data added since the previous run is
+    processed and merged into the existing silver tables (see etl.incremental).
+    full_rebuild=True rebuilds them from scratch instead and re-initialises the state.
+
+    With low_memory=True the in-memory transforms avoid defensive copies and
+    use compact dtypes (categoricals, downcast ids) for the returned tables.
+
+    With parallel=True every raw transaction shard (data/raw/csv/transactions*.csv)
+    is extracted and cleaned in its own worker process (max_workers, one per CPU by
+    default). Shards that fail validation are logged and skipped.
     """
     try:
-        logger.info("Starting ETL Pipeline...")
+        with instrumented_run("etl"):
+            return _run_etl(streaming, chunk_size, memory_limit_mb, incremental, low_memory, parallel, max_workers, full_rebuild)
+    except Exception as e:
+        logger.error(f"ETL Pipeline failed: {e}")
+        raise
+
+def _run_etl(streaming, chunk_size, memory_limit_mb, incremental, low_memory, parallel, max_workers, full_rebuild=False):
+    logger.info("Starting ETL Pipeline...")
 
-        # --- STEP 1: EXTRACT ---
-        logger.info("Extracting raw data...")
+    if sum([streaming, incremental, parallel]) > 1:
+        raise ValueError("streaming, incremental and parallel modes cannot be combined")
+    if streaming:
+        return _run_streaming_etl(chunk_size, memory_limit_mb)
+    if incremental:
+        with track_stage("incremental_etl"):
+            cleaned_customers, cleaned_transactions = run_incremental_etl(full_rebuild=full_rebuild)
+        logger.info(f"ETL Pipeline completed successfully.")
+        return cleaned_customers, cleaned_transactions
+
+    # --- STEP 1: EXTRACT ---
+    logger.info("Extracting raw data...")
+    with track_stage("extract_customers") as stage:
         raw_customers = extract_customers()
-        raw_transactions = extract_transactions()
+        stage.rows_out = len(raw_customers)
 
-        # --- STEP 2: TRANSFORM ---
-        logger.info("Transforming Customer data...")
-        cleaned_customers = transform_customers(raw_customers)
+    # --- STEP 2: TRANSFORM ---
+    logger.info("Transforming Customer data...")
+    cleaned_customers = transform_customers(raw_customers, low_memory=low_memory)
 
+    if parallel:
+        # Extract and transform per shard in a process pool
+        # (the workers' own steps are not part of the run report)
+        with track_stage("transform_transaction_shards") as stage:
+            cleaned_transactions, _ = transform_transaction_shards(max_workers=max_workers, low_memory=low_memory)
+            stage.rows_out = len(cleaned_transactions)
+    else:
+        with track_stage("extract_transactions") as stage:
+            raw_transactions = extract_transactions()
+            stage.rows_out = len(raw_transactions)
         logger.info("Transforming Transaction data...")
-        cleaned_transactions = transform_transactions(raw_transactions)
+        cleaned_transactions = transform_transactions(raw_transactions, low_memory=low_memory)
 
-        # --- STEP 3: LOAD ---
-        logger.info("Saving processed data to storage...")
-        customer_path = save_dataframe(cleaned_customers, "processed_customers.csv")
-        transaction_path = save_dataframe(cleaned_transactions, "processed_transactions.csv")
+    # --- STEP 3: LOAD ---
+    logger.info("Saving processed data to storage...")
+    customer_path = save_dataframe(cleaned_customers, "processed_customers")
+    transaction_path = save_dataframe(cleaned_transactions, "processed_transactions")
 
-        logger.info(f"ETL Pipeline completed successfully.")
-        
-        # Return the DataFrames so they can be used immediately by 
-        # Feature Engineering or RAG modules without re-reading files.
-        return cleaned_customers, cleaned_transactions
+    logger.info(f"ETL Pipeline completed successfully.")
+    
+    # Return the DataFrames so they can be used immediately by 
+    # Feature Engineering or RAG modules without re-reading files.
+    return cleaned_customers, cleaned_transactions
 
-    except Exception as e:
-        logger.error(f"ETL Pipeline failed: {e}")
-        raise
+def _run_streaming_etl(chunk_size, memory_limit_mb):
+    # Customers are small enough to stay in memory, transactions are streamed
+    logger.info("Extracting and transforming Customer data...")
+    with track_stage("extract_customers") as stage:
+        raw_customers = extract_customers()
+        stage.rows_out = len(raw_customers)
+    cleaned_customers = transform_customers(raw_customers)
+    save_dataframe(cleaned_customers, "processed_customers")
+
+    logger.info("Streaming Transaction data...")
+    with track_stage("stream_transactions") as stage:
+        result = stream_transactions(
+            "processed_transactions",
+            chunk_size=chunk_size,
+            memory_limit_mb=memory_limit_mb,
+        )
+        stage.rows_in = result["rows_read"]
+        stage.rows_out = result["rows_written"]
+
+    logger.info(f"ETL Pipeline completed successfully.")
+    return cleaned_customers, result["path"]
 
 if __name__ == "__main__":
     run_etl_pipeline()
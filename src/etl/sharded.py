@@ -0,0 +1,112 @@
+'''
+Parallel variant of the transactions ETL for raw data split over many files.
+
+Transactions arrive as shards (e.g. one file per day) matching a glob like
+"transactions*.csv". Every shard is extracted and cleaned on its own in a process pool:
+
+1. Read the shard as raw text, validate its schema and fingerprint every row
+2. Clean it with the same row-level steps as transform.py (steps 2-6)
+
+The cleaned shards are then merged into the silver table: exact duplicates are removed
+across shards using the raw row fingerprints (the first occurrence, in file order, is
+kept) and the result is sorted by customer_id/timestamp.
+
+A shard that fails (missing columns, unreadable file) is reported and skipped, the
+healthy shards are still processed.
+'''
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from etl.extract import TRANSACTION_FILE_PATTERN, extract_transaction_file, list_transaction_files
+from etl.transform import (
+    RAW_HASH_COLUMN,
+    TRANSACTION_SORT_KEY,
+    add_raw_row_hash,
+    clean_transactions,
+    compact_dtypes,
+    parse_raw_ids,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _process_shard(file_path: Path, low_memory: bool = False) -> dict:
+    # Runs in a worker process. Errors are returned instead of raised, so one bad
+    # shard doesn't cancel the others.
+    try:
+        raw_df = extract_transaction_file(file_path, dtype=str)
+    except (ValueError, OSError) as e:
+        # ValueError covers the schema validation and pandas parser errors
+        return {"path": str(file_path), "rows_in": 0, "data": None, "error": str(e)}
+
+    rows_in = len(raw_df)
+    raw_df = parse_raw_ids(add_raw_row_hash(raw_df))
+    # Duplicates within the shard are dropped early, to ship less data back
+    raw_df = raw_df.drop_duplicates(subset=[RAW_HASH_COLUMN])
+    cleaned = clean_transactions(raw_df, low_memory=low_memory)
+    return {"path": str(file_path), "rows_in": rows_in, "data": cleaned, "error": None}
+
+
+def _merge_shards(shards: List[pd.DataFrame]) -> pd.DataFrame:
+    df = pd.concat(shards, ignore_index=True)
+
+    # Cross-shard exact duplicates
+    duplicates = df[RAW_HASH_COLUMN].duplicated()
+    if duplicates.any():
+        logger.info(f"Removed {int(duplicates.sum())} duplicate transactions across shards")
+        df = df[~duplicates]
+
+    # Stable sort, so ties keep the file order of the shards
+    df = df.sort_values(by=TRANSACTION_SORT_KEY, kind='stable')
+    return df.drop(columns=[RAW_HASH_COLUMN]).reset_index(drop=True)
+
+
+def transform_transaction_shards(
+    file_pattern: str = TRANSACTION_FILE_PATTERN,
+    max_workers: Optional[int] = None,
+    low_memory: bool = False,
+) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    Extracts and cleans every shard matching file_pattern in parallel (max_workers
+    processes, one per CPU by default) and merges them into the sorted silver
+    transactions table. Returns (transactions, errors) where errors maps the path of
+    every failed shard to its error message. Raises ValueError if no shard succeeded.
+    """
+    files = list_transaction_files(file_pattern)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(files))
+    logger.info(f"Processing {len(files)} transaction shards with {max_workers} workers...")
+
+    if max_workers == 1:
+        results = [_process_shard(path, low_memory) for path in files]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # map keeps the file order, which decides which duplicate is kept
+            results = list(executor.map(_process_shard, files, [low_memory] * len(files)))
+
+    errors = {}
+    shards = []
+    for result in results:
+        if result["error"] is not None:
+            logger.error(f"Skipping shard {result['path']}: {result['error']}")
+            errors[result["path"]] = result["error"]
+        else:
+            shards.append(result["data"])
+
+    if not shards:
+        raise ValueError(f"All {len(files)} transaction shards failed: {errors}")
+
+    transactions = _merge_shards(shards)
+    if low_memory:
+        # Categoricals of different shards only concatenate to plain objects
+        transactions = compact_dtypes(transactions)
+    logger.info(
+        f"Merged {len(shards)} shards into {len(transactions)} transactions "
+        f"({len(errors)} shards failed)"
+    )
+    return transactions, errors
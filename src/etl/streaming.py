@@ -0,0 +1,212 @@
+'''
+Bounded-memory (streaming) variant of the transactions ETL.
+
+The in-memory pipeline needs the whole transactions table, plus a few copies of it,
+in RAM at once. This module processes the raw file in fixed-size chunks instead:
+
+1. Read a chunk of raw rows and fingerprint each row (for exact-duplicate detection)
+2. Validate and clean the chunk with the same row-level steps as transform.py
+3. Sort the chunk by customer_id/timestamp and spill it to disk as a sorted "run"
+4. K-way merge the runs block by block into the silver table
+
+Because every run is sorted by (customer_id, timestamp, row hash), exact duplicates
+always meet each other during the merge, even when they were read in different chunks.
+Memory use is bounded by the chunk size, not by the size of the file.
+'''
+
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from etl.extract import iter_transaction_chunks, list_transaction_files
+from etl.load import save_dataframe_chunks
+from etl.transform import (
+    RAW_HASH_COLUMN,
+    TRANSACTION_SORT_KEY,
+    add_raw_row_hash,
+    clean_transactions,
+    parse_raw_ids,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 250_000
+# Smallest chunk we are willing to use, even under a very tight memory limit
+MIN_CHUNK_SIZE = 10_000
+# Cleaning a chunk creates a few transient copies of it (type conversions, filters)
+WORKING_SET_FACTOR = 4
+# Maximum number of runs merged at once; more runs are merged in several passes
+MAX_MERGE_FANIN = 32
+# Lower bound for the run block size, tiny blocks make the merge rounds overhead-bound
+MIN_BLOCK_SIZE = 5_000
+
+MERGE_KEY = TRANSACTION_SORT_KEY + [RAW_HASH_COLUMN]
+
+
+def estimate_chunk_size(memory_limit_mb: float, file_path: Optional[Path] = None, sample_rows: int = 10_000) -> int:
+    # Derives a chunk size from a memory ceiling by measuring a sample of the raw file.
+    file_path = file_path or list_transaction_files()[0]
+    sample = pd.read_csv(file_path, nrows=sample_rows, dtype=str)
+    if sample.empty:
+        return DEFAULT_CHUNK_SIZE
+
+    bytes_per_row = sample.memory_usage(deep=True, index=False).sum() / len(sample)
+    budget = memory_limit_mb * 1024 * 1024
+    chunk_size = int(budget / (bytes_per_row * WORKING_SET_FACTOR))
+    return max(MIN_CHUNK_SIZE, chunk_size)
+
+
+def _write_run(df: pd.DataFrame, run_dir: Path, block_size: int) -> Path:
+    # Spills a sorted run to disk as a sequence of pickled blocks (keeps dtypes intact)
+    run_dir.mkdir(parents=True)
+    for block_idx, start in enumerate(range(0, len(df), block_size)):
+        df.iloc[start:start + block_size].to_pickle(run_dir / f"block_{block_idx:06d}.pkl")
+    return run_dir
+
+
+def _iter_run_blocks(run_dir: Path) -> Iterator[pd.DataFrame]:
+    for block_path in sorted(run_dir.glob("block_*.pkl")):
+        yield pd.read_pickle(block_path)
+
+
+def _rows_up_to(block: pd.DataFrame, frontier: tuple) -> int:
+    # Number of leading rows in a sorted block whose merge key is <= frontier
+    f_cid, f_ts, f_hash = frontier
+    cid = block['customer_id'].to_numpy(dtype='int64')
+    ts = block['timestamp'].to_numpy(dtype='datetime64[ns]')
+    row_hash = block[RAW_HASH_COLUMN].to_numpy(dtype='uint64')
+    le_frontier = (cid < f_cid) | (
+        (cid == f_cid) & ((ts < f_ts) | ((ts == f_ts) & (row_hash <= f_hash)))
+    )
+    return int(np.count_nonzero(le_frontier))
+
+
+def _last_key(block: pd.DataFrame) -> tuple:
+    last = block.iloc[-1]
+    return (
+        np.int64(last['customer_id']),
+        np.datetime64(last['timestamp'], 'ns'),
+        np.uint64(last[RAW_HASH_COLUMN]),
+    )
+
+
+def _merge_runs(run_dirs: List[Path], stats: dict) -> Iterator[pd.DataFrame]:
+    """
+    K-way merges sorted runs, yielding sorted, de-duplicated blocks.
+
+    Each round takes the smallest "last key" among the buffered blocks as the frontier.
+    Every row with a key <= frontier is guaranteed to be buffered already, so those rows
+    can be merged and emitted. Duplicates share the full merge key, so they are always
+    emitted in the same round.
+    """
+    readers = [_iter_run_blocks(run_dir) for run_dir in run_dirs]
+    buffers = [next(reader, None) for reader in readers]
+
+    while any(buffer is not None for buffer in buffers):
+        active = [i for i, buffer in enumerate(buffers) if buffer is not None]
+        frontier = min(_last_key(buffers[i]) for i in active)
+
+        parts = []
+        for i in active:
+            upto = _rows_up_to(buffers[i], frontier)
+            parts.append(buffers[i].iloc[:upto])
+            rest = buffers[i].iloc[upto:]
+            buffers[i] = rest if len(rest) else next(readers[i], None)
+
+        merged = pd.concat(parts).sort_values(by=MERGE_KEY, kind='stable')
+        duplicates = merged[RAW_HASH_COLUMN].duplicated()
+        stats['duplicates_removed'] += int(duplicates.sum())
+        yield merged[~duplicates]
+
+
+def _merge_in_passes(run_dirs: List[Path], spill_dir: Path, block_size: int, stats: dict) -> List[Path]:
+    # Reduces the number of runs to MAX_MERGE_FANIN so the final merge stays bounded
+    merge_pass = 0
+    while len(run_dirs) > MAX_MERGE_FANIN:
+        merged_dirs = []
+        for group_idx, start in enumerate(range(0, len(run_dirs), MAX_MERGE_FANIN)):
+            group = run_dirs[start:start + MAX_MERGE_FANIN]
+            out_dir = spill_dir / f"pass_{merge_pass:02d}_run_{group_idx:05d}"
+            out_dir.mkdir(parents=True)
+            block_idx = 0
+            for merged in _merge_runs(group, stats):
+                for start_row in range(0, len(merged), block_size):
+                    merged.iloc[start_row:start_row + block_size].to_pickle(out_dir / f"block_{block_idx:06d}.pkl")
+                    block_idx += 1
+            for run_dir in group:
+                shutil.rmtree(run_dir)
+            merged_dirs.append(out_dir)
+        run_dirs = merged_dirs
+        merge_pass += 1
+    return run_dirs
+
+
+def stream_transactions(
+    output_filename: str = "processed_transactions",
+    base_path: str = "data/processed_silver",
+    chunk_size: Optional[int] = None,
+    memory_limit_mb: Optional[float] = None,
+    spill_dir: Optional[str] = None,
+) -> dict:
+    """
+    Extracts, validates, cleans, de-duplicates and sorts transactions chunk by chunk
+    and writes the silver table. Either pass a fixed chunk_size or a memory_limit_mb
+    from which the chunk size is derived.
+
+    Returns a dict with the output path and row counts.
+    """
+    if chunk_size is None:
+        chunk_size = estimate_chunk_size(memory_limit_mb) if memory_limit_mb else DEFAULT_CHUNK_SIZE
+    # Runs are stored in small blocks so that MAX_MERGE_FANIN buffered blocks
+    # together are about one chunk in size
+    block_size = max(MIN_BLOCK_SIZE, chunk_size // MAX_MERGE_FANIN)
+    logger.info(f"Streaming transactions in chunks of {chunk_size} rows...")
+
+    stats = {"rows_read": 0, "rows_written": 0, "duplicates_removed": 0, "chunks": 0}
+    work_dir = Path(tempfile.mkdtemp(prefix="etl_runs_", dir=spill_dir))
+
+    try:
+        run_dirs = []
+        columns = None
+        for chunk_idx, raw_chunk in enumerate(iter_transaction_chunks(chunk_size)):
+            stats["rows_read"] += len(raw_chunk)
+            stats["chunks"] += 1
+
+            chunk = parse_raw_ids(add_raw_row_hash(raw_chunk))
+            duplicates = chunk[RAW_HASH_COLUMN].duplicated()
+            stats["duplicates_removed"] += int(duplicates.sum())
+            chunk = clean_transactions(chunk[~duplicates])
+            chunk = chunk.sort_values(by=MERGE_KEY, kind='stable')
+            columns = chunk.columns
+
+            if len(chunk):
+                run_dirs.append(_write_run(chunk, work_dir / f"run_{chunk_idx:05d}", block_size))
+
+        if columns is None:
+            raise ValueError("transactions file contains no rows")
+
+        run_dirs = _merge_in_passes(run_dirs, work_dir, block_size, stats)
+
+        def silver_blocks():
+            # Always yield at least one block so an empty result still gets a header
+            yield pd.DataFrame(columns=columns).drop(columns=[RAW_HASH_COLUMN])
+            for block in _merge_runs(run_dirs, stats):
+                stats["rows_written"] += len(block)
+                yield block.drop(columns=[RAW_HASH_COLUMN])
+
+        output_path = save_dataframe_chunks(silver_blocks(), output_filename, base_path=base_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if stats["duplicates_removed"]:
+        logger.info(f"Removed {stats['duplicates_removed']} duplicate transactions")
+    logger.info(
+        f"Streamed {stats['rows_read']} raw transactions in {stats['chunks']} chunks, "
+        f"wrote {stats['rows_written']} rows to {output_path}"
+    )
+    return {"path": output_path, **stats}
@@ -19,27 +19,58 @@ The reasonning will be written in another document
 customers_df and transactions_df are going to be merged at the end of the transformation
 '''
 
+import contextlib
 import pandas as pd
 import logging
+from instrumentation import track_stage
 
 logger = logging.getLogger(__name__)
 
+# Ordering of the silver transactions table
+TRANSACTION_SORT_KEY = ['customer_id', 'timestamp']
+# Helper column used to detect exact duplicates across chunks
+RAW_HASH_COLUMN = '_raw_hash'
+
+# Low-memory mode: low-cardinality text columns become categoricals
+# and id columns are downcast to the smallest integer type that fits.
+CATEGORICAL_COLUMNS = ['currency', 'category', 'country']
+DOWNCAST_INTEGER_COLUMNS = ['customer_id', 'transaction_id']
+
+def low_memory_context(low_memory: bool):
+    # Copy-on-write lets the intermediate frames share their data instead of copying it
+    # up front: the defensive copies become shallow (copy(deep=False)) and a column is
+    # only duplicated when it is actually modified, so the caller's frame is untouched.
+    if low_memory:
+        return pd.option_context('mode.copy_on_write', True)
+    return contextlib.nullcontext()
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    # Float columns stay float64, so amounts and EUR totals are unchanged.
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in DOWNCAST_INTEGER_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    return df
+
 #Standardizes categories and marks imputed/unknown values.
-def _handle_category_cleaning(transactions_df: pd.DataFrame) -> pd.DataFrame:
+def _handle_category_cleaning(transactions_df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
     # Funciton replaces missing values and 'unknown' to 'uncategorized'
     # Addds a flag to mark imputed/unknown categories for future analysis.
-    df = transactions_df.copy()
+    df = transactions_df.copy() if copy else transactions_df
     
-    df['is_category_imputed'] = df['category'].isna() | (df['category'].str.strip().str.lower() == 'unknown')
+    normalized = df['category'].str.strip().str.lower()
+    df['is_category_imputed'] = df['category'].isna() | (normalized == 'unknown')
     
-    df['category'] = df['category'].fillna('uncategorized').str.strip().str.lower()
+    df['category'] = normalized.fillna('uncategorized')
     df.loc[df['category'] == 'unknown', 'category'] = 'uncategorized'
     
     return df
 
-def _handle_currency_imputation(transactions_df: pd.DataFrame) -> pd.DataFrame:
+def _handle_currency_imputation(transactions_df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
     # impute missing currencies, by adding DKK to it. Reasoning can be found in the document   
-    df = transactions_df.copy()
+    df = transactions_df.copy() if copy else transactions_df
     
     df['is_currency_imputed'] = df['currency'].isna()
     
@@ -54,71 +85,132 @@ def _handle_currency_imputation(transactions_df: pd.DataFrame) -> pd.DataFrame:
 
 
 #Customers data is relatively clean, mainly needs type conversions.
-def transform_customers(customers_df: pd.DataFrame) -> pd.DataFrame:
-    
-    df = customers_df.copy()
+def transform_customers(customers_df: pd.DataFrame, low_memory: bool = False) -> pd.DataFrame:
     
-    df['signup_date'] = pd.to_datetime(df['signup_date'], errors='coerce')
-    df['customer_id'] = df['customer_id'].astype('Int64')
-    df['country'] = df['country'].str.upper()
-    df = df.dropna(subset=['customer_id'])
+    with low_memory_context(low_memory), track_stage("transform_customers", rows_in=len(customers_df)) as stage:
+        df = customers_df.copy(deep=not low_memory)
+        
+        df['signup_date'] = pd.to_datetime(df['signup_date'], errors='coerce')
+        df['customer_id'] = df['customer_id'].astype('Int64')
+        df['country'] = df['country'].str.upper()
+        df = df.dropna(subset=['customer_id'])
+
+        if low_memory:
+            df = compact_dtypes(df)
+        stage.rows_out = len(df)
     
     return df
 
-def transform_transactions(transactions_df: pd.DataFrame) -> pd.DataFrame:
-    
-    df = transactions_df.copy()
-    initial_rows = len(df)
-    
-    # 1. Remove exact duplicates
-    df = df.drop_duplicates()
-    if len(df) < initial_rows:
-        logger.info(f"Removed {initial_rows - len(df)} duplicate transactions")
-    
+def clean_transactions(transactions_df: pd.DataFrame, low_memory: bool = False) -> pd.DataFrame:
+    # Steps 2-6 of the transaction cleaning. Every step here only looks at one row
+    # at a time, so it can be applied to a chunk of the raw file on its own.
+    with low_memory_context(low_memory), track_stage("clean_transactions", rows_in=len(transactions_df)) as stage:
+        df = _clean_transaction_rows(transactions_df, low_memory)
+        stage.rows_out = len(df)
+        return df
+
+def _clean_transaction_rows(transactions_df: pd.DataFrame, low_memory: bool) -> pd.DataFrame:
+    df = transactions_df
+
     # 2. Drop transactions with missing customer_id
-    missing_customer_id = df['customer_id'].isna().sum()
-    df = df.dropna(subset=['customer_id'])
-    if missing_customer_id > 0:
-        logger.warning(f"Dropped {missing_customer_id} transactions with missing customer_id")
+    # (copied unless copy-on-write is active, callers may pass a slice of a larger frame)
+    with track_stage("2_drop_missing_customer_id", rows_in=len(df)) as stage:
+        missing_customer_id = df['customer_id'].isna().sum()
+        df = df.dropna(subset=['customer_id'])
+        if not low_memory:
+            df = df.copy()
+        if missing_customer_id > 0:
+            logger.warning(f"Dropped {missing_customer_id} transactions with missing customer_id")
+        stage.rows_out = len(df)
     
     # 3. Data type conversions
-    df['customer_id'] = df['customer_id'].astype('Int64')
-    df['transaction_id'] = df['transaction_id'].astype('Int64')
-    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-    df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-    
-    invalid_timestamp = df['timestamp'].isna().sum()
-    invalid_amount = df['amount'].isna().sum()
-    df = df.dropna(subset=['timestamp', 'amount'])
-    if invalid_timestamp > 0 or invalid_amount > 0:
-        logger.warning(
-            f"Dropped {invalid_timestamp} transactions with invalid timestamp, "
-            f"{invalid_amount} with invalid amount"
-        )
+    with track_stage("3_type_conversions", rows_in=len(df)) as stage:
+        df['customer_id'] = df['customer_id'].astype('Int64')
+        df['transaction_id'] = df['transaction_id'].astype('Int64')
+        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+        
+        invalid_timestamp = df['timestamp'].isna().sum()
+        invalid_amount = df['amount'].isna().sum()
+        df = df.dropna(subset=['timestamp', 'amount'])
+        if invalid_timestamp > 0 or invalid_amount > 0:
+            logger.warning(
+                f"Dropped {invalid_timestamp} transactions with invalid timestamp, "
+                f"{invalid_amount} with invalid amount"
+            )
+        stage.rows_out = len(df)
         
     # 4. Standardize currency codes to uppercase
-    df['currency'] = df['currency'].str.upper()
+    with track_stage("4_standardize_currency", rows_in=len(df)) as stage:
+        df['currency'] = df['currency'].str.upper()
+        stage.rows_out = len(df)
     
     # 5. Filter invalid data: Remove transactions with negative or zero amounts
-    invalid_amounts = (df['amount'] <= 0).sum()
-    df = df[df['amount'] > 0]
-    if invalid_amounts > 0:
-        logger.warning(f"Removed {invalid_amounts} transactions with non-positive amounts")
+    with track_stage("5_filter_invalid_amounts", rows_in=len(df)) as stage:
+        invalid_amounts = (df['amount'] <= 0).sum()
+        df = df[df['amount'] > 0]
+        if invalid_amounts > 0:
+            logger.warning(f"Removed {invalid_amounts} transactions with non-positive amounts")
+        stage.rows_out = len(df)
 
     # 6 handle missing category and currency
     logger.info("Handling missing currency and category fields...")
     
-    df = _handle_category_cleaning(df)
-    df = _handle_currency_imputation(df)
+    with track_stage("6_handle_missing_values", rows_in=len(df)) as stage:
+        df = _handle_category_cleaning(df, copy=not low_memory)
+        df = _handle_currency_imputation(df, copy=not low_memory)
+
+        if low_memory:
+            df = compact_dtypes(df)
+        stage.rows_out = len(df)
 
-    # 7. Sort and Group logically
-    # This groups by customer_id (ascending) and then by timestamp (oldest to newest)
-    logger.info("Sorting transactions by customer_id and timestamp...")
-    df = df.sort_values(by=['customer_id', 'timestamp'], ascending=[True, True])
-    
-    # reset index
-    df = df.reset_index(drop=True)
-    
-    
     return df
- 
+
+def parse_raw_ids(raw_df: pd.DataFrame) -> pd.DataFrame:
+    # Raw files read as text (chunked/incremental extraction) need numeric ids
+    # before the Int64 cast in clean_transactions
+    raw_df['customer_id'] = pd.to_numeric(raw_df['customer_id'], errors='coerce')
+    raw_df['transaction_id'] = pd.to_numeric(raw_df['transaction_id'], errors='coerce')
+    return raw_df
+
+def add_raw_row_hash(raw_df: pd.DataFrame) -> pd.DataFrame:
+    # Fingerprints every raw row so exact duplicates can still be found once the
+    # data has been split into chunks (or shards) and cleaned separately.
+    # The hash column travels through the cleaning steps untouched.
+    df = raw_df.copy()
+    columns = sorted(c for c in df.columns if c != RAW_HASH_COLUMN)
+    df[RAW_HASH_COLUMN] = pd.util.hash_pandas_object(
+        df[columns].astype(str), index=False
+    ).to_numpy()
+    return df
+
+def transform_transactions(transactions_df: pd.DataFrame, low_memory: bool = False) -> pd.DataFrame:
+    # low_memory=True: copy-on-write instead of defensive copies, compact dtypes
+    
+    with low_memory_context(low_memory), track_stage("transform_transactions", rows_in=len(transactions_df)) as outer:
+        df = transactions_df.copy(deep=not low_memory)
+        initial_rows = len(df)
+        
+        # 1. Remove exact duplicates
+        with track_stage("1_drop_duplicates", rows_in=initial_rows) as stage:
+            df = df.drop_duplicates()
+            if len(df) < initial_rows:
+                logger.info(f"Removed {initial_rows - len(df)} duplicate transactions")
+            stage.rows_out = len(df)
+        
+        # 2-6. Row level cleaning
+        df = _clean_transaction_rows(df, low_memory)
+
+        # 7. Sort and Group logically
+        # This groups by customer_id (ascending) and then by timestamp (oldest to newest)
+        logger.info("Sorting transactions by customer_id and timestamp...")
+        with track_stage("7_sort", rows_in=len(df)) as stage:
+            df = df.sort_values(by=TRANSACTION_SORT_KEY, ascending=[True, True])
+            
+            # reset index
+            df = df.reset_index(drop=True)
+            stage.rows_out = len(df)
+        outer.rows_out = len(df)
+    
+    
+    return df
\ No newline at end of file
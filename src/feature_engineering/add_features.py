@@ -1,6 +1,8 @@
 import pandas as pd
 import logging
 from etl.load import save_dataframe
+from etl.transform import compact_dtypes, low_memory_context
+from instrumentation import instrumented_run, track_stage
 
 logger = logging.getLogger(__name__)
 
@@ -8,6 +10,8 @@ logger = logging.getLogger(__name__)
 # Euro Conversion in 2020
 NORDIC_CURRENCY_MAP = {'FI': 'EUR', 'SE': 'SEK', 'NO': 'NOK', 'DK': 'DKK'}
 EXCHANGE_RATES = {'EUR': 1.0, 'SEK': 0.097, 'NOK': 0.093, 'DKK': 0.134}
+# Policy threshold from product_policy.txt
+HIGH_TICKET_THRESHOLD_EUR = 500
 
 def _calculate_base_metrics(df, snapshot_date):
     # helper for core aggregations
@@ -20,38 +24,88 @@ def _calculate_base_metrics(df, snapshot_date):
         recency_days=lambda x: (snapshot_date - x['last_tx_date']).dt.days
     ).reset_index()
 
-def run_feature_engineering(customers_df: pd.DataFrame, transactions_df: pd.DataFrame):
+def add_amount_eur(transactions: pd.DataFrame) -> pd.DataFrame:
+    # Convert to EUR using exchange rates (vectorized for performance)
+    # (astype: mapping a categorical currency column returns a categorical)
+    rates = transactions['currency'].map(EXCHANGE_RATES).astype('float64').fillna(1.0)
+    transactions['amount_eur'] = transactions['amount'] * rates
+    return transactions
+
+def cross_border_mismatches(transactions: pd.DataFrame, customers_df: pd.DataFrame):
+    # Vectorized check of the transaction currency against the customer's home currency.
+    # Returns the mismatch mask and the mask of transactions whose customer is known.
+    # A missing or unmapped country always counts as a mismatch.
+    countries = customers_df.drop_duplicates('customer_id').set_index('customer_id')['country']
+    is_known = transactions['customer_id'].isin(countries.index)
+    home_currency = transactions['customer_id'].map(countries).map(NORDIC_CURRENCY_MAP)
+    # Compared as plain objects, categoricals with different categories can't be compared
+    is_mismatch = transactions['currency'].to_numpy(dtype=object) != home_currency.to_numpy(dtype=object)
+    return pd.Series(is_mismatch, index=transactions.index), is_known
+
+def save_gold_tables(final_gold: pd.DataFrame, transactions: pd.DataFrame) -> None:
+    # Reuse your save function to write to the gold directory
+    save_dataframe(final_gold, "gold_customers", base_path="data/processed_gold", partition_by="country")
+    save_dataframe(transactions, "gold_transactions", base_path="data/processed_gold", partition_by="month")
+
+def run_feature_engineering(customers_df: pd.DataFrame, transactions_df: pd.DataFrame, low_memory: bool = False):
     # Main pipeline step for Gold Layer creation.
     logger.info("Starting feature engineering on provided Silver-layer DataFrames...")
     
+    with instrumented_run("feature_engineering"):
+        final_gold, transactions = compute_gold_features(customers_df, transactions_df, low_memory=low_memory)
+
+        save_gold_tables(final_gold, transactions)
+    logger.info(f"Feature engineering complete. Gold data saved.")
+    
+    return final_gold
+
+def compute_gold_features(customers_df: pd.DataFrame, transactions_df: pd.DataFrame, low_memory: bool = False):
+    # Full computation of the gold features, without saving.
+    # Returns the gold customers and the transactions with amount_eur.
+    with low_memory_context(low_memory), track_stage("compute_gold_features", rows_in=len(transactions_df)) as stage:
+        final_gold, transactions = _compute_gold_features(customers_df, transactions_df, low_memory)
+        stage.rows_out = len(final_gold)
+        return final_gold, transactions
+
+def _compute_gold_features(customers_df: pd.DataFrame, transactions_df: pd.DataFrame, low_memory: bool):
     # Date handling
-    transactions = transactions_df.copy()
+    transactions = transactions_df.copy(deep=not low_memory)
+    if low_memory:
+        transactions = compact_dtypes(transactions)
     transactions['timestamp'] = pd.to_datetime(transactions['timestamp'])
     snapshot_date = transactions['timestamp'].max()
     
-    # Convert to EUR using exchange rates (vectorized for performance)
-    rates = transactions['currency'].map(EXCHANGE_RATES).fillna(1.0)
-    transactions['amount_eur'] = transactions['amount'] * rates
+    with track_stage("amount_eur", rows_in=len(transactions)) as stage:
+        transactions = add_amount_eur(transactions)
+        stage.rows_out = len(transactions)
     # Feature Calculation
     logger.info("Calculating behavioral features and policy flags...")
-    gold_features = _calculate_base_metrics(transactions, snapshot_date)
+    with track_stage("base_metrics", rows_in=len(transactions)) as stage:
+        gold_features = _calculate_base_metrics(transactions, snapshot_date)
+        stage.rows_out = len(gold_features)
 
     # Policy Flag: high_ticket_user (> 500 EUR per product_policy.txt)
-    high_ticket_ids = transactions[transactions['amount_eur'] > 500]['customer_id'].unique()
-    gold_features['high_ticket_user'] = gold_features['customer_id'].isin(high_ticket_ids)
+    with track_stage("high_ticket_user", rows_in=len(transactions)) as stage:
+        high_ticket_ids = transactions.loc[transactions['amount_eur'] > HIGH_TICKET_THRESHOLD_EUR, 'customer_id'].unique()
+        gold_features['high_ticket_user'] = gold_features['customer_id'].isin(high_ticket_ids)
+        stage.rows_out = len(gold_features)
 
     # Fraud Flag: cross_border_count (mismatched currency per fraud_guidelines.txt)
-    temp = transactions.merge(customers_df[['customer_id', 'country']], on='customer_id')
-    temp['is_mismatch'] = temp.apply(lambda x: x['currency'] != NORDIC_CURRENCY_MAP.get(x['country']), axis=1)
-    cb_counts = temp.groupby('customer_id')['is_mismatch'].sum().reset_index(name='cross_border_count')
-    gold_features = gold_features.merge(cb_counts, on='customer_id', how='left')
+    # Only transactions of customers in customers_df are counted
+    with track_stage("cross_border_count", rows_in=len(transactions)) as stage:
+        is_mismatch, is_known = cross_border_mismatches(transactions, customers_df)
+        cb_counts = (
+            is_mismatch[is_known]
+            .groupby(transactions.loc[is_known, 'customer_id'])
+            .sum()
+            .reset_index(name='cross_border_count')
+        )
+        gold_features = gold_features.merge(cb_counts, on='customer_id', how='left')
+        stage.rows_out = len(gold_features)
 
     # Final Merge & Cleanup
-    final_gold = customers_df.merge(gold_features, on='customer_id', how='left')
+    with track_stage("merge_customers", rows_in=len(customers_df)) as stage:
+        final_gold = customers_df.merge(gold_features, on='customer_id', how='left')
+        stage.rows_out = len(final_gold)
 
-    # Reuse your save function to write to the gold directory
-    save_dataframe(final_gold, "gold_customers.csv", base_path="data/processed_gold")
-    save_dataframe(transactions, "gold_transactions.csv", base_path="data/processed_gold")
-    logger.info(f"Feature engineering complete. Gold data saved.")
-    
-    return final_gold
\ No newline at end of file
+    return final_gold, transactions
\ No newline at end of file
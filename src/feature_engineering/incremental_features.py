@@ -0,0 +1,241 @@
+'''
+Incrementally maintained gold customer features.
+
+Every aggregate of the gold layer can be derived from a small per-customer state:
+
+- total_spend_eur / avg_transaction_value  <- sum of amount_eur and row count
+- transaction_frequency                    <- count of transaction ids
+- last_tx_date / recency_days              <- max timestamp (recency against the snapshot date)
+- high_ticket_user                         <- count of transactions above 500 EUR
+- cross_border_count                       <- count of currency/country mismatches
+
+The state is persisted next to the gold tables. After an incremental ETL run only the
+new transactions (etl.incremental delta) are folded into it; recency is recomputed from
+the stored last_tx_date against the new snapshot date. Whenever the state can't be
+trusted (different exchange rates or feature code, customers changed, a full ETL
+rebuild, rewritten silver tables, counts that don't add up) it is rebuilt from the
+full silver transactions.
+'''
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+from etl.incremental import load_last_delta, load_state as load_etl_state
+from etl.load import load_processed_data, save_dataframe, table_version
+from instrumentation import instrumented_run, track_stage
+from feature_engineering.add_features import (
+    EXCHANGE_RATES,
+    HIGH_TICKET_THRESHOLD_EUR,
+    NORDIC_CURRENCY_MAP,
+    add_amount_eur,
+    compute_gold_features,
+    cross_border_mismatches,
+    save_gold_tables,
+)
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = Path("data/processed_gold/_state")
+STATE_TABLE = "customer_aggregate_state"
+META_FILE = "feature_state.json"
+
+# Silver tables the state was aggregated from
+SILVER_TABLES = ["processed_customers", "processed_transactions"]
+# Modules whose code defines the aggregates (a change invalidates the stored state)
+FEATURE_CODE_DIR = Path(__file__).resolve().parent
+
+STATE_COLUMNS = [
+    'customer_id', 'sum_eur', 'row_count', 'tx_count', 'last_tx_date', 'high_ticket_count', 'cross_border_count'
+]
+
+
+def _customers_fingerprint(customers_df: pd.DataFrame) -> str:
+    # Cross-border counts depend on the customer's country
+    key = customers_df[['customer_id', 'country']].astype(str)
+    return str(int(pd.util.hash_pandas_object(key, index=False).sum()))
+
+
+def _code_fingerprint() -> str:
+    digest = hashlib.sha256()
+    for path in sorted(FEATURE_CODE_DIR.glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _state_params(customers_df: pd.DataFrame) -> dict:
+    return {
+        "code": _code_fingerprint(),
+        "exchange_rates": EXCHANGE_RATES,
+        "currency_map": NORDIC_CURRENCY_MAP,
+        "high_ticket_threshold_eur": HIGH_TICKET_THRESHOLD_EUR,
+        "customers": _customers_fingerprint(customers_df),
+    }
+
+
+def _aggregate(transactions: pd.DataFrame, customers_df: pd.DataFrame) -> pd.DataFrame:
+    # Per-customer partial aggregates of a batch of transactions (amount_eur already added)
+    # Only customers present in the customer table are counted, like the full computation
+    is_mismatch, is_known = cross_border_mismatches(transactions, customers_df)
+    is_mismatch = is_mismatch & is_known.astype(bool)
+
+    batch = pd.DataFrame({
+        'customer_id': transactions['customer_id'],
+        'transaction_id': transactions['transaction_id'],
+        'amount_eur': transactions['amount_eur'],
+        'timestamp': transactions['timestamp'],
+        'is_high_ticket': transactions['amount_eur'] > HIGH_TICKET_THRESHOLD_EUR,
+        'is_mismatch': is_mismatch,
+    })
+    return batch.groupby('customer_id').agg(
+        sum_eur=('amount_eur', 'sum'),
+        row_count=('amount_eur', 'count'),
+        tx_count=('transaction_id', 'count'),
+        last_tx_date=('timestamp', 'max'),
+        high_ticket_count=('is_high_ticket', 'sum'),
+        cross_border_count=('is_mismatch', 'sum'),
+    ).reset_index()[STATE_COLUMNS]
+
+
+def fold_transactions(state: pd.DataFrame, delta: pd.DataFrame, customers_df: pd.DataFrame) -> pd.DataFrame:
+    """Folds a batch of new transactions (amount_eur already added) into the aggregate state."""
+    if delta.empty:
+        return state
+    combined = pd.concat([state, _aggregate(delta, customers_df)], ignore_index=True)
+    return combined.groupby('customer_id').agg(
+        sum_eur=('sum_eur', 'sum'),
+        row_count=('row_count', 'sum'),
+        tx_count=('tx_count', 'sum'),
+        last_tx_date=('last_tx_date', 'max'),
+        high_ticket_count=('high_ticket_count', 'sum'),
+        cross_border_count=('cross_border_count', 'sum'),
+    ).reset_index()[STATE_COLUMNS]
+
+
+def features_from_state(state: pd.DataFrame, snapshot_date) -> pd.DataFrame:
+    # Same layout as the gold features of run_feature_engineering
+    return pd.DataFrame({
+        'customer_id': state['customer_id'],
+        'total_spend_eur': state['sum_eur'],
+        'avg_transaction_value': state['sum_eur'] / state['row_count'],
+        'transaction_frequency': state['tx_count'],
+        'last_tx_date': state['last_tx_date'],
+        'recency_days': (snapshot_date - state['last_tx_date']).dt.days,
+        'high_ticket_user': state['customer_id'].isin(state.loc[state['high_ticket_count'] > 0, 'customer_id']),
+        'cross_border_count': state['cross_border_count'],
+    })
+
+
+def _load_feature_state(state_dir: Path):
+    meta_path = state_dir / META_FILE
+    if not meta_path.exists():
+        return None, None
+    try:
+        state = load_processed_data(STATE_TABLE, base_path=str(state_dir))
+    except FileNotFoundError:
+        return None, None
+    return state, json.loads(meta_path.read_text())
+
+
+def _save_feature_state(state: pd.DataFrame, meta: dict, state_dir: Path) -> None:
+    save_dataframe(state, STATE_TABLE, base_path=str(state_dir))
+    tmp_path = state_dir / (META_FILE + ".tmp")
+    tmp_path.write_text(json.dumps(meta, indent=2))
+    tmp_path.replace(state_dir / META_FILE)
+
+
+def _is_consistent(state: pd.DataFrame, transactions: pd.DataFrame) -> bool:
+    # Cheap sanity check that the state covers exactly the given transactions
+    if transactions.empty:
+        return state.empty
+    return (
+        int(state['row_count'].sum()) == len(transactions)
+        and state['last_tx_date'].max() == transactions['timestamp'].max()
+    )
+
+
+def run_incremental_feature_engineering(
+    customers_df: pd.DataFrame,
+    transactions_df: pd.DataFrame,
+    state_dir: Path = STATE_DIR,
+    verify: bool = False,
+    rebuild: bool = False,
+) -> pd.DataFrame:
+    """
+    Gold layer creation backed by the persisted aggregate state. Produces the same
+    gold tables as run_feature_engineering, but only aggregates the transactions added
+    since the previous run when possible. With verify=True the result is checked
+    against a full recompute; rebuild=True ignores the stored state and rebuilds it.
+    """
+    logger.info("Starting incremental feature engineering...")
+    with instrumented_run("feature_engineering"):
+        return _run_incremental_feature_engineering(customers_df, transactions_df, Path(state_dir), verify, rebuild)
+
+
+def _run_incremental_feature_engineering(customers_df, transactions_df, state_dir: Path, verify: bool, rebuild: bool = False) -> pd.DataFrame:
+    transactions = transactions_df.copy()
+    transactions['timestamp'] = pd.to_datetime(transactions['timestamp'])
+    with track_stage("amount_eur", rows_in=len(transactions)) as stage:
+        transactions = add_amount_eur(transactions)
+        stage.rows_out = len(transactions)
+
+    etl_state = load_etl_state()
+    etl_run_id = etl_state["run_id"] if etl_state else None
+    silver_version = table_version(SILVER_TABLES)
+    params = _state_params(customers_df)
+    state, meta = (None, None) if rebuild else _load_feature_state(state_dir)
+    reusable = meta is not None and meta["params"] == params and etl_run_id is not None
+
+    delta = load_last_delta() if reusable and meta["etl_run_id"] == etl_run_id - 1 else None
+    if reusable and meta["etl_run_id"] == etl_run_id and meta.get("silver_version") == silver_version:
+        logger.info("Aggregate state is up to date")
+    elif delta is not None:
+        logger.info(f"Folding {len(delta)} new transactions into the aggregate state...")
+        with track_stage("fold_transactions", rows_in=len(delta)) as stage:
+            delta = delta.copy()
+            delta['timestamp'] = pd.to_datetime(delta['timestamp'])
+            state = fold_transactions(state, add_amount_eur(delta), customers_df)
+            stage.rows_out = len(state)
+    else:
+        state = None
+
+    if state is None or not _is_consistent(state, transactions):
+        logger.info("Rebuilding aggregate state from all transactions...")
+        with track_stage("aggregate_state", rows_in=len(transactions)) as stage:
+            state = _aggregate(transactions, customers_df)
+            stage.rows_out = len(state)
+
+    snapshot_date = transactions['timestamp'].max()
+    with track_stage("features_from_state", rows_in=len(state)) as stage:
+        gold_features = features_from_state(state, snapshot_date)
+        final_gold = customers_df.merge(gold_features, on='customer_id', how='left')
+        stage.rows_out = len(final_gold)
+
+    if verify:
+        with track_stage("verify_full_recompute"):
+            verify_against_full_recompute(final_gold, customers_df, transactions_df)
+
+    save_gold_tables(final_gold, transactions)
+    _save_feature_state(state, {"etl_run_id": etl_run_id, "silver_version": silver_version, "params": params}, state_dir)
+    logger.info(f"Incremental feature engineering complete. Gold data saved.")
+    return final_gold
+
+
+def verify_against_full_recompute(gold_df: pd.DataFrame, customers_df: pd.DataFrame, transactions_df: pd.DataFrame) -> None:
+    """
+    Recomputes the gold features from scratch with compute_gold_features and raises an
+    AssertionError if they differ. Floating point sums are compared with a tight
+    relative tolerance, because the summation order differs.
+    """
+    expected, _ = compute_gold_features(customers_df, transactions_df)
+    pd.testing.assert_frame_equal(
+        gold_df.reset_index(drop=True),
+        expected.reset_index(drop=True),
+        check_exact=False,
+        rtol=1e-9,
+    )
+    logger.info("Incremental gold features match a full recompute.")
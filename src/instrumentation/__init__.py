@@ -0,0 +1,13 @@
+from .tracking import (
+    RunReport,
+    get_active_run,
+    instrumented_run,
+    track_stage,
+)
+
+__all__ = [
+    "RunReport",
+    "get_active_run",
+    "instrumented_run",
+    "track_stage",
+]
@@ -0,0 +1,254 @@
+'''
+Structured per-stage instrumentation of the pipeline.
+
+Pipeline steps are wrapped in track_stage(). While a run is active (instrumented_run),
+every stage records wall time, CPU time, memory and rows in/out. Stage names are paths
+starting with the run name, like "etl/transform_transactions/7_sort" when the ETL runs
+on its own. A nested run (the ETL inside main.py's "setup" run) becomes a stage of the
+outer run: "setup/etl/transform_transactions/7_sort". A stage executed several times
+(e.g. once per chunk in streaming mode) is aggregated under one name.
+
+At the end of the outermost run the report is logged and written as JSON to
+data/run_reports. Optionally one stage can be profiled with cProfile, and memory can be
+traced with tracemalloc (exact per-stage peaks plus the top allocation sites of the
+profiled stage). Both are expensive, so they are off by default:
+
+    PIPELINE_PROFILE_STAGE=setup/etl/transform_transactions PIPELINE_TRACE_MEMORY=1 python src/main.py
+
+Outside of a run track_stage() only costs two clock reads.
+'''
+import cProfile
+import datetime
+import io
+import json
+import logging
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+REPORT_DIR = Path("data/run_reports")
+REPORT_VERSION = 1
+PROFILE_STAGE_ENV = "PIPELINE_PROFILE_STAGE"
+TRACE_MEMORY_ENV = "PIPELINE_TRACE_MEMORY"
+# Entries kept from the cProfile / tracemalloc output
+PROFILE_TOP_N = 25
+
+_MB = 1024 ** 2
+
+
+def _max_rss_mb() -> float:
+    # Peak resident memory of the process so far (kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / _MB if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _current_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / _MB, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Stage:
+    """Measurements of one execution of a stage. rows_out is set by the caller."""
+
+    def __init__(self, name: str, rows_in: Optional[int] = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        # Highest tracemalloc peak of the child stages (their exit resets the peak)
+        self.child_peak = 0
+
+
+class RunReport:
+    def __init__(self, name: str, profile_stage: Optional[str] = None, trace_memory: bool = False):
+        self.name = name
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.datetime.now()
+        self.profile_stage = profile_stage
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.stack = []
+        self.status = "running"
+        self.profile = None
+        self.wall_seconds = None
+
+    def record(self, stage: Stage, wall_s: float, cpu_s: float, peak_mb: Optional[float], error: Optional[str]) -> None:
+        entry = self.stages.setdefault(stage.name, {
+            "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "rows_in": None, "rows_out": None,
+            "peak_traced_mb": None, "rss_mb": None, "max_rss_mb": None, "errors": 0,
+        })
+        entry["calls"] += 1
+        entry["wall_s"] = round(entry["wall_s"] + wall_s, 4)
+        entry["cpu_s"] = round(entry["cpu_s"] + cpu_s, 4)
+        for key, value in (("rows_in", stage.rows_in), ("rows_out", stage.rows_out)):
+            if value is not None:
+                entry[key] = (entry[key] or 0) + int(value)
+        if peak_mb is not None:
+            entry["peak_traced_mb"] = max(entry["peak_traced_mb"] or 0.0, peak_mb)
+        entry["rss_mb"] = _current_rss_mb()
+        entry["max_rss_mb"] = _max_rss_mb()
+        if error:
+            entry["errors"] += 1
+            entry["last_error"] = error
+
+    def to_dict(self) -> dict:
+        return {
+            "version": REPORT_VERSION,
+            "run": self.name,
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "status": self.status,
+            "wall_s": self.wall_seconds,
+            "max_rss_mb": _max_rss_mb(),
+            "trace_memory": self.trace_memory,
+            "stages": self.stages,
+            "profile": self.profile,
+        }
+
+    def save(self, report_dir: Path = REPORT_DIR) -> Path:
+        report_dir = Path(report_dir)
+        report_dir.mkdir(parents=True, exist_ok=True)
+        path = report_dir / f"{self.name}_{self.started_at:%Y%m%dT%H%M%S}_{self.run_id}.json"
+        path.write_text(json.dumps(self.to_dict(), indent=2, default=str))
+        return path
+
+
+_active_run: Optional[RunReport] = None
+
+
+def get_active_run() -> Optional[RunReport]:
+    return _active_run
+
+
+@contextmanager
+def instrumented_run(
+    name: str,
+    report_dir: Path = REPORT_DIR,
+    profile_stage: Optional[str] = None,
+    trace_memory: Optional[bool] = None,
+):
+    """
+    Collects the stages executed inside the block into a run report. Nested calls join
+    the outer run, only the outermost one writes the report. profile_stage (full stage
+    name) and trace_memory default to the PIPELINE_PROFILE_STAGE/PIPELINE_TRACE_MEMORY
+    environment variables.
+    """
+    global _active_run
+    if _active_run is not None:
+        with track_stage(name):
+            yield _active_run
+        return
+
+    if trace_memory is None:
+        trace_memory = os.environ.get(TRACE_MEMORY_ENV, "").lower() in ("1", "true", "yes")
+    report = RunReport(name, profile_stage or os.environ.get(PROFILE_STAGE_ENV), trace_memory)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    _active_run = report
+    start = time.perf_counter()
+    try:
+        yield report
+        report.status = "success"
+    except BaseException:
+        report.status = "failed"
+        raise
+    finally:
+        report.wall_seconds = round(time.perf_counter() - start, 4)
+        _active_run = None
+        if started_tracing:
+            tracemalloc.stop()
+        try:
+            path = report.save(report_dir)
+            logger.info(f"Run report ({report.status}, {report.wall_seconds}s) written to {path}")
+            _log_summary(report)
+        except OSError as e:
+            logger.warning(f"Could not write run report: {e}")
+
+
+def _log_summary(report: RunReport) -> None:
+    for name, entry in report.stages.items():
+        logger.info(
+            f"[stage] {name}: {entry['wall_s']}s wall, {entry['cpu_s']}s cpu, "
+            f"rows {entry['rows_in']} -> {entry['rows_out']}, calls {entry['calls']}"
+        )
+
+
+def _stage_name(report: RunReport, name: str) -> str:
+    # Full path below the run: "<run>/<parent stages>/<name>" (the parent's name is already a full path)
+    parent = report.stack[-1].name if report.stack else report.name
+    return f"{parent}/{name}"
+
+
+def _profile_summary(profiler: cProfile.Profile) -> str:
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    return stream.getvalue()
+
+
+def _top_allocations(snapshot) -> list:
+    return [
+        {"location": str(stat.traceback), "size_mb": round(stat.size / _MB, 3), "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:PROFILE_TOP_N]
+    ]
+
+
+@contextmanager
+def track_stage(name: str, rows_in: Optional[int] = None):
+    """
+    Measures the wrapped pipeline step. Yields a Stage, set stage.rows_out to
+    record the number of output rows.
+    """
+    report = _active_run
+    stage = Stage(_stage_name(report, name) if report else name, rows_in)
+    if report is None:
+        yield stage
+        return
+
+    tracing = report.trace_memory and tracemalloc.is_tracing()
+    if tracing:
+        # The parent's peak so far is kept before the peak is reset for this stage
+        if report.stack:
+            report.stack[-1].child_peak = max(report.stack[-1].child_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    profiler = cProfile.Profile() if stage.name == report.profile_stage else None
+    report.stack.append(stage)
+    error = None
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    if profiler:
+        profiler.enable()
+    try:
+        yield stage
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        wall_s, cpu_s = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        report.stack.pop()
+
+        peak_mb = None
+        if tracing:
+            peak = max(tracemalloc.get_traced_memory()[1], stage.child_peak)
+            peak_mb = round(peak / _MB, 2)
+            if report.stack:
+                report.stack[-1].child_peak = max(report.stack[-1].child_peak, peak)
+        if profiler:
+            report.profile = {"stage": stage.name, "cprofile": _profile_summary(profiler)}
+            if tracing:
+                report.profile["top_allocations"] = _top_allocations(tracemalloc.take_snapshot())
+        report.record(stage, wall_s, cpu_s, peak_mb, error)
@@ -1,23 +1,105 @@
+import argparse
 import logging
+from pathlib import Path
+
+from etl.extract import EXPECTED_TRANSACTION_COLUMNS, RAW_DATA_PATH, list_transaction_files
+from etl.load import DEFAULT_STORAGE_FORMAT, find_table_path, load_processed_data
 from etl.run_etl import run_etl_pipeline
-from feature_engineering.add_features import run_feature_engineering
+from etl.transform import TRANSACTION_SORT_KEY
+from feature_engineering.add_features import EXCHANGE_RATES, HIGH_TICKET_THRESHOLD_EUR, NORDIC_CURRENCY_MAP
+from feature_engineering.incremental_features import run_incremental_feature_engineering
 from rag.ingest import ChromaIngestor
+from instrumentation import instrumented_run, track_stage
+from stage_cache import StageCache, source_modules
 
 logger = logging.getLogger(__name__)
 
-def run_setup():
-    """Run this once to prepare the system for the Streamlit app."""
+SRC_DIR = Path(__file__).resolve().parent
+DOCUMENTS_PATH = Path("data/raw/documents")
+CHROMA_DB_PATH = Path("data/chroma_db")
+SILVER_TABLES = ["processed_customers", "processed_transactions"]
+GOLD_TABLES = ["gold_customers", "gold_transactions"]
+GOLD_PATH = "data/processed_gold"
+
+
+def _table_paths(names, base_path="data/processed_silver") -> list:
+    return [find_table_path(name, base_path)[0] for name in names]
+
+
+def _stage_fingerprints(cache: StageCache) -> dict:
+    # Inputs, code (every module the stage imports) and parameters of every stage of the refresh
+    etl_fp = cache.fingerprint(
+        "etl",
+        inputs=[RAW_DATA_PATH / "customers.csv"] + list_transaction_files(),
+        code=source_modules(["etl.run_etl"], SRC_DIR),
+        params={
+            "expected_columns": sorted(EXPECTED_TRANSACTION_COLUMNS),
+            "sort_key": TRANSACTION_SORT_KEY,
+            "storage_format": DEFAULT_STORAGE_FORMAT,
+        },
+    )
+    features_fp = cache.fingerprint(
+        "features",
+        code=source_modules(["feature_engineering.incremental_features"], SRC_DIR),
+        params={
+            "exchange_rates": EXCHANGE_RATES,
+            "currency_map": NORDIC_CURRENCY_MAP,
+            "high_ticket_threshold_eur": HIGH_TICKET_THRESHOLD_EUR,
+        },
+        upstream=[etl_fp],
+    )
+    ingest_fp = cache.fingerprint(
+        "ingest",
+        inputs=[DOCUMENTS_PATH],
+        code=source_modules(["rag.ingest"], SRC_DIR),
+    )
+    return {"etl": etl_fp, "features": features_fp, "ingest": ingest_fp}
+
+
+def run_setup(force: bool = False):
+    """
+    Run this once to prepare the system for the Streamlit app.
+    Stages whose inputs, code and parameters didn't change since their last successful
+    run are skipped. force=True runs every stage and rebuilds the silver and gold layers
+    from scratch (full ETL, incremental ETL and feature state re-initialised).
+    """
     try:
         logger.info("--- Data Refresh Started ---")
 
-        # 1. ETL & Feature Engineering
-        customers_df, transactions_df = run_etl_pipeline()
-        gold_customers_df = run_feature_engineering(customers_df, transactions_df)
-        
-        # 2. Update Vector Store
-        logger.info("Updating Vector Database...")
-        ingestor = ChromaIngestor()
-        ingestor.ingest_directory("data/raw/documents")
+        # One run report covering every stage of the refresh
+        with instrumented_run("setup"):
+            cache = StageCache()
+            with track_stage("fingerprint_inputs"):
+                fingerprints = _stage_fingerprints(cache)
+
+            # 1. ETL & Feature Engineering
+            etl_fresh = not force and cache.is_fresh("etl", fingerprints["etl"])
+            features_fresh = etl_fresh and cache.is_fresh("features", fingerprints["features"])
+
+            if features_fresh:
+                logger.info("Raw data and feature code unchanged, skipping ETL and feature engineering")
+            else:
+                if etl_fresh:
+                    logger.info("Raw data unchanged, reusing the silver tables")
+                    customers_df = load_processed_data("processed_customers")
+                    transactions_df = load_processed_data("processed_transactions")
+                else:
+                    customers_df, transactions_df = run_etl_pipeline(incremental=True, full_rebuild=force)
+                    cache.mark_done("etl", fingerprints["etl"], _table_paths(SILVER_TABLES))
+
+                gold_customers_df = run_incremental_feature_engineering(customers_df, transactions_df, rebuild=force)
+                cache.mark_done("features", fingerprints["features"], _table_paths(GOLD_TABLES, GOLD_PATH))
+
+            # 2. Update Vector Store
+            if not force and cache.is_fresh("ingest", fingerprints["ingest"]):
+                logger.info("Documents unchanged, skipping vector store update")
+            else:
+                logger.info("Updating Vector Database...")
+                with track_stage("ingest_documents"):
+                    ingestor = ChromaIngestor()
+                    ingestor.ingest_directory(str(DOCUMENTS_PATH))
+                # The vector store changes its files on every open, only its existence is checked
+                cache.mark_done("ingest", fingerprints["ingest"], [CHROMA_DB_PATH], check_modified=False)
 
         logger.info("--- Setup Successfully Completed ---")
 
@@ -25,4 +107,9 @@ def run_setup():
         logger.error(f"Setup failed: {e}")
 
 if __name__ == "__main__":
-    run_setup()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Refresh the silver/gold tables and the vector store.")
+    parser.add_argument("--force", action="store_true", help=(
+        "Run every stage, even if its inputs didn't change, and rebuild the silver and gold "
+        "layers from scratch instead of incrementally."
+    ))
+    run_setup(force=parser.parse_args().force)
@@ -0,0 +1,109 @@
+'''
+Semantic cache of complete answers of RAGOrchestrator.ask.
+
+A question is answered from the cache when a cached question is close enough in
+embedding space (cosine similarity >= threshold), e.g. "top 5 customers by spend" and
+"who are the 5 biggest spenders". The numbers in both questions must be identical,
+so "customer 1971" never gets the answer cached for "customer 1972".
+
+Entries belong to a data version (gold tables + policy collection): when either is
+refreshed, every cached answer is dropped. The cache is bounded with LRU eviction.
+'''
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+DEFAULT_MAX_ENTRIES = 256
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def _numbers(query: str) -> tuple:
+    return tuple(_NUMBER_PATTERN.findall(query))
+
+
+def _unit_vector(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        embedding_function,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.embedding_function = embedding_function
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # question -> (unit embedding, numbers, cached answer)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: Optional[str]) -> None:
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def embed(self, query: str) -> np.ndarray:
+        return _unit_vector(self.embedding_function([query])[0])
+
+    def get(self, query: str, version: Optional[str], embedding: Optional[np.ndarray] = None):
+        """
+        Returns (cached answer, similarity, cached question) of the closest cached
+        question, or None if no cached question is similar enough.
+        """
+        if embedding is None:
+            embedding = self.embed(query)
+        numbers = _numbers(query)
+        with self._lock:
+            self._check_version(version)
+            candidates = [(q, e) for q, e in self._entries.items() if e[1] == numbers]
+            if candidates:
+                similarities = np.stack([e[0] for _, e in candidates]) @ embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    question, entry = candidates[best]
+                    self._entries.move_to_end(question)
+                    self.hits += 1
+                    return entry[2], round(float(similarities[best]), 4), question
+            self.misses += 1
+            return None
+
+    def put(self, query: str, version: Optional[str], answer, embedding: Optional[np.ndarray] = None) -> None:
+        if embedding is None:
+            embedding = self.embed(query)
+        with self._lock:
+            self._check_version(version)
+            self._entries[query] = (embedding, _numbers(query), answer)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "similarity_threshold": self.similarity_threshold,
+            }
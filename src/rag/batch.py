@@ -0,0 +1,185 @@
+'''
+Batch questions against the RAG orchestrator, e.g. nightly regression runs.
+
+ask_many runs a list of questions through RAGOrchestrator.ask_async with at most
+`concurrency` questions in flight. Answers that failed with a rate limit (HTTP 429)
+are retried with exponential backoff and jitter. Each result is handed to on_result as
+soon as it is ready; the summary reports throughput and p50/p95/p99 latency.
+
+The CLI reads a JSONL file of questions ({"question": ..., "id": ...} per line) and
+streams one JSON result per line to the output file:
+
+    PYTHONPATH=src python -m rag.batch questions.jsonl --output results.jsonl --concurrency 8
+'''
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import numpy as np
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+# Backoff before retry n: BACKOFF_BASE_SECONDS * 2**n (+ up to 50% jitter), capped
+BACKOFF_BASE_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+RATE_LIMIT_STATUS = 429
+
+
+def _is_rate_limited(response: dict) -> bool:
+    return response.get("metadata", {}).get("status_code") == RATE_LIMIT_STATUS
+
+
+def _backoff_seconds(attempt: int) -> float:
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** attempt, MAX_BACKOFF_SECONDS)
+    return delay * (1 + random.random() / 2)
+
+
+def latency_summary(latencies: List[float]) -> dict:
+    if not latencies:
+        return {"p50_s": None, "p95_s": None, "p99_s": None, "mean_s": None, "max_s": None}
+    values = np.asarray(latencies)
+    return {
+        "p50_s": round(float(np.percentile(values, 50)), 4),
+        "p95_s": round(float(np.percentile(values, 95)), 4),
+        "p99_s": round(float(np.percentile(values, 99)), 4),
+        "mean_s": round(float(values.mean()), 4),
+        "max_s": round(float(values.max()), 4),
+    }
+
+
+async def ask_many_async(
+    orchestrator,
+    questions: List[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    on_result: Optional[Callable[[dict], None]] = None,
+):
+    """
+    Answers the questions with at most `concurrency` in flight. Returns (results,
+    summary); results are in the order of the questions, each with the index, question,
+    response (as returned by ask), latency_s (including retries) and attempts.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, question: str) -> dict:
+        async with semaphore:
+            start = time.perf_counter()
+            for attempt in range(max_retries + 1):
+                response = await orchestrator.ask_async(question)
+                if not _is_rate_limited(response) or attempt == max_retries:
+                    break
+                await asyncio.sleep(_backoff_seconds(attempt))
+            result = {
+                "index": index,
+                "question": question,
+                "response": response,
+                "latency_s": round(time.perf_counter() - start, 4),
+                "attempts": attempt + 1,
+            }
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run(i, q) for i, q in enumerate(questions)))
+    wall_s = time.perf_counter() - start
+
+    errors = sum(r["response"].get("metadata", {}).get("status") == "error" for r in results)
+    summary = {
+        "questions": len(results),
+        "errors": errors,
+        "rate_limit_retries": sum(r["attempts"] - 1 for r in results),
+        "served_from_cache": sum(bool(r["response"].get("metadata", {}).get("served_from_cache")) for r in results),
+        "concurrency": concurrency,
+        "wall_s": round(wall_s, 4),
+        "throughput_qps": round(len(results) / wall_s, 3) if wall_s else None,
+        **latency_summary([r["latency_s"] for r in results]),
+    }
+    return list(results), summary
+
+
+def ask_many(orchestrator, questions: List[str], **kwargs):
+    """
+    Synchronous entry point of ask_many_async (for scripts and the Streamlit mock test).
+    When the calling thread already runs an event loop, the batch gets its own loop on a
+    worker thread (asyncio.run can't be nested).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(ask_many_async(orchestrator, questions, **kwargs))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, ask_many_async(orchestrator, questions, **kwargs)).result()
+
+
+def _result_record(result: dict, question_id=None) -> dict:
+    # JSON-serializable view of a result: plots and the source table are summarized
+    response = result["response"]
+    metadata = response.get("metadata", {})
+    source_data = response.get("source_data")
+    return {
+        "id": question_id,
+        "index": result["index"],
+        "question": result["question"],
+        "answer": response.get("answer"),
+        "status": metadata.get("status", "success"),
+        "latency_s": result["latency_s"],
+        "attempts": result["attempts"],
+        "served_from_cache": bool(metadata.get("served_from_cache")),
+        "steps": metadata.get("steps"),
+        "plots": len(metadata.get("plots") or []),
+        "sources": [] if source_data is None or source_data.empty else sorted(set(source_data["Source"])),
+    }
+
+
+def _read_questions(path: Path) -> list:
+    questions = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                questions.append(entry if isinstance(entry, dict) else {"question": entry})
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the RAG orchestrator.")
+    parser.add_argument("questions", help="JSONL file, one {\"question\": ..., \"id\": ...} per line.")
+    parser.add_argument("--output", default=None, help="Result JSONL file (default: <questions>.results.jsonl).")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES)
+    args = parser.parse_args()
+
+    from rag.rag_logic import RAGOrchestrator
+
+    questions = _read_questions(Path(args.questions))
+    output = Path(args.output) if args.output else Path(args.questions).with_suffix(".results.jsonl")
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(output, "w") as f:
+        def write_result(result):
+            # Results are written as they complete, so a partial run still leaves its answers
+            record = _result_record(result, questions[result["index"]].get("id"))
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+
+        _, summary = ask_many(
+            RAGOrchestrator(),
+            [q["question"] for q in questions],
+            concurrency=args.concurrency,
+            max_retries=args.max_retries,
+            on_result=write_result,
+        )
+
+    print(json.dumps(summary, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
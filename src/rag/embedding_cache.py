@@ -0,0 +1,164 @@
+'''
+Persistent embedding cache shared by ingestion and retrieval.
+
+CachedEmbeddingFunction wraps a Chroma embedding function. Embeddings are stored in a
+small SQLite database keyed by (model id, sha256 of the text), so a text that was
+embedded before (a re-ingested chunk, a repeated question) never goes through the
+model again. The cache is bounded: above max_entries the least recently used entries
+are evicted. Hit/miss counters are available through stats().
+
+The wrapper reports the name and config of the wrapped function, so Chroma treats it
+as the same embedding function the collection was created with; build_from_config
+rebuilds the wrapped function from that name and config and wraps it again.
+'''
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+
+DEFAULT_MAX_ENTRIES = 200_000
+# SQLite limits the number of parameters per statement
+_SQL_BATCH = 500
+
+
+def _text_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _default_model_id(embedding_function) -> str:
+    model_id = type(embedding_function).__name__
+    try:
+        model_id = f"{embedding_function.name()}:{sorted(embedding_function.get_config().items())}"
+    except Exception:
+        pass
+    return f"{model_id}:{getattr(embedding_function, 'MODEL_NAME', '')}"
+
+
+class CachedEmbeddingFunction(EmbeddingFunction[Documents]):
+    def __init__(
+        self,
+        embedding_function,
+        cache_path: str,
+        model_id: Optional[str] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self._wrapped = embedding_function
+        self.model_id = model_id or _default_model_id(embedding_function)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Ingestion embeds from several threads, the connection is shared under a lock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [_text_key(self.model_id, text) for text in input]
+        cached = self._lookup(list(dict.fromkeys(keys)))
+
+        # Each distinct missing text is embedded once, in a single call
+        missing = {}
+        for key, text in zip(keys, input):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            computed = self._wrapped(list(missing.values()))
+            new_entries = {key: np.asarray(embedding, dtype=np.float32) for key, embedding in zip(missing, computed)}
+            self._store(new_entries)
+            cached.update(new_entries)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+        return [cached[key] for key in keys]
+
+    def embed_query(self, input: Documents) -> Embeddings:
+        return self(input)
+
+    def _lookup(self, keys: list) -> dict:
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update({key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows})
+            if found:
+                # LRU bookkeeping
+                self._db.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+                self._db.commit()
+        return found
+
+    def _store(self, entries: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                [(key, embedding.tobytes(), now) for key, embedding in entries.items()],
+            )
+            excess = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "entries": entries,
+                "max_entries": self.max_entries,
+            }
+
+    # --- Identity of the wrapped function (Chroma checks it against the collection) ---
+    def name(self) -> str:
+        return self._wrapped.name()
+
+    def get_config(self) -> dict:
+        return self._wrapped.get_config()
+
+    def is_legacy(self) -> bool:
+        return self._wrapped.is_legacy()
+
+    def default_space(self):
+        return self._wrapped.default_space()
+
+    def supported_spaces(self):
+        return self._wrapped.supported_spaces()
+
+    @staticmethod
+    def build_from_config(
+        config: dict,
+        name: str = "default",
+        cache_path: str = ":memory:",
+        **kwargs,
+    ) -> "CachedEmbeddingFunction":
+        """
+        Rebuilds the wrapped function from its config, with the build_from_config of the
+        class Chroma registered under `name` (the wrapped function's name()), and wraps it.
+        """
+        from chromadb.utils.embedding_functions import known_embedding_functions
+
+        if name not in known_embedding_functions:
+            raise ValueError(f"Unknown embedding function: {name}")
+        wrapped = known_embedding_functions[name].build_from_config(config)
+        return CachedEmbeddingFunction(wrapped, cache_path=cache_path, **kwargs)
@@ -1,45 +1,274 @@
 import os
+import json
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import chromadb
 from chromadb.utils import embedding_functions
 
+from rag.embedding_cache import CachedEmbeddingFunction
+
+MANIFEST_FILE = "ingest_manifest.json"
+MANIFEST_VERSION = 2
+# Kept next to (not inside) the vector store, so embeddings survive a rebuilt collection
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite"
+
+# Chunking: paragraphs are packed into chunks of up to CHUNK_SIZE characters, consecutive
+# chunks share up to CHUNK_OVERLAP characters of context
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+# Chunks embedded per call of the embedding function (and written per Chroma call)
+EMBED_BATCH_SIZE = 64
+DEFAULT_EMBED_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_id(source: str, text: str) -> str:
+    # Content-addressed id: the same chunk of the same file always maps to the same id,
+    # no matter where it sits in the file or in which order the files are read
+    return _sha256(f"{source}\0{text}".encode("utf-8"))[:32]
+
+
+def _split_units(text: str, chunk_size: int, overlap: int) -> list:
+    # Structural units of a document: its non-empty lines (paragraph breaks are kept
+    # as None markers). A line longer than a chunk is cut into overlapping word windows.
+    units = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if not line:
+            if units and units[-1] is not None:
+                units.append(None)
+            continue
+        if len(line) <= chunk_size:
+            units.append(line)
+            continue
+        words, window = line.split(" "), []
+        for word in words:
+            if window and len(" ".join(window + [word])) > chunk_size:
+                units.append(" ".join(window))
+                # Slide: keep the trailing words that fit into the overlap
+                while window and len(" ".join(window)) > overlap:
+                    window.pop(0)
+            window.append(word)
+        if window:
+            units.append(" ".join(window))
+    return units
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list:
+    """
+    Paragraph-aware sliding-window chunking. Lines of a paragraph are packed into chunks
+    of up to chunk_size characters; a new paragraph starts a new chunk. Consecutive chunks
+    of a paragraph repeat its last lines (up to overlap characters) for context.
+    Identical chunks are only returned once.
+    """
+    chunks, current = [], []
+    for unit in _split_units(text, chunk_size, overlap) + [None]:
+        if unit is None or (current and len(" ".join(current + [unit])) > chunk_size):
+            if current:
+                chunks.append(" ".join(current))
+            if unit is None:
+                current = []
+                continue
+            # Overlap: carry the trailing lines of the previous chunk
+            carried = []
+            for line in reversed(current):
+                if len(" ".join([line] + carried)) > overlap:
+                    break
+                carried.insert(0, line)
+            current = carried if len(" ".join(carried + [unit])) <= chunk_size else []
+        current.append(unit)
+    return list(dict.fromkeys(chunks))
+
+
+def _iter_documents(docs_path):
+    # .txt files below docs_path, as (relative source name, path), in a stable order.
+    # Hidden files and directories (e.g. .ipynb_checkpoints copies) are skipped.
+    for root, dirs, files in os.walk(docs_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for filename in sorted(files):
+            if filename.endswith(".txt") and not filename.startswith("."):
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, docs_path).replace(os.sep, "/"), path
+
+
 class ChromaIngestor:
-    def __init__(self, db_path="./data/chroma_db"):
+    def __init__(
+        self,
+        db_path="./data/chroma_db",
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        embed_batch_size=EMBED_BATCH_SIZE,
+        max_workers=DEFAULT_EMBED_WORKERS,
+        embedding_cache_path=None,
+    ):
         # Initialize persistent client
         self.client = chromadb.PersistentClient(path=db_path)
-        # Using a default open-source embedding function 
-        self.emb_fn = embedding_functions.DefaultEmbeddingFunction()
+        # Using a default open-source embedding function, behind a persistent cache shared
+        # by ingestion and queries (the collection embeds query texts with it as well)
+        if embedding_cache_path is None:
+            embedding_cache_path = os.path.join(os.path.dirname(os.path.abspath(db_path)), EMBEDDING_CACHE_FILE)
+        self.emb_fn = CachedEmbeddingFunction(
+            embedding_functions.DefaultEmbeddingFunction(),
+            cache_path=embedding_cache_path,
+        )
         self.collection = self.client.get_or_create_collection(
-            name="policy_docs", 
+            name="policy_docs",
             embedding_function=self.emb_fn
         )
+        # Per-file record of what is stored in the collection
+        self.manifest_path = os.path.join(db_path, MANIFEST_FILE)
+        self.chunking = {"size": chunk_size, "overlap": chunk_overlap}
+        self.embed_batch_size = embed_batch_size
+        self.max_workers = max_workers
+        self._version_memo = (None, None)
+
+    def collection_version(self):
+        """
+        Hash of the ingest manifest: changes whenever an ingestion (in this or another
+        process) changed the stored chunks. None if nothing was ingested yet.
+        The manifest is only re-read when its size or modification time changed.
+        """
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self._version_memo[0] != signature:
+            with open(self.manifest_path, "rb") as f:
+                self._version_memo = (signature, _sha256(f.read())[:16])
+        return self._version_memo[1]
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        # A manifest describing chunks the collection doesn't have (db wiped) is useless
+        if manifest["files"] and self.collection.count() == 0:
+            return None
+        return manifest
+
+    def _save_manifest(self, manifest):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _delete(self, ids):
+        for start in range(0, len(ids), self.embed_batch_size):
+            self.collection.delete(ids=ids[start:start + self.embed_batch_size])
+
+    def _iter_new_chunks(self, docs_path, manifest, known_ids, files, stats):
+        # Streams (id, text, source) of the chunks that still have to be embedded, one
+        # document at a time, and records the chunk ids of every file in `files`
+        for source, path in _iter_documents(docs_path):
+            stats["documents"] += 1
+            with open(path, "rb") as f:
+                raw = f.read()
+            file_hash = _sha256(raw)
+
+            previous = manifest["files"].get(source)
+            if previous is not None and previous["sha256"] == file_hash:
+                files[source] = previous
+                continue
+
+            stats["changed_documents"] += 1
+            chunks = chunk_text(raw.decode("utf-8"), self.chunking["size"], self.chunking["overlap"])
+            ids = [chunk_id(source, chunk) for chunk in chunks]
+            stats["chunks"] += len(chunks)
+            files[source] = {"sha256": file_hash, "chunk_ids": ids}
+            for chunk, cid in zip(chunks, ids):
+                if cid not in known_ids:
+                    yield cid, chunk, source
+
+    def _iter_batches(self, chunks):
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == self.embed_batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _write_batch(self, batch, embeddings):
+        self.collection.upsert(
+            ids=[cid for cid, _, _ in batch],
+            documents=[text for _, text, _ in batch],
+            metadatas=[{"source": source} for _, _, source in batch],
+            embeddings=embeddings,
+        )
 
     def ingest_directory(self, docs_path):
-        #Line-by-line chunking 
-        documents = []
-        metadatas = []
-        ids = []
-        
-        chunk_idx = 0
-        for filename in os.listdir(docs_path):
-            if filename.endswith(".txt"):
-                file_path = os.path.join(docs_path, filename)
-                with open(file_path, "r") as f:
-                    lines = [l.strip() for l in f.readlines() if l.strip()]
-                    
-                for line in lines:
-                    documents.append(line)
-                    metadatas.append({"source": filename})
-                    ids.append(f"id_{chunk_idx}")
-                    chunk_idx += 1
-        
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
+        """
+        Synchronizes the collection with the .txt files below docs_path.
+
+        Documents are streamed: each changed file is chunked, new chunks are grouped
+        into fixed-size batches, the batches are embedded on a pool of worker threads
+        and written to Chroma batch by batch, with a bounded number of batches in flight,
+        so memory stays flat for large corpora. Unchanged files are recognized by their
+        hash and skipped; chunks that disappeared are deleted. Returns the statistics,
+        including documents/sec and chunks/sec.
+        """
+        start = time.perf_counter()
+        manifest = self._load_manifest()
+        if manifest is None:
+            # First run (or older collection): whatever is stored is the baseline,
+            # e.g. ids of older chunkings that are cleaned up below
+            manifest = {"version": MANIFEST_VERSION, "chunking": self.chunking, "files": {}}
+            known_ids = set(self.collection.get(include=[])["ids"])
+        else:
+            known_ids = {i for entry in manifest["files"].values() for i in entry["chunk_ids"]}
+            if manifest.get("chunking") != self.chunking:
+                # Different chunk parameters: every file has to be re-chunked
+                manifest = {"version": MANIFEST_VERSION, "chunking": self.chunking, "files": {}}
+
+        stats = {"documents": 0, "changed_documents": 0, "chunks": 0, "upserted": 0, "deleted": 0}
+        files = {}
+        batches = self._iter_batches(self._iter_new_chunks(docs_path, manifest, known_ids, files, stats))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = deque()
+            for batch in batches:
+                in_flight.append((batch, executor.submit(self.emb_fn, [text for _, text, _ in batch])))
+                # Bounded: write the oldest batch before embedding more
+                if len(in_flight) >= 2 * self.max_workers:
+                    batch, future = in_flight.popleft()
+                    self._write_batch(batch, future.result())
+                    stats["upserted"] += len(batch)
+            while in_flight:
+                batch, future = in_flight.popleft()
+                self._write_batch(batch, future.result())
+                stats["upserted"] += len(batch)
+
+        current_ids = {i for entry in files.values() for i in entry["chunk_ids"]}
+        stale_ids = sorted(known_ids - current_ids)
+        self._delete(stale_ids)
+        stats["deleted"] = len(stale_ids)
+
+        manifest["files"] = files
+        self._save_manifest(manifest)
+
+        elapsed = time.perf_counter() - start
+        stats["seconds"] = round(elapsed, 3)
+        stats["documents_per_sec"] = round(stats["documents"] / elapsed, 1) if elapsed else None
+        stats["chunks_per_sec"] = round(stats["upserted"] / elapsed, 1) if elapsed else None
+        stats["embedding_cache"] = self.emb_fn.stats()
+        print(
+            f"Ingested {stats['upserted']} new policy chunks into ChromaDB, deleted {stats['deleted']} stale chunks "
+            f"({stats['changed_documents']}/{stats['documents']} documents changed, "
+            f"{stats['documents_per_sec']} docs/s, {stats['chunks_per_sec']} chunks/s, "
+            f"embedding cache hits/misses {stats['embedding_cache']['hits']}/{stats['embedding_cache']['misses']})."
         )
-        print(f"Ingested {len(documents)} policy chunks into ChromaDB.")
+        return stats
 
 # Quick execution
 if __name__ == "__main__":
     ingestor = ChromaIngestor()
-    ingestor.ingest_directory("data/raw/documents")
\ No newline at end of file
+    ingestor.ingest_directory("data/raw/documents")
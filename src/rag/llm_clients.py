@@ -0,0 +1,210 @@
+'''
+Chat clients used by RAGOrchestrator.
+
+The orchestrator talks to the LLM through a small ChatClient interface (complete,
+complete_async, stream) returning Mistral-shaped responses:
+response.choices[0].message with .content and .tool_calls, and stream events with
+event.data.choices[0].delta.
+
+- MistralChatClient: the Mistral API (default).
+- ReplayChatClient: local and deterministic. It replays recorded tool-call sequences
+  and simulates the API latency, so the orchestrator can be load-tested and its own
+  overhead measured without the paid API.
+- RecordingChatClient: wraps another client and records the turns of every question
+  in the replay format.
+
+Replay scripts are JSON lists of scenarios. A scenario applies to questions containing
+its "match" text (case-insensitive, "" matches everything). Each turn is either a
+final answer or tool calls; "{number}" in a turn is replaced by the first number of the
+question (e.g. the customer id):
+
+    [{"match": "visualize",
+      "turns": [{"tool_calls": [{"name": "generate_customer_visualization",
+                                 "arguments": {"customer_id": "{number}", "plot_type": "frequency"}}]},
+                {"content": "Customer {number} is compared with all customers in the plot."}]}]
+'''
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+
+class ChatClient:
+    """Interface of the chat backends. Only complete() is required."""
+
+    def complete(self, model: str, messages: list, tools: Optional[list] = None):
+        raise NotImplementedError
+
+    async def complete_async(self, model: str, messages: list, tools: Optional[list] = None):
+        return await asyncio.to_thread(self.complete, model, messages, tools)
+
+    def stream(self, model: str, messages: list, tools: Optional[list] = None):
+        # Backends without streaming deliver the whole message as one event
+        message = self.complete(model, messages, tools).choices[0].message
+        yield _stream_event(content=message.content, tool_calls=message.tool_calls)
+
+
+class MistralChatClient(ChatClient):
+    def __init__(self, api_key: Optional[str] = None):
+        from mistralai import Mistral
+
+        self.client = Mistral(api_key=api_key)
+
+    def complete(self, model, messages, tools=None):
+        return self.client.chat.complete(model=model, messages=messages, tools=tools)
+
+    async def complete_async(self, model, messages, tools=None):
+        return await self.client.chat.complete_async(model=model, messages=messages, tools=tools)
+
+    def stream(self, model, messages, tools=None):
+        return self.client.chat.stream(model=model, messages=messages, tools=tools)
+
+
+# --- Mistral-shaped responses for the local clients ---
+def _tool_call(index: int, call_id: str, name: str, arguments: dict):
+    return SimpleNamespace(
+        index=index, id=call_id, type="function",
+        function=SimpleNamespace(name=name, arguments=json.dumps(arguments)),
+    )
+
+
+def _response(content: str, tool_calls: Optional[list] = None):
+    message = SimpleNamespace(role="assistant", content=content, tool_calls=tool_calls or None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="tool_calls" if tool_calls else "stop")])
+
+
+def _stream_event(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(data=SimpleNamespace(choices=[SimpleNamespace(delta=delta)]))
+
+
+def _message_field(message, field: str):
+    return message.get(field) if isinstance(message, dict) else getattr(message, field, None)
+
+
+def _question(messages: list) -> str:
+    return next((_message_field(m, "content") for m in messages if _message_field(m, "role") == "user"), "")
+
+
+def _turn_index(messages: list) -> int:
+    return sum(1 for m in messages if _message_field(m, "role") == "assistant")
+
+
+def _fill(value, number: str):
+    # Replaces "{number}" in strings; a value that is only "{number}" becomes an int
+    if isinstance(value, dict):
+        return {key: _fill(v, number) for key, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, number) for v in value]
+    if value == "{number}":
+        return int(number) if number.isdigit() else number
+    if isinstance(value, str):
+        return value.replace("{number}", number)
+    return value
+
+
+class ReplayChatClient(ChatClient):
+    """
+    Deterministic stand-in for the chat API. latency_s (+ up to jitter_s, from a seeded
+    random generator) is spent per call; streams spread it over the answer tokens.
+    """
+
+    def __init__(self, script=None, latency_s: float = 0.0, jitter_s: float = 0.0, seed: int = 0):
+        if isinstance(script, (str, Path)):
+            script = json.loads(Path(script).read_text())
+        self.scenarios = script or []
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _latency(self) -> float:
+        with self._lock:
+            self.calls += 1
+            return self.latency_s + self._random.random() * self.jitter_s
+
+    def _turn(self, messages: list) -> dict:
+        question = _question(messages)
+        numbers = re.findall(r"\d+", question)
+        number = numbers[0] if numbers else ""
+        turn_index = _turn_index(messages)
+        for scenario in self.scenarios:
+            if scenario.get("match", "").lower() in question.lower():
+                turns = scenario["turns"]
+                if turn_index < len(turns):
+                    return _fill(turns[turn_index], number)
+                break
+        return {"content": f"Replayed answer to: {question}"}
+
+    def _build(self, messages: list):
+        turn = self._turn(messages)
+        calls = [
+            _tool_call(i, f"replay_{_turn_index(messages)}_{i}", call["name"], call.get("arguments", {}))
+            for i, call in enumerate(turn.get("tool_calls", []))
+        ]
+        return _response(turn.get("content", ""), calls)
+
+    def complete(self, model, messages, tools=None):
+        time.sleep(self._latency())
+        return self._build(messages)
+
+    async def complete_async(self, model, messages, tools=None):
+        await asyncio.sleep(self._latency())
+        return self._build(messages)
+
+    def stream(self, model, messages, tools=None):
+        latency = self._latency()
+        message = self._build(messages).choices[0].message
+        if message.tool_calls:
+            time.sleep(latency)
+            yield _stream_event(tool_calls=message.tool_calls)
+            return
+        tokens = re.findall(r"\S+\s*", message.content) or [""]
+        for token in tokens:
+            time.sleep(latency / len(tokens))
+            yield _stream_event(content=token)
+
+
+class RecordingChatClient(ChatClient):
+    """Forwards to another client and records every question's turns for ReplayChatClient."""
+
+    def __init__(self, client: ChatClient):
+        self.client = client
+        self.recordings = {}
+        self._lock = threading.Lock()
+
+    def _record(self, messages: list, response):
+        message = response.choices[0].message
+        turn = {"content": message.content or ""}
+        if message.tool_calls:
+            turn = {"tool_calls": [
+                {"name": c.function.name, "arguments": json.loads(c.function.arguments)}
+                for c in message.tool_calls
+            ]}
+        with self._lock:
+            turns = self.recordings.setdefault(_question(messages), [])
+            del turns[_turn_index(messages):]
+            turns.append(turn)
+        return response
+
+    def complete(self, model, messages, tools=None):
+        return self._record(messages, self.client.complete(model, messages, tools))
+
+    async def complete_async(self, model, messages, tools=None):
+        return self._record(messages, await self.client.complete_async(model, messages, tools))
+
+    def script(self) -> list:
+        # Exact questions as match texts, longest first so no recording shadows another
+        return [
+            {"match": question, "turns": turns}
+            for question, turns in sorted(self.recordings.items(), key=lambda item: -len(item[0]))
+        ]
+
+    def save(self, path) -> None:
+        Path(path).write_text(json.dumps(self.script(), indent=2))
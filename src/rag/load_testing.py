@@ -0,0 +1,150 @@
+'''
+Load test of RAGOrchestrator without the paid API.
+
+The orchestrator runs against llm_clients.ReplayChatClient (replayed tool-call
+sequences, simulated API latency) and is driven open-loop at a target rate: questions
+are sent at fixed intervals no matter how many are still in flight, like real users.
+The report shows the achieved rate, the latency percentiles and where the time went
+per phase (retrieval, tool execution, prompt construction, plotting, LLM), so the
+orchestrator's own overhead under concurrency is visible.
+
+    PYTHONPATH=src python -m rag.load_testing --qps 5 --duration 30 --latency 0.8 --jitter 0.4
+'''
+import argparse
+import asyncio
+import json
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from etl.load import load_processed_data
+from .batch import latency_summary
+from .llm_clients import ReplayChatClient
+
+# Replayed agent behaviour for the question templates below
+DEFAULT_SCRIPT = [
+    {"match": "visualize", "turns": [
+        {"tool_calls": [{"name": "generate_customer_visualization",
+                         "arguments": {"customer_id": "{number}", "plot_type": "frequency"}}]},
+        {"content": "The plot shows how customer {number} compares with all other customers."},
+    ]},
+    {"match": "profile", "turns": [
+        {"tool_calls": [{"name": "execute_data_analysis",
+                         "arguments": {"query_type": "filter", "table_name": "customers",
+                                       "column": "customer_id", "operator": "==", "value": "{number}"}},
+                        {"name": "execute_data_analysis",
+                         "arguments": {"query_type": "filter", "table_name": "transactions",
+                                       "column": "customer_id", "operator": "==", "value": "{number}"}}]},
+        {"content": "Customer {number} profile: see the customer and transaction records above."},
+    ]},
+    {"match": "top", "turns": [
+        {"tool_calls": [{"name": "execute_data_analysis",
+                         "arguments": {"query_type": "top_n", "table_name": "customers",
+                                       "column": "total_spend_eur", "n": "{number}"}}]},
+        {"content": "These are the top {number} customers by total spend."},
+    ]},
+    {"match": "", "turns": [{"content": "According to the policy documents, this is handled as described."}]},
+]
+QUESTION_TEMPLATES = [
+    "Could you provide a detailed profile for customer ID {customer_id}?",
+    "Customer {customer_id} is interesting, I would like to visualize how it compares with the rest?",
+    "Identify the top {n} customers by total spending.",
+    "What is our refund policy for cross-border transactions? (ticket {ticket})",
+]
+PHASES = ["cache_lookup", "retrieval", "prompt_construction", "llm", "tool_execution", "plotting"]
+
+
+def generate_questions(n: int, seed: int = 0, base_path: str = "data/processed_gold") -> list:
+    # Real customer ids, so the tools do real lookups and plots
+    customer_ids = load_processed_data("gold_customers", base_path=base_path, columns=["customer_id"])["customer_id"]
+    rng = random.Random(seed)
+    ids = [int(i) for i in customer_ids.dropna().sample(min(n, len(customer_ids)), random_state=seed)]
+    return [
+        QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(
+            customer_id=ids[i % len(ids)], n=rng.randint(3, 10), ticket=rng.randint(1000, 9999)
+        )
+        for i in range(n)
+    ]
+
+
+async def run_load_test(orchestrator, questions: list, qps: float, duration_s: float) -> dict:
+    """Sends questions at `qps` for `duration_s` seconds (open loop) and reports the results."""
+    total = max(1, int(qps * duration_s))
+    in_flight, max_in_flight = 0, 0
+
+    async def one(question: str) -> dict:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        start = time.perf_counter()
+        response = await orchestrator.ask_async(question)
+        in_flight -= 1
+        return {"latency_s": time.perf_counter() - start, "metadata": response.get("metadata", {})}
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        await asyncio.sleep(max(0.0, start + i / qps - time.perf_counter()))
+        tasks.append(asyncio.create_task(one(questions[i % len(questions)])))
+    results = await asyncio.gather(*tasks)
+    wall_s = time.perf_counter() - start
+
+    latencies = [r["latency_s"] for r in results]
+    phase_rows = []
+    for phase in PHASES:
+        values = [r["metadata"].get("timings", {}).get(phase, 0.0) for r in results]
+        phase_rows.append({"phase": phase, "mean_s": float(np.mean(values)), "p95_s": float(np.percentile(values, 95))})
+    # Waiting for threads, the event loop and response building
+    other = float(np.mean(latencies)) - sum(row["mean_s"] for row in phase_rows)
+    phase_rows.append({"phase": "other", "mean_s": max(other, 0.0), "p95_s": np.nan})
+    phases = pd.DataFrame(phase_rows)
+    phases["share"] = phases["mean_s"] / phases["mean_s"].sum()
+
+    return {
+        "target_qps": qps,
+        "achieved_qps": round(total / wall_s, 3),
+        "requests": total,
+        "errors": sum(r["metadata"].get("status") == "error" for r in results),
+        "served_from_cache": sum(bool(r["metadata"].get("served_from_cache")) for r in results),
+        "max_in_flight": max_in_flight,
+        "wall_s": round(wall_s, 3),
+        "latency": latency_summary(latencies),
+        "phases": phases.round(4).replace({np.nan: None}).to_dict(orient="records"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the RAG orchestrator with a local replay LLM.")
+    parser.add_argument("--qps", type=float, default=2.0, help="Target questions per second.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to send questions for.")
+    parser.add_argument("--latency", type=float, default=0.8, help="Simulated seconds per LLM call.")
+    parser.add_argument("--jitter", type=float, default=0.4, help="Random extra seconds per LLM call.")
+    parser.add_argument("--script", default=None, help="Replay script JSON (default: built-in scenarios).")
+    parser.add_argument("--questions", default=None, help="JSONL file of questions (default: generated).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the report as JSON.")
+    args = parser.parse_args()
+
+    from .rag_logic import GOLD_PATH, RAGOrchestrator
+
+    client = ReplayChatClient(args.script or DEFAULT_SCRIPT, latency_s=args.latency, jitter_s=args.jitter, seed=args.seed)
+    orchestrator = RAGOrchestrator(chat_client=client)
+    if args.questions:
+        with open(args.questions, "r") as f:
+            questions = [json.loads(line)["question"] for line in f if line.strip()]
+    else:
+        questions = generate_questions(max(1, int(args.qps * args.duration)), args.seed, GOLD_PATH)
+
+    report = asyncio.run(run_load_test(orchestrator, questions, args.qps, args.duration))
+    print(pd.DataFrame(report["phases"]).to_string(index=False))
+    print(json.dumps({k: v for k, v in report.items() if k != "phases"}, indent=2))
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,26 @@
 import os
 import json
+import asyncio
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Optional
 import pandas as pd
 from pathlib import Path
-from mistralai import Mistral
 from dotenv import load_dotenv
+from etl.load import table_version
 from .ingest import ChromaIngestor
+from .llm_clients import ChatClient, MistralChatClient
+from .retrieval_cache import RetrievalCache
+from .answer_cache import DEFAULT_SIMILARITY_THRESHOLD, SemanticAnswerCache
+from .token_budget import TokenBudget
 
 from .tools import (
     get_gold_data_summary,
     execute_data_analysis,
     get_csv_tool_definition,
-    generate_customer_visualization,
+    render_customer_visualization,
+    figure_to_png_bytes,
     get_viz_tool_definition
 )
 
@@ -18,14 +28,72 @@ load_dotenv()
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 DB_PATH = str(PROJECT_ROOT / "data" / "chroma_db")
+GOLD_PATH = str(PROJECT_ROOT / "data" / "processed_gold")
+GOLD_TABLES = ["gold_customers", "gold_transactions"]
+# LLM round trips per question (each may request tool calls)
+MAX_AGENT_TURNS = 3
+# Policy chunks retrieved as background context per question
+N_RESULTS = 3
+
+
+def _message_field(message, field: str):
+    # Assistant messages are SDK objects, or dicts when they were assembled from a stream
+    return message.get(field) if isinstance(message, dict) else getattr(message, field, None)
+
+
+def _final_answer(messages: list):
+    # The answer is the last assistant message, unless it still asked for tool calls
+    # (the turns ran out): then the conversation ends on tool output, which is no answer
+    last = messages[-1]
+    if _message_field(last, "role") != "assistant" or _message_field(last, "tool_calls"):
+        return None
+    return _message_field(last, "content")
+
+
+@contextmanager
+def _timed(timings: dict, phase: str):
+    # Adds the duration of the block to timings[phase] (seconds)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = round(timings.get(phase, 0.0) + time.perf_counter() - start, 4)
+
+
+def _merge_timings(timings: dict, other: dict) -> None:
+    for phase, seconds in other.items():
+        timings[phase] = round(timings.get(phase, 0.0) + seconds, 4)
+
+
+def _delta_text(content) -> str:
+    # Streamed content is a string, or a list of content chunks
+    if content is None or isinstance(content, str):
+        return content or ""
+    return "".join(getattr(chunk, "text", "") or "" for chunk in content)
+
 
 class RAGOrchestrator:
-    def __init__(self):
-        self.client = Mistral(api_key=os.getenv("MISTRAL_API_KEY"))
+    def __init__(
+        self,
+        answer_similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        chat_client: Optional[ChatClient] = None,
+        token_budget: Optional[TokenBudget] = None
+    ):
+        # Any ChatClient works, e.g. llm_clients.ReplayChatClient for offline load tests
+        self.client = chat_client or MistralChatClient(api_key=os.getenv("MISTRAL_API_KEY"))
         self.model = "mistral-small-latest"
+        # Caps the prompt of every LLM turn, token counts per turn go to the metadata
+        self.token_budget = token_budget or TokenBudget()
 
         self.vector_db = ChromaIngestor(db_path=DB_PATH)
+        self.retrieval_cache = RetrievalCache()
+        # Near-duplicate questions are answered from the cache (same embedding function
+        # as the vector store, so the question is embedded once for both)
+        self.answer_cache = SemanticAnswerCache(
+            self.vector_db.emb_fn, similarity_threshold=answer_similarity_threshold
+        )
         self.gold_summary = get_gold_data_summary()
+        self._gold_summary_version = table_version(GOLD_TABLES, GOLD_PATH)
         self.tools = [
             get_csv_tool_definition(),
             get_viz_tool_definition()
@@ -33,53 +101,295 @@ class RAGOrchestrator:
          
     def ask(self, user_query: str) -> dict:
         """Main entry point: Orchestrates the background context and agent loop."""
+        start, timings = time.perf_counter(), {}
         try:
+            # 0. Answer near-duplicate questions from the cache
+            with _timed(timings, "cache_lookup"):
+                data_version = self._data_version()
+                query_embedding = self.answer_cache.embed(user_query)
+                cached = self.answer_cache.get(user_query, data_version, query_embedding)
+            if cached is not None:
+                return self._with_timings(self._cached_response(*cached), timings, start)
+
             # 1. Get background context (Policy documents)
-            context, source_df = self._get_background_context(user_query)
+            with _timed(timings, "retrieval"):
+                context, source_df = self._get_background_context(user_query)
             
             # 2. Prepare conversation state
-            messages = self._initialize_messages(user_query, context)
-            collected_plots = []
+            with _timed(timings, "prompt_construction"):
+                self._refresh_gold_summary()
+                messages = self._initialize_messages(user_query, context)
+            collected_plots, token_turns = [], []
 
             # 3. Enter Agentic Loop
-            for _ in range(3):
-                response = self.client.chat.complete(
-                    model=self.model,
-                    messages=messages,
-                    tools=self.tools
-                )
+            for _ in range(MAX_AGENT_TURNS):
+                with _timed(timings, "prompt_construction"):
+                    self.token_budget.start_turn(messages, token_turns)
+                with _timed(timings, "llm"):
+                    response = self.client.complete(
+                        model=self.model,
+                        messages=messages,
+                        tools=self.tools
+                    )
                 
                 msg = response.choices[0].message
                 messages.append(msg)
+                self.token_budget.end_turn(token_turns, msg, response)
 
                 if not msg.tool_calls:
                     break
                 
                 # 4. Process tool calls and update conversation
-                turn_plots = self._process_tool_calls(msg.tool_calls, messages)
+                turn_plots = self._process_tool_calls(msg.tool_calls, messages, timings)
                 collected_plots.extend(turn_plots)
 
-            return {
-                "answer": messages[-1].content,
-                "source_data": source_df,
-                "metadata": {
-                    "method": "modular_agentic_rag",
-                    "plots": collected_plots,
-                    "steps": len(messages)
-                }
-            }
+            response = self._build_response(user_query, data_version, query_embedding, messages, source_df, collected_plots, timings, token_turns)
+            return self._with_timings(response, timings, start)
+
+        except Exception as e:
+            return self._handle_error(e)
+
+    async def ask_async(self, user_query: str) -> dict:
+        """
+        Async variant of ask using the Mistral async client. Retrieval runs concurrently
+        with the gold summary refresh, and the tool calls of one turn run in parallel;
+        blocking pandas/matplotlib/embedding work is offloaded to threads.
+        """
+        start, timings = time.perf_counter(), {}
+        try:
+            with _timed(timings, "cache_lookup"):
+                data_version = await asyncio.to_thread(self._data_version)
+                query_embedding = await asyncio.to_thread(self.answer_cache.embed, user_query)
+                cached = self.answer_cache.get(user_query, data_version, query_embedding)
+            if cached is not None:
+                return self._with_timings(self._cached_response(*cached), timings, start)
+
+            with _timed(timings, "retrieval"):
+                (context, source_df), _ = await asyncio.gather(
+                    asyncio.to_thread(self._get_background_context, user_query),
+                    asyncio.to_thread(self._refresh_gold_summary),
+                )
+
+            with _timed(timings, "prompt_construction"):
+                messages = self._initialize_messages(user_query, context)
+            collected_plots, token_turns = [], []
+
+            for _ in range(MAX_AGENT_TURNS):
+                with _timed(timings, "prompt_construction"):
+                    self.token_budget.start_turn(messages, token_turns)
+                with _timed(timings, "llm"):
+                    response = await self.client.complete_async(
+                        model=self.model,
+                        messages=messages,
+                        tools=self.tools
+                    )
+
+                msg = response.choices[0].message
+                messages.append(msg)
+                self.token_budget.end_turn(token_turns, msg, response)
+
+                if not msg.tool_calls:
+                    break
+
+                turn_plots = await self._process_tool_calls_async(msg.tool_calls, messages, timings)
+                collected_plots.extend(turn_plots)
+
+            # Serializing the plots for the answer cache is matplotlib work as well
+            response = await asyncio.to_thread(
+                self._build_response, user_query, data_version, query_embedding, messages, source_df, collected_plots, timings, token_turns
+            )
+            return self._with_timings(response, timings, start)
 
         except Exception as e:
             return self._handle_error(e)
 
-    def _get_background_context(self, query: str):
-        """Retrieves and formats policy data from the vector database."""
-        results = self.vector_db.collection.query(query_texts=[query], n_results=3)
+    def ask_stream(self, user_query: str):
+        """
+        Streaming variant of ask. Yields events while the agent works:
+          {"type": "status", "message": str}               progress of the pipeline
+          {"type": "tool_start", "name": str, "arguments": dict}
+          {"type": "tool_end", "name": str, "plot": PNG bytes or None}
+          {"type": "token", "text": str}                   piece of the answer text
+          {"type": "final", "response": dict}              same result as ask()
+        The time to the first answer token is recorded as metadata["ttft_seconds"].
+        """
+        start, timings = time.perf_counter(), {}
+        ttft = None
+        try:
+            yield {"type": "status", "message": "Checking the answer cache..."}
+            with _timed(timings, "cache_lookup"):
+                data_version = self._data_version()
+                query_embedding = self.answer_cache.embed(user_query)
+                cached = self.answer_cache.get(user_query, data_version, query_embedding)
+            if cached is not None:
+                response = self._with_timings(self._cached_response(*cached), timings, start)
+                response["metadata"]["ttft_seconds"] = response["metadata"]["total_seconds"]
+                yield {"type": "token", "text": response["answer"]}
+                yield {"type": "final", "response": response}
+                return
+
+            yield {"type": "status", "message": "Retrieving policy documents..."}
+            with _timed(timings, "retrieval"):
+                context, source_df = self._get_background_context(user_query)
+            with _timed(timings, "prompt_construction"):
+                self._refresh_gold_summary()
+                messages = self._initialize_messages(user_query, context)
+            collected_plots, token_turns = [], []
+
+            for _ in range(MAX_AGENT_TURNS):
+                yield {"type": "status", "message": "Waiting for the model..."}
+                with _timed(timings, "prompt_construction"):
+                    self.token_budget.start_turn(messages, token_turns)
+                content, tool_calls, usage_event = "", [], None
+                stream = self.client.stream(
+                    model=self.model,
+                    messages=messages,
+                    tools=self.tools
+                )
+                # Includes the time the consumer spends between tokens (rendering)
+                llm_start = time.perf_counter()
+                for event in stream:
+                    # The usage of the call comes with the last event (when reported)
+                    if getattr(event.data, "usage", None) is not None:
+                        usage_event = event.data
+                    if not event.data.choices:
+                        continue
+                    delta = event.data.choices[0].delta
+                    text = _delta_text(delta.content)
+                    if text:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                        content += text
+                        yield {"type": "token", "text": text}
+                    # A tool call may arrive in pieces: a piece without id continues the last call
+                    for call in delta.tool_calls or []:
+                        if call.id or not tool_calls:
+                            tool_calls.append({"id": call.id, "name": "", "arguments": ""})
+                        entry = tool_calls[-1]
+                        entry["name"] += call.function.name or ""
+                        arguments = call.function.arguments
+                        entry["arguments"] += arguments if isinstance(arguments, str) else json.dumps(arguments or {})
+
+                _merge_timings(timings, {"llm": time.perf_counter() - llm_start})
+
+                calls = [
+                    SimpleNamespace(id=t["id"], function=SimpleNamespace(name=t["name"], arguments=t["arguments"]))
+                    for t in tool_calls
+                ]
+                assistant_message = {"role": "assistant", "content": content}
+                if calls:
+                    assistant_message["tool_calls"] = [
+                        {"id": c.id, "type": "function", "function": {"name": c.function.name, "arguments": c.function.arguments}}
+                        for c in calls
+                    ]
+                messages.append(assistant_message)
+                self.token_budget.end_turn(token_turns, assistant_message, usage_event)
+
+                if not calls:
+                    break
+
+                for call in calls:
+                    yield {"type": "tool_start", "name": call.function.name, "arguments": json.loads(call.function.arguments)}
+                    message, fig = self._execute_tool_call(call, timings)
+                    messages.append(message)
+                    if fig is not None:
+                        collected_plots.append(fig)
+                    yield {"type": "tool_end", "name": call.function.name, "plot": fig}
+
+            response = self._build_response(user_query, data_version, query_embedding, messages, source_df, collected_plots, timings, token_turns)
+            response = self._with_timings(response, timings, start)
+            response["metadata"]["ttft_seconds"] = round(ttft, 4) if ttft is not None else None
+            yield {"type": "final", "response": response}
+
+        except Exception as e:
+            yield {"type": "final", "response": self._handle_error(e)}
+
+    def _build_response(self, user_query, data_version, query_embedding, messages, source_df, collected_plots, timings, token_turns) -> dict:
+        answer = _final_answer(messages)
+        complete = answer is not None
+        if not complete:
+            answer = f"No final answer within {MAX_AGENT_TURNS} agent turns. Please rephrase or narrow the question."
+        elif answer:
+            # Plots are cached as PNG images, not as live figures
+            with _timed(timings, "plotting"):
+                plots = [fig if isinstance(fig, bytes) else figure_to_png_bytes(fig) for fig in collected_plots]
+            self.answer_cache.put(user_query, data_version, {
+                "answer": answer,
+                "source_data": source_df.copy(),
+                "plots": plots,
+                "steps": len(messages)
+            }, query_embedding)
+
+        return {
+            "answer": answer,
+            "source_data": source_df,
+            "metadata": {
+                "method": "modular_agentic_rag",
+                "plots": collected_plots,
+                "steps": len(messages),
+                "served_from_cache": False,
+                "status": "success" if complete else "incomplete",
+                "tokens": self.token_budget.report(token_turns),
+                "retrieval_cache": self.retrieval_cache.stats(),
+                "answer_cache": self.answer_cache.stats()
+            }
+        }
+
+    def _with_timings(self, response: dict, timings: dict, start: float) -> dict:
+        # Seconds per phase (cache_lookup, retrieval, prompt_construction, llm, tool_execution, plotting)
+        response["metadata"]["timings"] = timings
+        response["metadata"]["total_seconds"] = round(time.perf_counter() - start, 4)
+        return response
+
+    def _data_version(self) -> str:
+        # Cached answers are only valid for the gold tables and policy documents they were built from
+        return f"{table_version(GOLD_TABLES, GOLD_PATH)}:{self.vector_db.collection_version()}"
+
+    def _refresh_gold_summary(self) -> str:
+        # The schema summary is only rebuilt when the gold tables were rewritten
+        version = table_version(GOLD_TABLES, GOLD_PATH)
+        if version != self._gold_summary_version:
+            self.gold_summary = get_gold_data_summary()
+            self._gold_summary_version = version
+        return self.gold_summary
+
+    def _cached_response(self, cached: dict, similarity: float, cached_question: str) -> dict:
+        return {
+            "answer": cached["answer"],
+            "source_data": cached["source_data"].copy(),
+            "metadata": {
+                "method": "modular_agentic_rag",
+                "plots": list(cached["plots"]),
+                "steps": cached["steps"],
+                "served_from_cache": True,
+                "cache_similarity": similarity,
+                "cached_question": cached_question,
+                # Same shape as a computed answer; a cached answer costs no tokens
+                "tokens": self.token_budget.report([], cache_hit=True),
+                "retrieval_cache": self.retrieval_cache.stats(),
+                "answer_cache": self.answer_cache.stats()
+            }
+        }
+
+    def _get_background_context(self, query: str, n_results: int = N_RESULTS):
+        """
+        Retrieves and formats policy data from the vector database.
+        Results are cached per question until the collection is re-ingested.
+        """
+        version = self.vector_db.collection_version()
+        cached = self.retrieval_cache.get(query, n_results, version)
+        if cached is not None:
+            context, source_df = cached
+            # Callers get their own copy of the (small) source table
+            return context, source_df.copy()
+
+        results = self.vector_db.collection.query(query_texts=[query], n_results=n_results)
         context = "\n".join(results['documents'][0])
         source_df = pd.DataFrame([
             {"Source": m['source'], "Snippet": d[:75] + "..."} 
             for m, d in zip(results['metadatas'][0], results['documents'][0])
         ])
+        self.retrieval_cache.put(query, n_results, version, (context, source_df.copy()))
         return context, source_df
 
     def _initialize_messages(self, query: str, context: str, specific_data: str = "No records fetched yet.") -> list:
@@ -89,7 +399,7 @@ class RAGOrchestrator:
         You have access to two main knowledge sources:
         
         1. POLICY DOCUMENTS (Unstructured):
-        {context}
+        {self.token_budget.fit_context(context)}
         
         2. CUSTOMER DATA SUMMARY (Structured):
         {self.gold_summary}
@@ -110,32 +420,65 @@ class RAGOrchestrator:
             {"role": "user", "content": query}
         ]
 
-    def _process_tool_calls(self, tool_calls, messages: list) -> list:
+    def _execute_tool_call(self, call, timings: dict):
+        # Runs one tool call, returns its tool message and the generated figure (if any)
+        name = call.function.name
+        args = json.loads(call.function.arguments)
+        fig = None
+
+        if name == "execute_data_analysis":
+            with _timed(timings, "tool_execution"):
+                result = execute_data_analysis(**args)
+        elif name == "generate_customer_visualization":
+            with _timed(timings, "plotting"):
+                fig = render_customer_visualization(**args)
+            result = f"Generated {args['plot_type']} plot for customer {args['customer_id']}."
+        else:
+            result = f"Error: Unknown tool '{name}'."
+
+        message = {
+            "role": "tool", "name": name, 
+            "content": self.token_budget.fit_tool_result(str(result)), "tool_call_id": call.id
+        }
+        return message, fig
+
+    def _process_tool_calls(self, tool_calls, messages: list, timings: dict) -> list:
         #Iterates through tool calls, executes them, and updates message history
         plots = []
-        data_evidence = ""
         for call in tool_calls:
-            name = call.function.name
-            args = json.loads(call.function.arguments)
-            
-            if name == "execute_data_analysis":
-                result = execute_data_analysis(**args)
-                data_evidence += f"\n--- Data from {args['table_name']} ---\n{result}"
-            elif name == "generate_customer_visualization":
-                fig = generate_customer_visualization(**args)
+            message, fig = self._execute_tool_call(call, timings)
+            messages.append(message)
+            if fig is not None:
+                plots.append(fig)
+        return plots
+
+    async def _process_tool_calls_async(self, tool_calls, messages: list, timings: dict) -> list:
+        # The calls of one turn are independent and run in parallel threads. gather keeps
+        # the order of the calls, so the tool messages follow the order the API expects.
+        # Each call times itself into its own dict; the phases add up the calls, not wall time.
+        call_timings = [{} for _ in tool_calls]
+        results = await asyncio.gather(*(
+            asyncio.to_thread(self._execute_tool_call, call, call_timing)
+            for call, call_timing in zip(tool_calls, call_timings)
+        ))
+        for call_timing in call_timings:
+            _merge_timings(timings, call_timing)
+        plots = []
+        for message, fig in results:
+            messages.append(message)
+            if fig is not None:
                 plots.append(fig)
-                result = f"Generated {args['plot_type']} plot for customer {args['customer_id']}."
-            
-            messages.append({
-                "role": "tool", "name": name, 
-                "content": str(result), "tool_call_id": call.id
-            })
         return plots
 
     def _handle_error(self, e: Exception) -> dict:
         # Error handling
+        # The HTTP status (e.g. 429 rate limit) of API errors lets callers decide to retry
         return {
             "answer": f"Agent error: {str(e)}",
             "source_data": pd.DataFrame(),
-            "metadata": {"status": "error"}
+            "metadata": {
+                "status": "error",
+                "error_type": type(e).__name__,
+                "status_code": getattr(e, "status_code", None)
+            }
         }
\ No newline at end of file
@@ -0,0 +1,82 @@
+'''
+In-process cache of retrieval results (policy context and source table per question).
+
+Entries are keyed by the normalized question and n_results, bounded with LRU eviction
+and expire after a TTL. Each entry belongs to a collection version: when the
+collection is re-ingested its version changes and all cached results are dropped.
+'''
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 600
+
+
+def normalize_query(query: str) -> str:
+    # Case and whitespace don't change what the user asks for
+    return " ".join(query.casefold().split())
+
+
+class RetrievalCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        # The orchestrator is shared between Streamlit sessions (threads)
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: Optional[str]) -> None:
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, query: str, n_results: int, version: Optional[str]):
+        key = (normalize_query(query), n_results)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query: str, n_results: int, version: Optional[str], value) -> None:
+        key = (normalize_query(query), n_results)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "collection_version": self.version,
+            }
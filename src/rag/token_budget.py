@@ -0,0 +1,142 @@
+'''
+Token accounting and budgeting for the agent's prompts.
+
+Every LLM turn resends the whole message list (system prompt with the policy context and
+schema, the question, earlier tool calls and results), so the prompt grows with each
+turn. TokenBudget keeps one question's prompts within max_prompt_tokens:
+- the policy context is capped when the system prompt is built,
+- every tool result is capped (the tools already return compact CSV),
+- before each LLM turn, while the prompt is over budget, the tool results of earlier
+  turns are shortened to their first lines; the results of the latest turn stay whole.
+
+Counts are estimates (about 4 characters per token, close to the Mistral tokenizer for
+English text and CSV), so no tokenizer has to be loaded. Where the API reports the usage
+of a call, the reported counts are recorded next to the estimates.
+'''
+import math
+from typing import Optional
+
+CHARS_PER_TOKEN = 4
+# Role and separators of one message
+MESSAGE_OVERHEAD_TOKENS = 4
+DEFAULT_MAX_PROMPT_TOKENS = 6000
+DEFAULT_MAX_CONTEXT_TOKENS = 1500
+DEFAULT_MAX_TOOL_RESULT_TOKENS = 1000
+# Lines kept of an earlier turn's tool result when the prompt is over budget
+COMPACT_TOOL_RESULT_LINES = 3
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _field(obj, field: str):
+    # Messages are dicts, or SDK objects for the assistant turns
+    return obj.get(field) if isinstance(obj, dict) else getattr(obj, field, None)
+
+
+def _content_text(content) -> str:
+    if content is None or isinstance(content, str):
+        return content or ""
+    return "".join(getattr(chunk, "text", "") or "" for chunk in content)
+
+
+def message_tokens(message) -> int:
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(_content_text(_field(message, "content")))
+    for call in _field(message, "tool_calls") or []:
+        function = _field(call, "function")
+        tokens += estimate_tokens(_field(function, "name")) + estimate_tokens(str(_field(function, "arguments") or ""))
+    return tokens
+
+
+def count_tokens(messages: list) -> int:
+    return sum(message_tokens(m) for m in messages)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * CHARS_PER_TOKEN]
+    # Cut at a line break so no table row is left half
+    if "\n" in cut:
+        cut = cut[:cut.rindex("\n")]
+    return f"{cut}\n[... truncated, about {estimate_tokens(text) - estimate_tokens(cut)} more tokens]"
+
+
+def _compact(text: str) -> str:
+    lines = text.splitlines()
+    if len(lines) <= COMPACT_TOOL_RESULT_LINES:
+        return text
+    kept = "\n".join(lines[:COMPACT_TOOL_RESULT_LINES])
+    return f"{kept}\n[... {len(lines) - COMPACT_TOOL_RESULT_LINES} more lines of an earlier result left out]"
+
+
+def reported_usage(response) -> dict:
+    # Token usage reported by the API for one call (empty when the client doesn't report it)
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {
+        "reported_prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "reported_completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+
+
+class TokenBudget:
+    def __init__(
+        self,
+        max_prompt_tokens: int = DEFAULT_MAX_PROMPT_TOKENS,
+        max_context_tokens: int = DEFAULT_MAX_CONTEXT_TOKENS,
+        max_tool_result_tokens: int = DEFAULT_MAX_TOOL_RESULT_TOKENS,
+    ):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_context_tokens = max_context_tokens
+        self.max_tool_result_tokens = max_tool_result_tokens
+
+    def fit_context(self, context: str) -> str:
+        return truncate_to_tokens(context, self.max_context_tokens)
+
+    def fit_tool_result(self, result: str) -> str:
+        return truncate_to_tokens(result, self.max_tool_result_tokens)
+
+    def trim(self, messages: list) -> int:
+        """Shortens earlier turns' tool results (in place) while over budget; returns the tokens saved."""
+        total = count_tokens(messages)
+        if total <= self.max_prompt_tokens:
+            return 0
+        roles = [_field(m, "role") for m in messages]
+        if "assistant" not in roles:
+            return 0
+        # Tool results before the last assistant message belong to earlier turns, oldest first
+        last_assistant = len(roles) - 1 - roles[::-1].index("assistant")
+        saved = 0
+        for i in range(last_assistant):
+            if roles[i] != "tool":
+                continue
+            before = message_tokens(messages[i])
+            messages[i] = {**messages[i], "content": _compact(messages[i]["content"])}
+            saved += before - message_tokens(messages[i])
+            if total - saved <= self.max_prompt_tokens:
+                break
+        return saved
+
+    def start_turn(self, messages: list, turns: list) -> None:
+        # Called before each LLM call: trims the prompt and records its size
+        trimmed = self.trim(messages)
+        turns.append({"turn": len(turns) + 1, "prompt_tokens": count_tokens(messages), "trimmed_tokens": trimmed})
+
+    def end_turn(self, turns: list, message, response=None) -> None:
+        # Called with the assistant message (and the API response) of the turn
+        turns[-1]["completion_tokens"] = message_tokens(message)
+        if response is not None:
+            turns[-1].update(reported_usage(response))
+
+    def report(self, turns: list, cache_hit: bool = False) -> dict:
+        """Token counts of a question for the response metadata (no turns for a cached answer)."""
+        return {
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "prompt_tokens": sum(t["prompt_tokens"] for t in turns),
+            "completion_tokens": sum(t.get("completion_tokens", 0) for t in turns),
+            "turns": turns,
+            "cache_hit": cache_hit,
+        }
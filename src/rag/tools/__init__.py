@@ -1,3 +1,4 @@
+from .gold_data import GOLD_DATA, GoldDataStore
 from .csv_analysis import (
     get_gold_data_summary, 
     execute_data_analysis, 
@@ -5,13 +6,19 @@ from .csv_analysis import (
 )
 from .viz_tool import (
     generate_customer_visualization,
+    render_customer_visualization,
+    figure_to_png_bytes,
     get_viz_tool_definition
 )
 
 __all__ = [
+    "GOLD_DATA",
+    "GoldDataStore",
     "get_gold_data_summary",
     "execute_data_analysis",
     "get_csv_tool_definition",
     "generate_customer_visualization",
+    "render_customer_visualization",
+    "figure_to_png_bytes",
     "get_viz_tool_definition"
 ]
\ No newline at end of file
@@ -1,57 +1,136 @@
 import pandas as pd
+from .gold_data import GOLD_DATA
+from .indexes import RANGE_OPERATORS, get_table_index, is_range_indexable
+from .sql_engine import AGGREGATIONS, run_aggregate
+from .result_format import format_result
 
-CUST_DF = pd.read_csv("data/processed_gold/gold_customers.csv")
-TRANS_DF = pd.read_csv("data/processed_gold/gold_transactions.csv")
+# Rows returned for filter queries
+MAX_RESULT_ROWS = 10
+# Upper bound of n for top_n queries
+MAX_TOP_N = 50
+# Comparisons of filter queries that no index answers (missing values never match)
+COMPARISONS = {
+    "==": pd.Series.eq,
+    "!=": pd.Series.ne,
+    ">": pd.Series.gt,
+    "<": pd.Series.lt,
+    ">=": pd.Series.ge,
+    "<=": pd.Series.le,
+}
+FILTER_OPERATORS = list(COMPARISONS) + ["contains"]
 
 def get_gold_data_summary():
     """Returns a string representation of the schema for LLM context."""
+    try:
+        gold = GOLD_DATA.snapshot()
+    except FileNotFoundError as e:
+        return f"\n    GOLD DATA NOT AVAILABLE: {e}\n    "
     summary = f"""
     TABLE SCHEMAS:
-    - GOLD_CUSTOMERS: {list(CUST_DF.columns)}
-    - GOLD_TRANSACTIONS: {list(TRANS_DF.columns)}
+    - GOLD_CUSTOMERS: {list(gold['customers'].columns)}
+    - GOLD_TRANSACTIONS: {list(gold['transactions'].columns)}
     """
     return summary
 
-def execute_data_analysis(query_type: str, table_name: str, column: str, value: str = None, operator: str = "==", n: int = 5):
-    df = CUST_DF if table_name == "customers" else TRANS_DF
+def execute_data_analysis(
+    query_type: str,
+    table_name: str,
+    column: str,
+    value: str = None,
+    operator: str = "==",
+    n: int = None,
+    aggregation: str = "count",
+    group_by: list = None,
+    filter_column: str = None,
+    columns: list = None
+):
+    try:
+        df = GOLD_DATA.get("customers" if table_name == "customers" else "transactions")
+    except FileNotFoundError as e:
+        return f"Error: {e}"
+
+    # --- Handle Aggregations (e.g., "Average spend by country") ---
+    # Computed by the SQL engine, only the aggregated rows are returned
+    if query_type in ("aggregate", "group_by", "join"):
+        if query_type == "group_by" and not group_by:
+            return "Error: 'group_by' queries need the group_by columns."
+        try:
+            result = run_aggregate(
+                "joined" if query_type == "join" else table_name,
+                column,
+                aggregation=aggregation,
+                group_by=group_by,
+                filter_column=filter_column,
+                operator=operator,
+                value=value,
+                limit=n,
+            )
+        except Exception as e:
+            return f"Analysis Error: {str(e)}"
+        if result.empty:
+            return f"No records found in {table_name} for this aggregation."
+        return format_result(result)
     
     if column not in df.columns:
         return f"Error: Column '{column}' not found in {table_name}."
 
     try:
+        # Point lookups, ranges and rankings are answered from indexes, not table scans
+        index = get_table_index(table_name, df)
+
         # --- Handle Ranking Queries (e.g., "Top 5 Spenders") ---
         if query_type == "top_n":
-            result = df.nlargest(n, column)
-            return result.to_string(index=False)
+            result = df.iloc[index.top_positions(column, min(n or 5, MAX_TOP_N))]
+            return format_result(result, columns=columns)
 
         # --- Handle Filter Queries (e.g., "Customer ID 1971") ---
         if query_type == "filter":
+            if operator not in FILTER_OPERATORS:
+                return f"Error: Unsupported operator '{operator}'. Use one of: {', '.join(FILTER_OPERATORS)}."
+
             # 1. Type Conversion Logic
+            # Gold tables keep their real dtypes (nullable Int64, datetimes, booleans)
             target_dtype = df[column].dtype
             
-            if target_dtype == 'bool':
+            if pd.api.types.is_bool_dtype(target_dtype):
                 converted_value = value.lower() == 'true'
-            elif target_dtype in ['int64', 'int32']:
+            elif pd.api.types.is_integer_dtype(target_dtype):
                 converted_value = int(value)
-            elif target_dtype in ['float64', 'float32']:
+            elif pd.api.types.is_float_dtype(target_dtype):
                 converted_value = float(value)
+            elif pd.api.types.is_datetime64_any_dtype(target_dtype):
+                converted_value = pd.Timestamp(value)
             else:
                 converted_value = str(value)
 
             # 2. Apply Operators
+            # Index results are row positions: all matches are counted, only the shown rows are built
+            positions = None
             if operator == "==":
-                result = df[df[column] == converted_value]
-            elif operator == ">":
-                result = df[df[column] > converted_value]
-            elif operator == "<":
-                result = df[df[column] < converted_value]
+                positions = index.lookup(column, converted_value)
+            elif operator in RANGE_OPERATORS and is_range_indexable(df[column]):
+                positions = index.range(column, operator, converted_value)
             elif operator == "contains":
+                # Substring search has no index, it scans the column
                 result = df[df[column].astype(str).str.contains(str(value), case=False)]
+            else:
+                matches = COMPARISONS[operator](df[column], converted_value) & df[column].notna()
+                result = df[matches.fillna(False).astype(bool)]
             
+            if positions is not None:
+                if len(positions) == 0:
+                    return f"No records found in {table_name} where {column} {operator} {value}."
+                return format_result(
+                    index.rows(positions, limit=MAX_RESULT_ROWS),
+                    total_rows=len(positions),
+                    all_rows=df.iloc[positions],
+                    columns=columns,
+                )
+
             if result.empty:
                 return f"No records found in {table_name} where {column} {operator} {value}."
                 
-            return result.head(10).to_string(index=False)
+            return format_result(result.head(MAX_RESULT_ROWS), total_rows=len(result), all_rows=result, columns=columns)
 
     except Exception as e:
         return f"Analysis Error: {str(e)}"
@@ -68,8 +147,14 @@ def get_csv_tool_definition():
                 "properties": {
                     "query_type": {
                         "type": "string", 
-                        "enum": ["filter", "top_n"],
-                        "description": "Use 'filter' for specific lookups (e.g., ID=123) or 'top_n' for rankings (e.g., top spenders)."
+                        "enum": ["filter", "top_n", "aggregate", "group_by", "join"],
+                        "description": (
+                            "Use 'filter' for specific lookups (e.g., ID=123) or 'top_n' for rankings (e.g., top spenders). "
+                            "For statistics use 'aggregate' (one value, e.g. average spend of DK customers), "
+                            "'group_by' (one value per group, e.g. transactions per category) or 'join' "
+                            "(transactions joined with their customers, e.g. average transaction amount by customer country). "
+                            "Aggregations return only the computed values, prefer them over fetching rows."
+                        )
                     },
                     "table_name": {
                         "type": "string", 
@@ -86,7 +171,7 @@ def get_csv_tool_definition():
                     },
                     "operator": {
                         "type": "string", 
-                        "enum": ["==", "contains", ">", "<"],
+                        "enum": ["==", "contains", ">", "<", ">=", "<=", "!="],
                         "description": "Comparison operator. Use 'contains' for partial text matches."
                     },
                     "value": {
@@ -96,7 +181,32 @@ def get_csv_tool_definition():
                     "n": {
                         "type": "integer", 
                         "default": 5, 
-                        "description": "Number of rows to return (for top_n queries)."
+                        "description": "Number of rows to return (for top_n queries), or the maximum number of groups (default 20)."
+                    },
+                    "aggregation": {
+                        "type": "string",
+                        "enum": list(AGGREGATIONS),
+                        "description": "Aggregation applied to 'column' (for aggregate, group_by and join queries). For join queries 'column' may come from either table."
+                    },
+                    "group_by": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Columns to group by (for group_by and join queries), e.g. ['country'] or ['category']."
+                    },
+                    "columns": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": (
+                            "Optional columns to return for filter and top_n queries (the id columns are always included). "
+                            "Select only what the question needs, results are shorter."
+                        )
+                    },
+                    "filter_column": {
+                        "type": "string",
+                        "description": (
+                            "Optional filter for aggregate, group_by and join queries: rows where filter_column <operator> value, "
+                            "e.g. filter_column 'timestamp', operator '>', value '2024-05-01' for recent transactions."
+                        )
                     }
                 },
                 "required": ["query_type", "table_name", "column"]
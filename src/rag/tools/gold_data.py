@@ -0,0 +1,133 @@
+'''
+Shared access to the gold tables for the RAG tools.
+
+GOLD_DATA holds one snapshot of the gold tables per process. Nothing is read at
+import: the tables are loaded on first use, so the app starts (and reports a clear
+error) before the pipeline has built them. When the stored tables change (a pipeline
+run rewrote them), the next access loads the new version and swaps the snapshot in
+atomically; callers that hold the previous snapshot keep a consistent view of it.
+
+Optionally (GOLD_DATA_MMAP=1) the tables are converted once per version to Arrow IPC
+files in data/_cache/arrow and memory-mapped as Arrow-backed DataFrames. The columns
+then point into the mapped file, so processes on the same machine (e.g. several
+Streamlit workers) share the pages instead of holding a copy each.
+'''
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from etl.load import load_processed_data, table_version
+
+logger = logging.getLogger(__name__)
+
+GOLD_PATH = "data/processed_gold"
+GOLD_TABLES = {"customers": "gold_customers", "transactions": "gold_transactions"}
+ARROW_CACHE_DIR = Path("data/_cache/arrow")
+MMAP_ENV = "GOLD_DATA_MMAP"
+# Seconds between checks of the stored tables for a new version
+CHECK_INTERVAL_SECONDS = 2.0
+
+
+class GoldSnapshot:
+    """One consistent version of all gold tables."""
+
+    def __init__(self, version: str, tables: dict):
+        self.version = version
+        self.tables = tables
+
+    def __getitem__(self, table: str) -> pd.DataFrame:
+        return self.tables[table]
+
+
+def _load_mmap(name: str, base_path: str, version: str, cache_dir: Path) -> pd.DataFrame:
+    import pyarrow as pa
+
+    path = Path(cache_dir) / f"{name}_{version}.arrow"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(load_processed_data(name, base_path=base_path), preserve_index=False)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        # Files of older versions are no longer needed (processes that mapped them keep them open)
+        for old in path.parent.glob(f"{name}_*.arrow"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    # ArrowDtype columns wrap the mapped buffers without copying them
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+class GoldDataStore:
+    def __init__(
+        self,
+        base_path: str = GOLD_PATH,
+        use_mmap: Optional[bool] = None,
+        check_interval_s: float = CHECK_INTERVAL_SECONDS,
+        cache_dir: Path = ARROW_CACHE_DIR,
+    ):
+        if use_mmap is None:
+            use_mmap = os.environ.get(MMAP_ENV, "").lower() in ("1", "true", "yes")
+        self.base_path = base_path
+        self.use_mmap = use_mmap
+        self.check_interval_s = check_interval_s
+        self.cache_dir = cache_dir
+        self._snapshot = None
+        self._checked_at = 0.0
+        # Only one thread loads a new version, the others keep using the current snapshot
+        self._load_lock = threading.Lock()
+
+    def _current_version(self) -> str:
+        version = table_version(GOLD_TABLES.values(), self.base_path)
+        if version is None:
+            raise FileNotFoundError(
+                f"Gold tables not found in {self.base_path}, run the pipeline first (python src/main.py)"
+            )
+        return version
+
+    def _load(self, version: str) -> GoldSnapshot:
+        start = time.perf_counter()
+        if self.use_mmap:
+            tables = {t: _load_mmap(name, self.base_path, version, self.cache_dir) for t, name in GOLD_TABLES.items()}
+        else:
+            tables = {t: load_processed_data(name, base_path=self.base_path) for t, name in GOLD_TABLES.items()}
+        logger.info(f"Loaded gold data version {version} in {time.perf_counter() - start:.2f}s")
+        return GoldSnapshot(version, tables)
+
+    def snapshot(self) -> GoldSnapshot:
+        """The current snapshot; loads the tables on first use and after they changed."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval_s:
+            return snapshot
+
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval_s:
+                return snapshot
+            version = self._current_version()
+            if snapshot is None or snapshot.version != version:
+                # The reference swap is atomic: readers see the old or the new snapshot
+                self._snapshot = snapshot = self._load(version)
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def get(self, table: str) -> pd.DataFrame:
+        return self.snapshot()[table]
+
+    def reload(self) -> GoldSnapshot:
+        # Loads the stored tables now, even if their version didn't change
+        with self._load_lock:
+            self._snapshot = self._load(self._current_version())
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+
+GOLD_DATA = GoldDataStore()
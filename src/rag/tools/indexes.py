@@ -0,0 +1,130 @@
+'''
+Indexes over the gold tables for the data-analysis tool.
+
+TableIndex answers the tool's queries without scanning the table:
+- hash indexes (value -> row positions): O(1) point lookups for "==". Built up front
+  for the key columns (customer_id, transaction_id), lazily for other columns.
+- sorted indexes on numeric/datetime columns: ">", "<", ">=" / "<=" ranges by binary search.
+- cached top-N orderings per numeric column: the TOP_N_CACHE largest rows, so
+  "top 5 by X" is a slice. Rows are ordered by value, ties by table position (the rows
+  nlargest(keep="first") selects, in a deterministic order for every n).
+
+Results are row positions; the callers return the matching rows in table order, like
+the boolean masks they replace.
+'''
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ["customer_id", "transaction_id"]
+# Operators answered by binary search on a sorted index
+RANGE_OPERATORS = (">", "<", ">=", "<=")
+# Largest rows remembered per column for top_n queries (larger n falls back to nlargest)
+TOP_N_CACHE = 1000
+
+
+def _sortable(series: pd.Series) -> np.ndarray:
+    # Numeric view of a column: float64 with NaN for missing values (datetimes as ns)
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        values = series.to_numpy(dtype="datetime64[ns]").astype("int64").astype("float64")
+        values[series.isna().to_numpy()] = np.nan
+        return values
+    return series.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _sortable_value(series: pd.Series, value) -> float:
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return float(pd.Timestamp(value).value)
+    return float(value)
+
+
+def is_range_indexable(series: pd.Series) -> bool:
+    return (
+        pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+    ) or pd.api.types.is_datetime64_any_dtype(series.dtype)
+
+
+class TableIndex:
+    def __init__(self, df: pd.DataFrame, key_columns=KEY_COLUMNS):
+        self.df = df
+        self._hash = {}
+        self._sorted = {}
+        self._top = {}
+        # Lazily built indexes may be requested by parallel tool calls
+        self._lock = threading.Lock()
+        for column in key_columns:
+            if column in df.columns:
+                self.hash_index(column)
+
+    def hash_index(self, column: str) -> dict:
+        with self._lock:
+            if column not in self._hash:
+                # groupby().indices: value -> positions, missing values are left out
+                self._hash[column] = self.df.groupby(column, sort=False, observed=True).indices
+            return self._hash[column]
+
+    def sorted_index(self, column: str):
+        # (sorted values, row positions) of the non-missing values
+        with self._lock:
+            if column not in self._sorted:
+                values = _sortable(self.df[column])
+                order = np.argsort(values, kind="stable")
+                order = order[~np.isnan(values[order])]
+                self._sorted[column] = (values[order], order)
+            return self._sorted[column]
+
+    def top_positions(self, column: str, n: int) -> np.ndarray:
+        # Positions of the n largest values (missing values left out), ties in table order
+        if n > TOP_N_CACHE:
+            return self._nlargest(column, n)
+        with self._lock:
+            cached = self._top.get(column)
+        if cached is None:
+            cached = self._nlargest(column, TOP_N_CACHE)
+            with self._lock:
+                self._top[column] = cached
+        return cached[:n]
+
+    def _nlargest(self, column: str, n: int) -> np.ndarray:
+        # A stable sort keeps ties in table order; nlargest orders ties differently for different n
+        values = _sortable(self.df[column])
+        order = np.argsort(-values, kind="stable")
+        return order[~np.isnan(values[order])][:n]
+
+    def lookup(self, column: str, value) -> np.ndarray:
+        return self.hash_index(column).get(value, np.empty(0, dtype=np.intp))
+
+    def range(self, column: str, operator: str, value) -> np.ndarray:
+        sorted_values, order = self.sorted_index(column)
+        bound = _sortable_value(self.df[column], value)
+        if operator == ">":
+            return order[np.searchsorted(sorted_values, bound, side="right"):]
+        if operator == "<":
+            return order[:np.searchsorted(sorted_values, bound, side="left")]
+        if operator == ">=":
+            return order[np.searchsorted(sorted_values, bound, side="left"):]
+        if operator == "<=":
+            return order[:np.searchsorted(sorted_values, bound, side="right")]
+        raise ValueError(f"Unsupported range operator: {operator}")
+
+    def rows(self, positions: np.ndarray, limit: Optional[int] = None) -> pd.DataFrame:
+        # Matching rows in table order; only the first `limit` positions are sorted
+        if limit is not None and len(positions) > limit:
+            positions = np.partition(positions, limit - 1)[:limit]
+        return self.df.iloc[np.sort(positions)]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_table_index(name: str, df: pd.DataFrame) -> TableIndex:
+    # One index per table, rebuilt when the table's DataFrame is replaced
+    with _indexes_lock:
+        index = _indexes.get(name)
+        if index is None or index.df is not df:
+            index = TableIndex(df)
+            _indexes[name] = index
+        return index
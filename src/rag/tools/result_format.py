@@ -0,0 +1,72 @@
+'''
+Compact text form of the data-analysis results sent back to the LLM.
+
+Results are CSV (no column padding like DataFrame.to_string) with values formatted by
+type: floats to 2 decimals, datetimes without the zero time or seconds. When more rows
+match than are shown, a summary line per numeric column (over all matching rows) tells
+the LLM what the hidden rows contain.
+'''
+from typing import Optional
+
+import pandas as pd
+
+# Columns always kept when the caller selects columns
+KEY_COLUMNS = ["customer_id", "transaction_id"]
+
+
+def select_columns(df: pd.DataFrame, columns: Optional[list]) -> pd.DataFrame:
+    # The requested columns that exist (plus the keys), in table order; all columns if none match
+    if not columns:
+        return df
+    wanted = set(columns) | set(KEY_COLUMNS)
+    selected = [c for c in df.columns if c in wanted]
+    return df[selected] if any(c in df.columns for c in columns) else df
+
+
+def _format_column(series: pd.Series) -> pd.Series:
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return series
+    if pd.api.types.is_float_dtype(dtype):
+        return series.round(2)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        values = pd.to_datetime(series)
+        has_time = (values.dropna() != values.dropna().dt.normalize()).any()
+        return values.dt.strftime("%Y-%m-%d %H:%M" if has_time else "%Y-%m-%d")
+    return series
+
+
+def _summary(df: pd.DataFrame) -> str:
+    lines = []
+    for column in df.columns:
+        series = df[column]
+        if column in KEY_COLUMNS or pd.api.types.is_bool_dtype(series.dtype):
+            continue
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            lines.append(
+                f"{column}: min {series.min():.2f}, mean {series.mean():.2f}, "
+                f"max {series.max():.2f}, sum {series.sum():.2f}"
+            )
+    return "\n".join(lines)
+
+
+def format_result(
+    result: pd.DataFrame,
+    total_rows: Optional[int] = None,
+    all_rows: Optional[pd.DataFrame] = None,
+    columns: Optional[list] = None,
+) -> str:
+    """
+    CSV of `result` (already capped by the caller). total_rows is the number of matching
+    rows; when it is larger, all_rows (the matches, if available) are summarized.
+    """
+    shown = select_columns(result, columns)
+    text = shown.apply(_format_column).to_csv(index=False).strip()
+    total_rows = len(result) if total_rows is None else total_rows
+    if total_rows > len(result):
+        text += f"\nShowing {len(result)} of {total_rows} matching rows."
+        if all_rows is not None:
+            summary = _summary(select_columns(all_rows, columns))
+            if summary:
+                text += f" Summary of all {total_rows} rows:\n{summary}"
+    return text
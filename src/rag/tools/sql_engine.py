@@ -0,0 +1,125 @@
+'''
+Embedded SQL engine (DuckDB) over the gold tables.
+
+Aggregations run inside DuckDB's columnar engine directly on the DataFrames of the
+current gold snapshot (no copy), and only the aggregated rows come back. Every thread
+gets its own connection (DuckDB connections are not shared between threads), with the
+snapshot's tables registered as the views "customers" and "transactions"; it is
+re-registered when the store swaps to a new version.
+
+The queries are built from validated parts (known columns, whitelisted aggregations and
+operators, values as bound parameters), the LLM never supplies SQL text.
+'''
+import threading
+from typing import Optional
+
+import pandas as pd
+
+from .gold_data import GOLD_DATA
+
+AGGREGATIONS = {
+    "count": "COUNT({col})",
+    "count_distinct": "COUNT(DISTINCT {col})",
+    "sum": "SUM({col})",
+    "avg": "AVG({col})",
+    "min": "MIN({col})",
+    "max": "MAX({col})",
+    "median": "MEDIAN({col})",
+}
+OPERATORS = {"==": "=", ">": ">", "<": "<", ">=": ">=", "<=": "<=", "!=": "<>"}
+JOIN_KEY = "customer_id"
+# Groups returned when no limit is given
+DEFAULT_GROUP_LIMIT = 20
+
+_local = threading.local()
+
+
+def _connection(snapshot):
+    import duckdb
+
+    if getattr(_local, "version", None) != snapshot.version:
+        con = duckdb.connect()
+        for name, df in snapshot.tables.items():
+            con.register(name, df)
+        _local.connection, _local.version = con, snapshot.version
+    return _local.connection
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _source(snapshot, table_name: str):
+    # FROM clause and the columns (with dtypes) it provides
+    customers, transactions = snapshot["customers"], snapshot["transactions"]
+    if table_name == "joined":
+        columns = {**customers.dtypes.to_dict(), **transactions.dtypes.to_dict()}
+        return f"transactions JOIN customers USING ({JOIN_KEY})", columns
+    df = customers if table_name == "customers" else transactions
+    return ("customers" if table_name == "customers" else "transactions"), df.dtypes.to_dict()
+
+
+def _convert(value: str, dtype):
+    # Same conversion rules as the filter queries of execute_data_analysis
+    if pd.api.types.is_bool_dtype(dtype):
+        return str(value).lower() == "true"
+    if pd.api.types.is_integer_dtype(dtype):
+        return int(value)
+    if pd.api.types.is_float_dtype(dtype):
+        return float(value)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.Timestamp(value).to_pydatetime()
+    return str(value)
+
+
+def _check_column(column: Optional[str], columns: dict, table_name: str) -> None:
+    if column is not None and column not in columns:
+        raise ValueError(f"Column '{column}' not found in {table_name}.")
+
+
+def run_aggregate(
+    table_name: str,
+    column: Optional[str],
+    aggregation: str = "count",
+    group_by: Optional[list] = None,
+    filter_column: Optional[str] = None,
+    operator: str = "==",
+    value: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    SELECT [group_by...,] <aggregation>(column) FROM <table> [WHERE filter] [GROUP BY ...]
+    Groups are ordered by the aggregate (largest first) and limited to `limit` rows.
+    table_name "joined" is transactions joined with their customers on customer_id.
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Unsupported aggregation '{aggregation}'. Use one of {list(AGGREGATIONS)}.")
+    snapshot = GOLD_DATA.snapshot()
+    source, columns = _source(snapshot, table_name)
+    group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+    for name in [column, filter_column, *group_by]:
+        _check_column(name, columns, table_name)
+
+    target = _quote(column) if column else "*"
+    if column is None and aggregation != "count":
+        raise ValueError(f"Aggregation '{aggregation}' needs a column.")
+    label = f"{aggregation}_{column}" if column else "count"
+    select = [_quote(g) for g in group_by] + [f"{AGGREGATIONS[aggregation].format(col=target)} AS {_quote(label)}"]
+    sql = f"SELECT {', '.join(select)} FROM {source}"
+
+    params = []
+    if filter_column is not None:
+        if operator == "contains":
+            sql += f" WHERE CAST({_quote(filter_column)} AS VARCHAR) ILIKE ?"
+            params.append(f"%{value}%")
+        elif operator in OPERATORS:
+            sql += f" WHERE {_quote(filter_column)} {OPERATORS[operator]} ?"
+            params.append(_convert(value, columns[filter_column]))
+        else:
+            raise ValueError(f"Unsupported operator '{operator}'.")
+
+    if group_by:
+        sql += f" GROUP BY {', '.join(_quote(g) for g in group_by)} ORDER BY {_quote(label)} DESC NULLS LAST"
+        sql += f" LIMIT {int(limit or DEFAULT_GROUP_LIMIT)}"
+
+    return _connection(snapshot).execute(sql, params).df()
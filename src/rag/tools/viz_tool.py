@@ -1,69 +1,202 @@
+import io
+import threading
+from collections import OrderedDict
 import matplotlib.pyplot as plt
-import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
 import pandas as pd
+from PIL import Image
+from scipy.stats import gaussian_kde
 from typing import Optional
+from .gold_data import GOLD_DATA
+from .indexes import get_table_index
 
-# Load the gold data for visualization context
-CUST_DF = pd.read_csv("data/processed_gold/gold_customers.csv")
+# Configuration for the 4 specific plots requested
+PLOT_CONFIG = {
+    "avg_transaction": {
+        "col": "avg_transaction_value",
+        "title": "Distribution of Average Transaction Value",
+        "label": "Avg Transaction Value (EUR)"
+    },
+    "frequency": {
+        "col": "transaction_frequency",
+        "title": "Distribution of Transaction Frequency",
+        "label": "Number of Transactions"
+    },
+    "recency": {
+        "col": "recency_days",
+        "title": "Distribution of Recency (Days Since Last Transaction)",
+        "label": "Recency (days)"
+    },
+    "cross_border": {
+        "col": "cross_border_count",
+        "title": "Distribution of Cross-Border Transaction Count",
+        "label": "Cross-Border Transaction Count"
+    }
+}
+HIST_BINS = 30
+KDE_GRIDSIZE = 200
+HIST_COLOR = "#1f77b4"
+# Rendered plots kept as PNG, keyed by (customer_id, plot_type, data version)
+PNG_CACHE_MAX_ENTRIES = 512
+# zlib level of the blitted PNGs: fast, still compressed
+PNG_COMPRESS_LEVEL = 1
 
-def generate_customer_visualization(customer_id: int, plot_type: str) -> plt.Figure:
-    """
-    Generates a distribution plot for a specific metric and highlights a customer's position.
-    """
-    # 1. Fetch customer data
-    customer_row = CUST_DF[CUST_DF['customer_id'] == customer_id]
+_distributions = {}
+_base_plots = {}
+_png_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _compute_distribution(values: pd.Series) -> dict:
+    # Same histogram (30 bins over the data range, counts) and KDE (Scott bandwidth,
+    # clipped to the data range, scaled to the counts) as sns.histplot(bins=30, kde=True)
+    x = values.to_numpy(dtype="float64", na_value=np.nan)
+    x = x[~np.isnan(x)]
+    counts, edges = np.histogram(x, bins=HIST_BINS)
+    kde_x = kde_y = None
+    if len(x) > 1 and x.min() < x.max():
+        kde_x = np.linspace(x.min(), x.max(), KDE_GRIDSIZE)
+        kde_y = gaussian_kde(x, bw_method="scott")(kde_x) * len(x) * np.diff(edges)[0]
+    return {"counts": counts, "edges": edges, "kde_x": kde_x, "kde_y": kde_y}
+
+
+def _per_version(cache: dict, version: str, plot_type: str, build):
+    # One entry per plot type for the current data version; older versions are dropped
+    with _cache_lock:
+        cached = cache.get(version, {}).get(plot_type)
+    if cached is not None:
+        return cached
+    value = build()
+    with _cache_lock:
+        if version not in cache:
+            cache.clear()
+            cache[version] = {}
+        return cache[version].setdefault(plot_type, value)
+
+
+def _distribution(snapshot, plot_type: str) -> dict:
+    return _per_version(
+        _distributions, snapshot.version, plot_type,
+        lambda: _compute_distribution(snapshot["customers"][PLOT_CONFIG[plot_type]["col"]])
+    )
+
+
+def _customer_value(snapshot, customer_id: int, column: str):
+    customers_df = snapshot["customers"]
+    index = get_table_index("customers", customers_df)
+    customer_row = index.rows(index.lookup("customer_id", customer_id))
     if customer_row.empty:
         raise ValueError(f"Customer ID {customer_id} not found.")
+    return customer_row[column].iloc[0]
 
-    # 2. Configuration for the 4 specific plots requested
-    config = {
-        "avg_transaction": {
-            "col": "avg_transaction_value",
-            "title": "Distribution of Average Transaction Value",
-            "label": "Avg Transaction Value (EUR)"
-        },
-        "frequency": {
-            "col": "transaction_frequency",
-            "title": "Distribution of Transaction Frequency",
-            "label": "Number of Transactions"
-        },
-        "recency": {
-            "col": "recency_days",
-            "title": "Distribution of Recency (Days Since Last Transaction)",
-            "label": "Recency (days)"
-        },
-        "cross_border": {
-            "col": "cross_border_count",
-            "title": "Distribution of Cross-Border Transaction Count",
-            "label": "Cross-Border Transaction Count"
-        }
-    }
 
-    plt_cfg = config.get(plot_type)
-    if not plt_cfg:
-        raise ValueError(f"Unsupported plot type: {plot_type}")
+def _draw_distribution(distribution: dict, plt_cfg: dict) -> Figure:
+    # A standalone Figure instead of pyplot: no global figure state, so plots can be
+    # generated from several threads at once (async tool calls)
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    edges = distribution["edges"]
+    ax.bar(
+        edges[:-1], distribution["counts"], width=np.diff(edges), align="edge",
+        color=HIST_COLOR, alpha=0.5, edgecolor="white", linewidth=0.5
+    )
+    if distribution["kde_x"] is not None:
+        ax.plot(distribution["kde_x"], distribution["kde_y"], color=HIST_COLOR)
+    ax.set_title(plt_cfg['title'])
+    ax.set_xlabel(plt_cfg['label'])
+    ax.set_ylabel("Count of Customers")
+    return fig
+
 
-    # 3. Plotting
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.histplot(CUST_DF[plt_cfg['col']], bins=30, kde=True, ax=ax, color="#1f77b4")
-    
-    # Add vertical line for the specific customer
-    customer_value = customer_row[plt_cfg['col']].iloc[0]
-    ax.axvline(
+def _add_customer_marker(ax, customer_id: int, customer_value) -> list:
+    # Vertical line for the specific customer
+    line = ax.axvline(
         customer_value, 
         color='red', 
         linestyle='--', 
         linewidth=2, 
         label=f'Customer {customer_id} ({customer_value:.2f})'
     )
+    # A fixed position: "best" searches the bars for free space on every draw
+    return [line, ax.legend(loc="upper right")]
 
-    ax.set_title(plt_cfg['title'])
-    ax.set_xlabel(plt_cfg['label'])
-    ax.set_ylabel("Count of Customers")
-    ax.legend()
-    
+
+def _base_plot(snapshot, plot_type: str) -> dict:
+    # The distribution drawn once per version; the pixels are kept to blit markers onto
+    def build():
+        fig = _draw_distribution(_distribution(snapshot, plot_type), PLOT_CONFIG[plot_type])
+        fig.tight_layout()
+        canvas = FigureCanvasAgg(fig)
+        canvas.draw()
+        return {"fig": fig, "canvas": canvas, "background": canvas.copy_from_bbox(fig.bbox), "lock": threading.Lock()}
+
+    return _per_version(_base_plots, snapshot.version, plot_type, build)
+
+
+def generate_customer_visualization(customer_id: int, plot_type: str) -> plt.Figure:
+    """
+    Generates a distribution plot for a specific metric and highlights a customer's position.
+    """
+    plt_cfg = PLOT_CONFIG.get(plot_type)
+    if not plt_cfg:
+        raise ValueError(f"Unsupported plot type: {plot_type}")
+
+    # One snapshot for the whole plot; the distribution is precomputed per data version
+    snapshot = GOLD_DATA.snapshot()
+    customer_value = _customer_value(snapshot, customer_id, plt_cfg['col'])
+    fig = _draw_distribution(_distribution(snapshot, plot_type), plt_cfg)
+    _add_customer_marker(fig.axes[0], customer_id, customer_value)
     return fig
 
+def render_customer_visualization(customer_id: int, plot_type: str) -> bytes:
+    """
+    The plot of generate_customer_visualization as a PNG image. Only the customer marker
+    is drawn, onto the cached distribution; images are cached per customer, plot type
+    and data version.
+    """
+    plt_cfg = PLOT_CONFIG.get(plot_type)
+    if not plt_cfg:
+        raise ValueError(f"Unsupported plot type: {plot_type}")
+
+    snapshot = GOLD_DATA.snapshot()
+    key = (str(customer_id), plot_type, snapshot.version)
+    with _cache_lock:
+        png = _png_cache.get(key)
+        if png is not None:
+            _png_cache.move_to_end(key)
+            return png
+
+    customer_value = _customer_value(snapshot, customer_id, plt_cfg['col'])
+    base = _base_plot(snapshot, plot_type)
+    with base["lock"]:
+        ax = base["fig"].axes[0]
+        base["canvas"].restore_region(base["background"])
+        artists = _add_customer_marker(ax, customer_id, customer_value)
+        for artist in artists:
+            ax.draw_artist(artist)
+        png = _encode_png(np.asarray(base["canvas"].buffer_rgba()))
+        for artist in artists:
+            artist.remove()
+
+    with _cache_lock:
+        _png_cache[key] = png
+        while len(_png_cache) > PNG_CACHE_MAX_ENTRIES:
+            _png_cache.popitem(last=False)
+    return png
+
+def _encode_png(rgba: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(rgba).save(buffer, format="png", compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+def figure_to_png_bytes(fig: plt.Figure, dpi: int = 100) -> bytes:
+    """Serializes a figure as PNG (e.g. to cache or store it without the figure object)."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
+
 def get_viz_tool_definition():
     """Returns the tool definition for the Mistral/OpenAI API."""
     return {
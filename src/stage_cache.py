@@ -0,0 +1,177 @@
+'''
+Content-addressed caching of the refresh stages in main.run_setup.
+
+Every stage (ETL, feature engineering, document ingestion) gets a fingerprint: a
+sha256 over the contents of its input files, the source code of the modules that
+implement it, its parameters (exchange rates, currency map, ...) and the fingerprints
+of the stages it depends on. After a stage succeeds, the fingerprint is stored with the
+paths and modification times of its outputs. On the next refresh the stage is skipped
+when the fingerprint is unchanged and the outputs still exist untouched (a table
+rewritten by a manual pipeline run invalidates the entry).
+
+Hashing big raw files is the expensive part, so file hashes are memoized by
+(size, mtime): a file is only re-read when it was modified.
+'''
+import ast
+import datetime
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path("data/_cache")
+CACHE_FILE = "stage_fingerprints.json"
+CACHE_VERSION = 1
+
+
+def _sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _expand(paths: Iterable) -> list:
+    # (name, file) pairs; directories stand for all files below them. Names are relative
+    # to the given path, so moving the checkout doesn't change the fingerprints.
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files += [
+                (f"{path.name}/{p.relative_to(path).as_posix()}", p)
+                for p in sorted(path.rglob("*"))
+                if p.is_file() and "__pycache__" not in p.parts
+            ]
+        else:
+            files.append((f"{path.parent.name}/{path.name}", path))
+    return files
+
+
+def _resolve_module(name: str, src_dir: Path) -> Optional[Path]:
+    base = src_dir.joinpath(*name.split("."))
+    if base.with_suffix(".py").is_file():
+        return base.with_suffix(".py")
+    if (base / "__init__.py").is_file():
+        return base / "__init__.py"
+    return None
+
+
+def _imported_names(tree: ast.AST, package: str) -> list:
+    # Every module an import statement may refer to ("from pkg import name" may import pkg.name)
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                parts = package.split(".") if package else []
+                parts = parts[:len(parts) - (node.level - 1)]
+                base = ".".join(parts + ([node.module] if node.module else []))
+            else:
+                base = node.module
+            names.append(base)
+            names += [f"{base}.{alias.name}" for alias in node.names]
+    return names
+
+
+def source_modules(modules: Iterable[str], src_dir: Path) -> list:
+    """
+    Source files of the given modules and of every module under src_dir they import,
+    directly or indirectly (including imports inside functions).
+    """
+    src_dir = Path(src_dir)
+    files, seen, todo = set(), set(), list(modules)
+    while todo:
+        name = todo.pop()
+        if not name or name in seen:
+            continue
+        seen.add(name)
+        # Importing a.b.c runs the packages a and a.b first
+        todo += [".".join(name.split(".")[:i]) for i in range(1, name.count(".") + 1)]
+        path = _resolve_module(name, src_dir)
+        if path is None:
+            continue
+        files.add(path)
+        package = name if path.name == "__init__.py" else name.rpartition(".")[0]
+        todo += _imported_names(ast.parse(path.read_text()), package)
+    return sorted(files)
+
+
+class StageCache:
+    def __init__(self, cache_dir: Path = CACHE_DIR):
+        self.path = Path(cache_dir) / CACHE_FILE
+        self.state = {"version": CACHE_VERSION, "stages": {}, "file_hashes": {}}
+        if self.path.exists():
+            state = json.loads(self.path.read_text())
+            if state.get("version") == CACHE_VERSION:
+                self.state = state
+
+    def file_hash(self, path: Path) -> str:
+        # Re-hashed only when size or modification time changed
+        stat = path.stat()
+        memo = self.state["file_hashes"].get(str(path))
+        if memo and memo["size"] == stat.st_size and memo["mtime_ns"] == stat.st_mtime_ns:
+            return memo["sha256"]
+        sha = _sha256_file(path)
+        self.state["file_hashes"][str(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha}
+        return sha
+
+    def fingerprint(
+        self,
+        stage: str,
+        inputs: Iterable = (),
+        code: Iterable = (),
+        params: Optional[dict] = None,
+        upstream: Iterable[str] = (),
+    ) -> str:
+        """
+        inputs: data files/directories, code: source files/directories, params: any
+        JSON-serializable parameters, upstream: fingerprints of the stages this one reads from.
+        """
+        content = {
+            "stage": stage,
+            "inputs": {name: self.file_hash(p) for name, p in _expand(inputs)},
+            "code": {name: self.file_hash(p) for name, p in _expand(code)},
+            "params": params or {},
+            "upstream": list(upstream),
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+    def is_fresh(self, stage: str, fingerprint: str) -> bool:
+        entry = self.state["stages"].get(stage)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return False
+        for path, mtime_ns in entry["outputs"].items():
+            if not Path(path).exists():
+                return False
+            if mtime_ns is not None and Path(path).stat().st_mtime_ns != mtime_ns:
+                logger.info(f"{path} was modified outside of the {stage} stage")
+                return False
+        return True
+
+    def mark_done(self, stage: str, fingerprint: str, outputs: Iterable, check_modified: bool = True) -> None:
+        # Tables are replaced atomically (file or partition directory), so a new
+        # modification time means the output was rewritten
+        self.state["stages"][stage] = {
+            "fingerprint": fingerprint,
+            "outputs": {str(p): Path(p).stat().st_mtime_ns if check_modified else None for p in outputs},
+            "completed_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        self.save()
+
+    def invalidate(self, stage: Optional[str] = None) -> None:
+        if stage is None:
+            self.state["stages"] = {}
+        else:
+            self.state["stages"].pop(stage, None)
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.state, indent=2))
+        tmp_path.replace(self.path)
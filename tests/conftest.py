@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Modules are imported from src (etl, feature_engineering, rag, ...), as in the app
+SRC = Path(__file__).resolve().parent.parent / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
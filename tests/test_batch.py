@@ -0,0 +1,23 @@
+import asyncio
+
+from rag.batch import ask_many
+
+
+class FakeOrchestrator:
+    async def ask_async(self, question):
+        await asyncio.sleep(0)
+        return {"answer": question.upper(), "metadata": {}}
+
+
+def test_ask_many_answers_in_question_order():
+    results, summary = ask_many(FakeOrchestrator(), ["a", "b", "c"], concurrency=2)
+    assert [r["response"]["answer"] for r in results] == ["A", "B", "C"]
+    assert summary["questions"] == 3 and summary["errors"] == 0
+
+
+def test_ask_many_inside_a_running_event_loop():
+    async def handler():
+        return ask_many(FakeOrchestrator(), ["a"])
+
+    results, _ = asyncio.run(handler())
+    assert results[0]["response"]["answer"] == "A"
@@ -0,0 +1,62 @@
+import io
+
+import pandas as pd
+import pytest
+
+from etl.load import save_dataframe
+from rag.tools import GoldDataStore, csv_analysis
+
+CUSTOMERS = pd.DataFrame({
+    "customer_id": pd.array([1, 2, 3, 4], dtype="Int64"),
+    "country": ["DK", "FI", "SE", "DK"],
+    "total_spend_eur": [10.0, 20.0, 30.0, None],
+})
+TRANSACTIONS = pd.DataFrame({
+    "transaction_id": pd.array([1], dtype="Int64"),
+    "customer_id": pd.array([1], dtype="Int64"),
+    "amount_eur": [10.0],
+})
+
+
+@pytest.fixture
+def gold(tmp_path, monkeypatch):
+    base_path = str(tmp_path / "processed_gold")
+    save_dataframe(CUSTOMERS, "gold_customers", base_path=base_path)
+    save_dataframe(TRANSACTIONS, "gold_transactions", base_path=base_path)
+    monkeypatch.setattr(csv_analysis, "GOLD_DATA", GoldDataStore(base_path=base_path, use_mmap=False))
+
+
+def _filter_ids(column, operator, value):
+    text = csv_analysis.execute_data_analysis("filter", "customers", column, value=value, operator=operator)
+    if text.startswith("No records"):
+        return set()
+    return set(pd.read_csv(io.StringIO(text))["customer_id"])
+
+
+@pytest.mark.parametrize("operator, value, expected", [
+    ("==", "20", {2}),
+    ("!=", "20", {1, 3}),
+    (">", "20", {3}),
+    ("<", "20", {1}),
+    (">=", "20", {2, 3}),
+    ("<=", "20", {1, 2}),
+    (">=", "31", set()),
+])
+def test_numeric_filter_operators(gold, operator, value, expected):
+    # Missing values never match
+    assert _filter_ids("total_spend_eur", operator, value) == expected
+
+
+@pytest.mark.parametrize("operator, value, expected", [
+    ("!=", "DK", {2, 3}),
+    (">=", "FI", {2, 3}),
+    ("<=", "FI", {1, 2, 4}),
+    ("contains", "k", {1, 4}),
+])
+def test_text_filter_operators(gold, operator, value, expected):
+    assert _filter_ids("country", operator, value) == expected
+
+
+def test_unsupported_operator_is_reported(gold):
+    text = csv_analysis.execute_data_analysis("filter", "customers", "total_spend_eur", value="1", operator="~")
+    assert text.startswith("Error: Unsupported operator '~'")
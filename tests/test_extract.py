@@ -0,0 +1,53 @@
+import pandas as pd
+
+from etl.extract import extract_transactions_since
+from etl.run_etl import run_etl_pipeline
+
+CUSTOMERS_CSV = (
+    "customer_id,country,signup_date,email\n"
+    "1,DK,2022-01-22,user0@example.com\n"
+    "2,FI,2021-12-22,user1@example.com\n"
+)
+# The last row has no trailing newline
+TRANSACTIONS_CSV = (
+    "transaction_id,customer_id,amount,currency,timestamp,category\n"
+    "1,1,10.5,EUR,2023-01-01 10:00:00,food\n"
+    "2,2,20.0,DKK,2023-01-02 11:00:00,travel\n"
+    "3,1,30.25,SEK,2023-01-03 12:00:00,electronics"
+)
+
+
+def _write_raw(root):
+    raw = root / "data" / "raw" / "csv"
+    raw.mkdir(parents=True)
+    (raw / "customers.csv").write_text(CUSTOMERS_CSV)
+    (raw / "transactions.csv").write_text(TRANSACTIONS_CSV)
+    return raw / "transactions.csv"
+
+
+def test_trailing_line_without_newline_is_left_for_the_next_read(tmp_path):
+    path = _write_raw(tmp_path)
+    rows, offset = extract_transactions_since(path)
+    assert list(rows["transaction_id"]) == ["1", "2"]
+    assert offset < path.stat().st_size
+
+
+def test_read_to_eof_includes_the_last_line(tmp_path):
+    path = _write_raw(tmp_path)
+    rows, offset = extract_transactions_since(path, read_to_eof=True)
+    assert list(rows["transaction_id"]) == ["1", "2", "3"]
+    assert offset == path.stat().st_size
+
+
+def test_incremental_etl_matches_full_pipeline_without_trailing_newline(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = _write_raw(tmp_path)
+    _, expected = run_etl_pipeline()
+    _, incremental = run_etl_pipeline(incremental=True)
+    pd.testing.assert_frame_equal(incremental.reset_index(drop=True), expected.reset_index(drop=True))
+
+    # Rows appended later (after the writer adds the missing newline) are merged once
+    with open(path, "a") as f:
+        f.write("\n4,2,40.0,EUR,2023-01-04 13:00:00,food\n")
+    _, incremental = run_etl_pipeline(incremental=True)
+    assert sorted(incremental["transaction_id"].tolist()) == [1, 2, 3, 4]
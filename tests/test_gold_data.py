@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.load import save_dataframe
+from rag.tools import GoldDataStore, csv_analysis, sql_engine
+
+QUERIES = [
+    dict(query_type="filter", table_name="customers", column="customer_id", value="17", operator="=="),
+    dict(query_type="filter", table_name="customers", column="country", value="fi", operator="contains"),
+    dict(query_type="filter", table_name="customers", column="total_spend_eur", value="250", operator=">"),
+    dict(query_type="filter", table_name="customers", column="last_tx_date", value="2023-02-15", operator="<="),
+    dict(query_type="filter", table_name="customers", column="high_ticket_user", value="True", operator="=="),
+    dict(query_type="top_n", table_name="customers", column="total_spend_eur", n=5),
+    dict(query_type="top_n", table_name="transactions", column="amount_eur", n=3, columns=["amount_eur"]),
+    dict(query_type="aggregate", table_name="customers", column="total_spend_eur", aggregation="avg",
+         filter_column="last_tx_date", operator=">=", value="2023-02-01"),
+    dict(query_type="group_by", table_name="customers", column="customer_id", aggregation="count", group_by=["country"]),
+    dict(query_type="join", table_name="transactions", column="amount_eur", aggregation="sum", group_by=["country"]),
+]
+
+
+def _write_gold(base_path, n=100, seed=0):
+    rng = np.random.default_rng(seed)
+    spend = rng.integers(0, 40, n).astype(float) * 12.5
+    spend[:5] = np.nan
+    customers = pd.DataFrame({
+        "customer_id": pd.array(np.arange(1, n + 1), dtype="Int64"),
+        "country": rng.choice(["DK", "FI", "NO", "SE"], n),
+        "total_spend_eur": spend,
+        "last_tx_date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 60, n), unit="D"),
+        "high_ticket_user": rng.random(n) < 0.3,
+    })
+    transactions = pd.DataFrame({
+        "transaction_id": pd.array(np.arange(1, 3 * n + 1), dtype="Int64"),
+        "customer_id": pd.array(np.arange(3 * n) % n + 1, dtype="Int64"),
+        "amount_eur": rng.random(3 * n) * 100,
+    })
+    save_dataframe(customers, "gold_customers", base_path=base_path)
+    save_dataframe(transactions, "gold_transactions", base_path=base_path)
+
+
+def _answers(store, monkeypatch):
+    monkeypatch.setattr(csv_analysis, "GOLD_DATA", store)
+    monkeypatch.setattr(sql_engine, "GOLD_DATA", store)
+    return [csv_analysis.execute_data_analysis(**query) for query in QUERIES]
+
+
+def test_memory_mapped_tables_give_the_same_results(tmp_path, monkeypatch):
+    base_path = str(tmp_path / "processed_gold")
+    _write_gold(base_path)
+    in_memory = _answers(GoldDataStore(base_path=base_path, use_mmap=False), monkeypatch)
+    mapped = _answers(GoldDataStore(base_path=base_path, use_mmap=True, cache_dir=tmp_path / "arrow"), monkeypatch)
+    assert not any(answer.startswith(("Error", "Analysis Error")) for answer in in_memory)
+    assert mapped == in_memory
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_rewritten_tables_are_reloaded(tmp_path, use_mmap):
+    base_path = str(tmp_path / "processed_gold")
+    _write_gold(base_path, n=10)
+    store = GoldDataStore(base_path=base_path, use_mmap=use_mmap, check_interval_s=0, cache_dir=tmp_path / "arrow")
+    before = store.snapshot()
+    _write_gold(base_path, n=20)
+    after = store.snapshot()
+    assert after.version != before.version
+    assert len(after["customers"]) == 20 and len(before["customers"]) == 10
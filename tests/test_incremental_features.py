@@ -0,0 +1,56 @@
+from etl.load import save_dataframe
+from etl.run_etl import run_etl_pipeline
+from feature_engineering.incremental_features import run_incremental_feature_engineering
+
+CUSTOMERS_CSV = (
+    "customer_id,country,signup_date,email\n"
+    "1,DK,2022-01-22,user0@example.com\n"
+    "2,FI,2021-12-22,user1@example.com\n"
+)
+
+
+def _transactions_csv(amounts):
+    rows = [
+        f"{i + 1},{i % 2 + 1},{amount},DKK,2023-01-{i + 1:02d} 10:00:00,food"
+        for i, amount in enumerate(amounts)
+    ]
+    return "transaction_id,customer_id,amount,currency,timestamp,category\n" + "\n".join(rows) + "\n"
+
+
+def test_rewritten_raw_file_refreshes_the_feature_state(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    raw = tmp_path / "data" / "raw" / "csv"
+    raw.mkdir(parents=True)
+    (raw / "customers.csv").write_text(CUSTOMERS_CSV)
+    amounts = [10.0 * (i + 1) for i in range(10)]
+    (raw / "transactions.csv").write_text(_transactions_csv(amounts))
+
+    customers, transactions = run_etl_pipeline(incremental=True)
+    run_incremental_feature_engineering(customers, transactions, verify=True)
+
+    # Rewritten in place (not appended): the ETL rebuilds, the feature state must follow
+    amounts[4:7] = [amount * 3 for amount in amounts[4:7]]
+    (raw / "transactions.csv").write_text(_transactions_csv(amounts))
+    customers, transactions = run_etl_pipeline(incremental=True)
+    gold = run_incremental_feature_engineering(customers, transactions, verify=True)
+    assert gold["total_spend_eur"].sum() > 0
+
+
+def test_full_rebuild_repairs_a_corrupt_silver_layer(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    raw = tmp_path / "data" / "raw" / "csv"
+    raw.mkdir(parents=True)
+    (raw / "customers.csv").write_text(CUSTOMERS_CSV)
+    (raw / "transactions.csv").write_text(_transactions_csv([10.0 * (i + 1) for i in range(10)]))
+    customers, transactions = run_etl_pipeline(incremental=True)
+    run_incremental_feature_engineering(customers, transactions)
+
+    # Rows lost from the silver table: an incremental run trusts its state and keeps the damage
+    save_dataframe(transactions.iloc[:5], "processed_transactions")
+    customers, transactions = run_etl_pipeline(incremental=True)
+    assert len(transactions) == 5
+
+    customers, transactions = run_etl_pipeline(incremental=True, full_rebuild=True)
+    assert len(transactions) == 10
+    gold = run_incremental_feature_engineering(customers, transactions, verify=True, rebuild=True)
+    assert gold["transaction_frequency"].sum() == 10
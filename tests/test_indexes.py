@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.load import save_dataframe
+from rag.tools import GoldDataStore, csv_analysis
+from rag.tools.indexes import TableIndex
+from rag.tools.result_format import format_result
+
+
+def _customers(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    spend = rng.integers(0, 40, n).astype(float) * 12.5  # many ties
+    spend[rng.choice(n, 10, replace=False)] = np.nan
+    return pd.DataFrame({
+        "customer_id": pd.array(np.arange(1, n + 1), dtype="Int64"),
+        "country": rng.choice(["DK", "FI", "NO", "SE"], n),
+        "total_spend_eur": spend,
+        "transaction_frequency": pd.array(rng.integers(0, 5, n), dtype="Int64"),
+        "last_tx_date": pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 60, n), unit="D"),
+    })
+
+
+def _transactions(n=50):
+    return pd.DataFrame({
+        "transaction_id": pd.array(np.arange(1, n + 1), dtype="Int64"),
+        "customer_id": pd.array(np.arange(n) % 7 + 1, dtype="Int64"),
+        "amount_eur": np.linspace(1.0, 100.0, n),
+    })
+
+
+CUSTOMERS = _customers()
+MASKS = {
+    ">": pd.Series.gt,
+    "<": pd.Series.lt,
+    ">=": pd.Series.ge,
+    "<=": pd.Series.le,
+}
+
+
+@pytest.mark.parametrize("column, value", [
+    ("total_spend_eur", 250.0),
+    ("transaction_frequency", 2),
+    ("last_tx_date", pd.Timestamp("2023-01-20")),
+])
+@pytest.mark.parametrize("operator", list(MASKS))
+def test_range_matches_the_boolean_mask(column, value, operator):
+    index = TableIndex(CUSTOMERS)
+    expected = CUSTOMERS[MASKS[operator](CUSTOMERS[column], value).fillna(False).astype(bool)]
+    positions = index.range(column, operator, value)
+    # Same rows, in table order (also the first rows when capped)
+    pd.testing.assert_frame_equal(index.rows(positions), expected)
+    pd.testing.assert_frame_equal(index.rows(positions, limit=10), expected.head(10))
+
+
+@pytest.mark.parametrize("column, value", [("customer_id", 17), ("country", "FI"), ("total_spend_eur", 125.0)])
+def test_lookup_matches_the_boolean_mask(column, value):
+    index = TableIndex(CUSTOMERS)
+    expected = CUSTOMERS[(CUSTOMERS[column] == value).fillna(False).astype(bool)]
+    pd.testing.assert_frame_equal(index.rows(index.lookup(column, value)), expected)
+
+
+def _top(df, column, n):
+    # Largest values first, ties in table order
+    return df.dropna(subset=[column]).sort_values(column, ascending=False, kind="stable").head(n)
+
+
+@pytest.mark.parametrize("n", [1, 5, 50, 190])
+def test_top_positions_select_the_nlargest_rows(n):
+    index = TableIndex(CUSTOMERS)
+    top = CUSTOMERS.iloc[index.top_positions("total_spend_eur", n)]
+    pd.testing.assert_frame_equal(top, _top(CUSTOMERS, "total_spend_eur", n))
+    assert set(top.index) == set(CUSTOMERS.nlargest(n, "total_spend_eur").index)
+
+
+def test_top_positions_are_consistent_across_n():
+    # Cached (TOP_N_CACHE rows) and uncached orderings agree, so a smaller n is a prefix
+    index = TableIndex(CUSTOMERS)
+    assert list(index.top_positions("total_spend_eur", 12)) == list(index._nlargest("total_spend_eur", 12))
+
+
+@pytest.fixture
+def gold(tmp_path, monkeypatch):
+    base_path = str(tmp_path / "processed_gold")
+    save_dataframe(CUSTOMERS, "gold_customers", base_path=base_path)
+    save_dataframe(_transactions(), "gold_transactions", base_path=base_path)
+    store = GoldDataStore(base_path=base_path, use_mmap=False)
+    monkeypatch.setattr(csv_analysis, "GOLD_DATA", store)
+    return store.get("customers")
+
+
+@pytest.mark.parametrize("column, operator, value, target", [
+    ("customer_id", "==", "17", 17),
+    ("country", "==", "FI", "FI"),
+    ("total_spend_eur", ">", "250", 250.0),
+    ("total_spend_eur", "<=", "100", 100.0),
+    ("last_tx_date", ">=", "2023-02-15", pd.Timestamp("2023-02-15")),
+])
+def test_filter_results_match_a_table_scan(gold, column, operator, value, target):
+    mask = {"==": pd.Series.eq, **MASKS}[operator](gold[column], target).fillna(False).astype(bool)
+    matches = gold[mask]
+    expected = format_result(matches.head(csv_analysis.MAX_RESULT_ROWS), total_rows=len(matches), all_rows=matches)
+    assert csv_analysis.execute_data_analysis("filter", "customers", column, value=value, operator=operator) == expected
+
+
+def test_top_n_results_match_a_sort(gold):
+    expected = format_result(_top(gold, "total_spend_eur", 5))
+    assert csv_analysis.execute_data_analysis("top_n", "customers", "total_spend_eur", n=5) == expected
@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from rag import ingest
+from rag.ingest import ChromaIngestor, _iter_documents
+
+
+class StubCollection:
+    """In-memory stand-in for a Chroma collection that records the writes."""
+
+    def __init__(self):
+        self.docs = {}
+        self.upserts = []
+        self.deletes = []
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self.upserts.append(list(ids))
+        self.docs.update({i: (d, m) for i, d, m in zip(ids, documents, metadatas)})
+
+    def delete(self, ids):
+        self.deletes.append(list(ids))
+        for i in ids:
+            self.docs.pop(i, None)
+
+    def get(self, include=None):
+        return {"ids": list(self.docs)}
+
+    def count(self):
+        return len(self.docs)
+
+
+class StubClient:
+    collection = None
+
+    def __init__(self, path):
+        # Like chromadb.PersistentClient, creates the database directory
+        Path(path).mkdir(parents=True, exist_ok=True)
+
+    def get_or_create_collection(self, name, embedding_function=None):
+        return StubClient.collection
+
+
+class CountingEmbeddingFunction:
+    calls = 0
+
+    def __call__(self, input):
+        CountingEmbeddingFunction.calls += 1
+        return [[float(len(text)), 1.0] for text in input]
+
+
+@pytest.fixture
+def stub_chroma(monkeypatch):
+    StubClient.collection = StubCollection()
+    CountingEmbeddingFunction.calls = 0
+    monkeypatch.setattr(ingest.chromadb, "PersistentClient", StubClient)
+    monkeypatch.setattr(ingest.embedding_functions, "DefaultEmbeddingFunction", CountingEmbeddingFunction)
+    return StubClient.collection
+
+
+def _corpus(path):
+    path.mkdir()
+    (path / "policy.txt").write_text("Refunds within 30 days.\n\nChargebacks are reviewed by the fraud team.")
+    (path / "faq.txt").write_text("Cards can be frozen in the app.\n\nSupport answers within a day.")
+    return path
+
+
+def test_hidden_files_and_directories_are_not_ingested(tmp_path):
+    (tmp_path / "policy.txt").write_text("Policy")
+    (tmp_path / "faq").mkdir()
+    (tmp_path / "faq" / "support.txt").write_text("FAQ")
+    (tmp_path / ".ipynb_checkpoints").mkdir()
+    (tmp_path / ".ipynb_checkpoints" / "policy-checkpoint.txt").write_text("Policy")
+    (tmp_path / ".draft.txt").write_text("Draft")
+    assert [source for source, _ in _iter_documents(str(tmp_path))] == ["policy.txt", "faq/support.txt"]
+
+
+def test_reingesting_an_unchanged_corpus_writes_nothing(tmp_path, stub_chroma):
+    docs = _corpus(tmp_path / "documents")
+    first = ChromaIngestor(db_path=str(tmp_path / "db")).ingest_directory(str(docs))
+    stored = dict(stub_chroma.docs)
+    assert first["upserted"] == len(stored) > 0
+
+    stub_chroma.upserts.clear()
+    calls = CountingEmbeddingFunction.calls
+    # A new ingestor (another process): only the manifest and the collection carry over
+    second = ChromaIngestor(db_path=str(tmp_path / "db")).ingest_directory(str(docs))
+    assert stub_chroma.upserts == []
+    assert CountingEmbeddingFunction.calls == calls
+    assert second["upserted"] == second["deleted"] == second["changed_documents"] == 0
+    assert stub_chroma.docs == stored
+
+
+def test_changed_document_only_replaces_its_own_chunks(tmp_path, stub_chroma):
+    docs = _corpus(tmp_path / "documents")
+    ChromaIngestor(db_path=str(tmp_path / "db")).ingest_directory(str(docs))
+    faq_ids = {i for i, (_, meta) in stub_chroma.docs.items() if meta["source"] == "faq.txt"}
+    stub_chroma.upserts.clear()
+
+    (docs / "policy.txt").write_text("Refunds within 14 days.\n\nChargebacks are reviewed by the fraud team.")
+    stats = ChromaIngestor(db_path=str(tmp_path / "db")).ingest_directory(str(docs))
+    assert stats["changed_documents"] == 1
+    assert stats["upserted"] == stats["deleted"] == 1
+    assert not faq_ids & {i for batch in stub_chroma.upserts for i in batch}
+    assert any("14 days" in text for text, _ in stub_chroma.docs.values())
+    assert not any("30 days" in text for text, _ in stub_chroma.docs.values())
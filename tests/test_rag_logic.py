@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from rag.rag_logic import RAGOrchestrator, _final_answer
+from rag.retrieval_cache import RetrievalCache
+
+QUESTION = {"role": "user", "content": "Top 5 spenders?"}
+TOOL_CALL = {"id": "1", "type": "function", "function": {"name": "execute_data_analysis", "arguments": "{}"}}
+
+
+def test_answer_is_the_last_assistant_message():
+    answer = SimpleNamespace(role="assistant", content="Customer 7 spent most.", tool_calls=None)
+    assert _final_answer([QUESTION, answer]) == "Customer 7 spent most."
+
+
+def test_tool_output_is_never_the_answer():
+    # The turns ran out while the model was still calling tools
+    messages = [
+        QUESTION,
+        {"role": "assistant", "content": "", "tool_calls": [TOOL_CALL]},
+        {"role": "tool", "name": "execute_data_analysis", "content": "customer_id\n7", "tool_call_id": "1"},
+    ]
+    assert _final_answer(messages) is None
+    assert _final_answer(messages[:2]) is None
+
+
+class StubVectorDB:
+    def __init__(self):
+        self.version = "v1"
+        self.queries = 0
+        self.collection = self
+
+    def collection_version(self):
+        return self.version
+
+    def query(self, query_texts, n_results):
+        self.queries += 1
+        text = f"Refunds within 30 days ({self.version})."
+        return {"documents": [[text]], "metadatas": [[{"source": "policy.txt"}]]}
+
+
+def test_retrieval_is_cached_until_the_collection_is_reingested():
+    orchestrator = RAGOrchestrator.__new__(RAGOrchestrator)
+    orchestrator.vector_db = StubVectorDB()
+    orchestrator.retrieval_cache = RetrievalCache()
+
+    context, _ = orchestrator._get_background_context("Refund policy?")
+    assert orchestrator._get_background_context("refund policy?")[0] == context
+    assert orchestrator.vector_db.queries == 1
+
+    orchestrator.vector_db.version = "v2"
+    context, _ = orchestrator._get_background_context("Refund policy?")
+    assert orchestrator.vector_db.queries == 2
+    assert "(v2)" in context
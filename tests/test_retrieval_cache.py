@@ -0,0 +1,33 @@
+from rag.retrieval_cache import RetrievalCache
+
+
+def test_hit_for_the_same_normalized_question():
+    cache = RetrievalCache()
+    cache.put("Refund policy?", 3, "v1", "context")
+    assert cache.get("  refund   POLICY? ", 3, "v1") == "context"
+    assert cache.get("refund policy?", 5, "v1") is None
+
+
+def test_miss_after_the_collection_version_changes():
+    cache = RetrievalCache()
+    cache.put("refund policy?", 3, "v1", "old context")
+    assert cache.get("refund policy?", 3, "v2") is None
+    stats = cache.stats()
+    assert stats["invalidations"] == 1 and stats["entries"] == 0 and stats["collection_version"] == "v2"
+    # Results of the old version are not served again when it comes back either
+    assert cache.get("refund policy?", 3, "v1") is None
+
+
+def test_entries_expire_and_are_evicted(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("rag.retrieval_cache.time.monotonic", lambda: now[0])
+    cache = RetrievalCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 3, "v1", "A")
+    cache.put("b", 3, "v1", "B")
+    cache.get("a", 3, "v1")
+    cache.put("c", 3, "v1", "C")
+    # Least recently used ("b") is evicted
+    assert cache.get("b", 3, "v1") is None and cache.get("a", 3, "v1") == "A"
+    now[0] += 61
+    assert cache.get("c", 3, "v1") is None
+    assert cache.stats()["expired"] == 1
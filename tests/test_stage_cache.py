@@ -0,0 +1,27 @@
+from pathlib import Path
+
+from stage_cache import source_modules
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+
+def _names(modules):
+    return {path.relative_to(SRC_DIR).as_posix() for path in source_modules(modules, SRC_DIR)}
+
+
+def test_etl_code_includes_the_instrumentation():
+    names = _names(["etl.run_etl"])
+    assert {"etl/run_etl.py", "etl/transform.py", "instrumentation/__init__.py", "instrumentation/tracking.py"} <= names
+
+
+def test_ingest_code_includes_the_embedding_cache():
+    assert {"rag/ingest.py", "rag/embedding_cache.py"} <= _names(["rag.ingest"])
+
+
+def test_relative_imports_are_followed(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("from .helpers import f\n")
+    (tmp_path / "pkg" / "helpers.py").write_text("import json\n")
+    (tmp_path / "main.py").write_text("import pkg\n")
+    files = {p.relative_to(tmp_path).as_posix() for p in source_modules(["main"], tmp_path)}
+    assert files == {"main.py", "pkg/__init__.py", "pkg/helpers.py"}
@@ -0,0 +1,10 @@
+from rag.token_budget import TokenBudget
+
+
+def test_report_of_a_cached_answer_has_the_same_shape():
+    budget = TokenBudget()
+    computed = budget.report([{"turn": 1, "prompt_tokens": 120, "completion_tokens": 30}])
+    cached = budget.report([], cache_hit=True)
+    assert set(cached) == set(computed)
+    assert cached["prompt_tokens"] == cached["completion_tokens"] == 0
+    assert cached["cache_hit"] and not computed["cache_hit"]
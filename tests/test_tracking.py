@@ -0,0 +1,24 @@
+from instrumentation import instrumented_run, track_stage
+
+
+def test_stage_names_start_with_the_run_name(tmp_path):
+    with instrumented_run("etl", report_dir=tmp_path) as report:
+        with track_stage("transform_transactions"):
+            with track_stage("7_sort"):
+                pass
+    assert set(report.stages) == {"etl/transform_transactions", "etl/transform_transactions/7_sort"}
+
+
+def test_nested_run_is_a_stage_of_the_outer_run(tmp_path):
+    with instrumented_run("setup", report_dir=tmp_path) as report:
+        with instrumented_run("etl", report_dir=tmp_path):
+            with track_stage("transform_transactions"):
+                pass
+    assert set(report.stages) == {"setup/etl", "setup/etl/transform_transactions"}
+
+
+def test_profile_stage_matches_the_documented_name(tmp_path):
+    with instrumented_run("etl", report_dir=tmp_path, profile_stage="etl/transform_transactions") as report:
+        with track_stage("transform_transactions"):
+            sum(range(1000))
+    assert report.profile is not None
@@ -0,0 +1,73 @@
+import io
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+import pytest
+import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+from etl.load import save_dataframe
+from rag.tools import GoldDataStore, viz_tool
+
+
+def _customers(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "customer_id": pd.array(np.arange(1, n + 1), dtype="Int64"),
+        "avg_transaction_value": rng.lognormal(4, 0.6, n),
+        "transaction_frequency": pd.array(rng.poisson(8, n), dtype="Int64"),
+        "recency_days": pd.array(rng.integers(0, 365, n), dtype="Int64"),
+        "cross_border_count": pd.array(rng.poisson(1, n), dtype="Int64"),
+    })
+
+
+@pytest.mark.parametrize("plot_type", list(viz_tool.PLOT_CONFIG))
+def test_distribution_matches_seaborn_histplot(plot_type):
+    values = _customers()[viz_tool.PLOT_CONFIG[plot_type]["col"]]
+    distribution = viz_tool._compute_distribution(values)
+
+    ax = Figure().subplots()
+    sns.histplot(values.astype(float), bins=viz_tool.HIST_BINS, kde=True, ax=ax)
+    heights = [patch.get_height() for patch in ax.patches]
+    lefts = [patch.get_x() for patch in ax.patches]
+    np.testing.assert_allclose(heights, distribution["counts"])
+    np.testing.assert_allclose(lefts, distribution["edges"][:-1])
+    kde_x, kde_y = ax.lines[0].get_data()
+    np.testing.assert_allclose(kde_x, distribution["kde_x"])
+    np.testing.assert_allclose(kde_y, distribution["kde_y"], rtol=1e-9)
+
+
+@pytest.fixture
+def gold(tmp_path, monkeypatch):
+    base_path = str(tmp_path / "processed_gold")
+    save_dataframe(_customers(), "gold_customers", base_path=base_path)
+    save_dataframe(pd.DataFrame({"transaction_id": pd.array([1], dtype="Int64")}), "gold_transactions", base_path=base_path)
+    monkeypatch.setattr(viz_tool, "GOLD_DATA", GoldDataStore(base_path=base_path, use_mmap=False))
+
+
+def _full_render(customer_id, plot_type) -> np.ndarray:
+    # The plot drawn from scratch, at the size and layout of the cached base plot
+    fig = viz_tool.generate_customer_visualization(customer_id, plot_type)
+    fig.tight_layout()
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba())
+
+
+@pytest.mark.parametrize("plot_type", list(viz_tool.PLOT_CONFIG))
+def test_blitted_plot_matches_a_full_render(gold, plot_type):
+    # Several customers on the same cached base plot: no marker is left behind
+    for customer_id in (7, 150, 7):
+        blitted = np.asarray(Image.open(io.BytesIO(viz_tool.render_customer_visualization(customer_id, plot_type))))
+        full = _full_render(customer_id, plot_type)
+        assert blitted.shape == full.shape
+        # Only where the marker line meets the top and bottom spine: a full draw puts the
+        # spines above the line, the blit draws the line onto the finished background
+        differs = np.abs(blitted.astype(int) - full.astype(int)).max(axis=2) > 8
+        rows, columns = np.nonzero(differs)
+        assert differs.sum() <= 12
+        assert len(set(columns)) <= 3 and len(set(rows)) <= 4